@@ -0,0 +1,294 @@
+"""
+Almacén de resultados columnar y de solo agregado
+
+Cada ejecución agrega una fila. Cada columna vive en su propio archivo
+binario dentro del directorio del almacén:
+
+    esquema.json         columnas, tipos y número de filas confirmadas
+    _timestamp.f8        instante de cada fila (segundos epoch)
+    _fuente.i4           índice del archivo de origen en la lista del esquema
+    <escalar>.f8         un float64 por fila (NaN si la fila no lo trae)
+    <arreglo>.datos      valores de todas las filas concatenados
+    <arreglo>.offsets    int64, fin de cada fila dentro de .datos
+    <texto>.i4           índice en el diccionario del esquema
+
+Para leer una columna de las últimas N filas basta un slice de un archivo,
+sin interpretar las demás. esquema.json se reescribe (de forma atómica)
+después de agregar los datos; al abrir se ignora cualquier byte de una
+fila que no llegó a confirmarse.
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+
+class AlmacenResultados:
+    """Almacén de resultados por ejecución en archivos por columna"""
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        if not os.path.exists(directorio):
+            os.makedirs(directorio)
+
+        ruta = self._ruta('esquema.json')
+        if os.path.exists(ruta):
+            with open(ruta) as f:
+                self.esquema = json.load(f)
+        else:
+            self.esquema = {'filas': 0, 'columnas': {}, 'fuentes': []}
+        self._indice_fuentes = {fuente: i for i, fuente in enumerate(self.esquema['fuentes'])}
+        self._recortar()
+
+    def _ruta(self, archivo):
+        return os.path.join(self.directorio, archivo)
+
+    def __len__(self):
+        return self.esquema['filas']
+
+    @property
+    def columnas(self):
+        """Nombres de las columnas de usuario"""
+        return list(self.esquema['columnas'])
+
+    @property
+    def fuentes(self):
+        """Archivos de origen registrados"""
+        return list(self.esquema['fuentes'])
+
+    def _recortar(self):
+        """Descarta datos de filas agregadas a medias (sin confirmar en el esquema)"""
+        n = self.esquema['filas']
+        archivos = [('_timestamp.f8', 8 * n), ('_fuente.i4', 4 * n)]
+        for nombre, columna in self.esquema['columnas'].items():
+            if columna['tipo'] == 'arreglo':
+                archivos.append((f"{nombre}.offsets", 8 * n))
+                fin = int(self._offsets(nombre, n - 1, n)[0]) if n else 0
+                archivos.append((f"{nombre}.datos", np.dtype(columna['dtype']).itemsize * fin))
+            else:
+                archivos.append((f"{nombre}.{columna['dtype'][1:]}", np.dtype(columna['dtype']).itemsize * n))
+
+        for archivo, tamano in archivos:
+            ruta = self._ruta(archivo)
+            if not os.path.exists(ruta):
+                open(ruta, 'wb').close()
+            if os.path.getsize(ruta) > tamano:
+                with open(ruta, 'r+b') as f:
+                    f.truncate(tamano)
+
+    def _leer(self, archivo, dtype, inicio, fin):
+        """Lee los elementos [inicio, fin) de un archivo de columna"""
+        dtype = np.dtype(dtype)
+        with open(self._ruta(archivo), 'rb') as f:
+            f.seek(inicio * dtype.itemsize)
+            return np.fromfile(f, dtype=dtype, count=max(fin - inicio, 0))
+
+    def _offsets(self, nombre, inicio, fin):
+        return self._leer(f"{nombre}.offsets", '<i8', inicio, fin)
+
+    @staticmethod
+    def _columna_para(nombre, valor):
+        """Descripción de la columna que corresponde a un valor (sin crearla)"""
+        if isinstance(valor, str):
+            return {'tipo': 'texto', 'dtype': '<i4', 'diccionario': []}
+        if np.ndim(valor) == 0:
+            return {'tipo': 'escalar', 'dtype': '<f8'}
+        dtype = np.asarray(valor).dtype
+        if dtype.kind not in 'biufc':
+            raise TypeError(f"Columna '{nombre}': tipo {dtype} no soportado")
+        return {'tipo': 'arreglo', 'dtype': dtype.newbyteorder('<').str}
+
+    def _nueva_columna(self, nombre, columna):
+        """Registra una columna y rellena las filas anteriores"""
+        n = self.esquema['filas']
+        if columna['tipo'] == 'arreglo':
+            with open(self._ruta(f"{nombre}.offsets"), 'wb') as f:
+                np.zeros(n, dtype='<i8').tofile(f)
+            open(self._ruta(f"{nombre}.datos"), 'wb').close()
+        else:
+            relleno = (np.full(n, -1, dtype='<i4') if columna['tipo'] == 'texto'
+                       else np.full(n, np.nan))
+            with open(self._ruta(f"{nombre}.{columna['dtype'][1:]}"), 'wb') as f:
+                relleno.tofile(f)
+        self.esquema['columnas'][nombre] = columna
+
+    def _convertir(self, nombre, columna, valor, textos_nuevos):
+        """
+        Valor de una columna como bytes a agregar a sus archivos
+
+        Retorna [(archivo, bytes)]. Los textos que aún no están en el
+        diccionario se anotan en textos_nuevos sin modificar el esquema.
+        """
+        try:
+            if columna['tipo'] == 'arreglo':
+                datos = np.asarray([] if valor is None else valor, dtype=columna['dtype']).ravel()
+                existente = nombre in self.esquema['columnas'] and len(self)
+                fin = int(self._offsets(nombre, len(self) - 1, len(self))[0]) if existente else 0
+                return [(f"{nombre}.datos", datos.tobytes()),
+                        (f"{nombre}.offsets", np.array([fin + len(datos)], dtype='<i8').tobytes())]
+            if columna['tipo'] == 'texto':
+                if valor is None:
+                    codigo = -1
+                elif not isinstance(valor, str):
+                    raise TypeError(f"se esperaba texto, no {type(valor).__name__}")
+                else:
+                    diccionario = columna['diccionario']
+                    pendientes = textos_nuevos.setdefault(nombre, [])
+                    if valor in diccionario:
+                        codigo = diccionario.index(valor)
+                    else:
+                        if valor not in pendientes:
+                            pendientes.append(valor)
+                        codigo = len(diccionario) + pendientes.index(valor)
+                return [(f"{nombre}.i4", np.array([codigo], dtype='<i4').tobytes())]
+            return [(f"{nombre}.f8", np.array([np.nan if valor is None else float(valor)],
+                                               dtype='<f8').tobytes())]
+        except (TypeError, ValueError) as e:
+            raise type(e)(f"Columna '{nombre}': {e}") from e
+
+    def agregar(self, resultados, fuente=None, timestamp=None):
+        """
+        Agrega una fila con los resultados de una ejecución
+
+        Escalares → float64, listas/arreglos → arreglo tipado, textos →
+        diccionario. Si no se da timestamp se usa resultados['timestamp']
+        (texto ISO) o la hora actual.
+
+        Toda la fila se valida y convierte antes de escribir: si un valor
+        no es compatible con su columna se lanza TypeError/ValueError y el
+        almacén queda sin cambios.
+        """
+        resultados = dict(resultados)
+        valor = resultados.pop('timestamp', None)
+        if timestamp is None:
+            timestamp = datetime.fromisoformat(valor).timestamp() if isinstance(valor, str) else time.time()
+
+        # 1. Validar y convertir la fila completa, sin tocar el esquema ni los archivos
+        columnas = dict(self.esquema['columnas'])
+        nuevas = {}
+        for nombre, valor in resultados.items():
+            if nombre not in columnas:
+                nuevas[nombre] = columnas[nombre] = self._columna_para(nombre, valor)
+
+        indice_fuente = self._indice_fuentes.get(fuente, -1)
+        if fuente is not None and fuente not in self._indice_fuentes:
+            indice_fuente = len(self.esquema['fuentes'])
+
+        escrituras = [('_timestamp.f8', np.array([timestamp], dtype='<f8').tobytes()),
+                      ('_fuente.i4', np.array([indice_fuente], dtype='<i4').tobytes())]
+        textos_nuevos = {}
+        for nombre, columna in columnas.items():
+            escrituras += self._convertir(nombre, columna, resultados.get(nombre), textos_nuevos)
+
+        # 2. Registrar columnas, fuente y textos nuevos y escribir
+        for nombre, columna in nuevas.items():
+            self._nueva_columna(nombre, columna)
+        if indice_fuente == len(self.esquema['fuentes']):
+            self._indice_fuentes[fuente] = indice_fuente
+            self.esquema['fuentes'].append(fuente)
+        for nombre, textos in textos_nuevos.items():
+            self.esquema['columnas'][nombre]['diccionario'].extend(textos)
+
+        for archivo, datos in escrituras:
+            with open(self._ruta(archivo), 'ab') as f:
+                f.write(datos)
+
+        self.esquema['filas'] += 1
+        self._guardar_esquema()
+        return len(self) - 1
+
+    def _guardar_esquema(self):
+        """Confirma las filas escribiendo el esquema de forma atómica"""
+        temporal = self._ruta('esquema.json.tmp')
+        with open(temporal, 'w') as f:
+            json.dump(self.esquema, f, indent=2)
+        os.replace(temporal, self._ruta('esquema.json'))
+
+    def timestamps(self):
+        """Instantes de todas las filas"""
+        return self._leer('_timestamp.f8', '<f8', 0, len(self))
+
+    def seleccionar(self, ultimas=None, desde=None, hasta=None, fuente=None):
+        """
+        Índices de las filas que cumplen los filtros
+
+        ultimas: solo las N filas más recientes (en orden de agregado)
+        desde, hasta: rango de timestamps (epoch o datetime), hasta exclusivo
+        fuente: archivo de origen
+        """
+        n = len(self)
+        inicio = max(n - ultimas, 0) if ultimas is not None else 0
+        indices = np.arange(inicio, n)
+
+        if desde is not None or hasta is not None:
+            tiempos = self._leer('_timestamp.f8', '<f8', inicio, n)
+            mascara = np.ones(len(indices), dtype=bool)
+            if desde is not None:
+                mascara &= tiempos >= (desde.timestamp() if isinstance(desde, datetime) else desde)
+            if hasta is not None:
+                mascara &= tiempos < (hasta.timestamp() if isinstance(hasta, datetime) else hasta)
+            indices = indices[mascara]
+
+        if fuente is not None:
+            if fuente not in self._indice_fuentes:
+                return indices[:0]
+            fuentes = self._leer('_fuente.i4', '<i4', inicio, n)
+            indices = indices[fuentes[indices - inicio] == self._indice_fuentes[fuente]]
+
+        return indices
+
+    def columna(self, nombre, ultimas=None, desde=None, hasta=None, fuente=None):
+        """
+        Valores de una columna para las filas seleccionadas
+
+        Escalares: arreglo float64. Arreglos: lista de arreglos tipados.
+        Textos: lista de str (None donde falta).
+        """
+        indices = self.seleccionar(ultimas, desde, hasta, fuente)
+        if nombre == 'timestamp':
+            return self._rango('_timestamp.f8', '<f8', indices)
+
+        return self.columna_indices(nombre, indices)
+
+    def _rango(self, archivo, dtype, indices):
+        """Lee un archivo de columna solo en el tramo que cubre los índices"""
+        if len(indices) == 0:
+            return np.empty(0, dtype=dtype)
+        a, b = int(indices[0]), int(indices[-1]) + 1
+        return self._leer(archivo, dtype, a, b)[indices - a]
+
+    def fila(self, indice):
+        """Todos los valores de una fila como dict"""
+        resultado = {
+            'timestamp': float(self._leer('_timestamp.f8', '<f8', indice, indice + 1)[0])
+        }
+        codigo = int(self._leer('_fuente.i4', '<i4', indice, indice + 1)[0])
+        resultado['fuente'] = self.esquema['fuentes'][codigo] if codigo >= 0 else None
+        seleccion = np.array([indice])
+        for nombre in self.esquema['columnas']:
+            resultado[nombre] = self.columna_indices(nombre, seleccion)[0]
+        return resultado
+
+    def columna_indices(self, nombre, indices):
+        """Valores de una columna para índices de fila explícitos (crecientes)"""
+        columna = self.esquema['columnas'][nombre]
+        indices = np.asarray(indices)
+        if columna['tipo'] == 'escalar':
+            return self._rango(f"{nombre}.f8", '<f8', indices)
+        if columna['tipo'] == 'texto':
+            diccionario = columna['diccionario']
+            return [diccionario[c] if c >= 0 else None
+                    for c in self._rango(f"{nombre}.i4", '<i4', indices)]
+        if len(indices) == 0:
+            return []
+        # Un solo bloque contiguo de .datos cubre todas las filas pedidas
+        a, b = int(indices[0]), int(indices[-1]) + 1
+        fines = self._offsets(nombre, a, b)
+        inicio = int(self._offsets(nombre, a - 1, a)[0]) if a > 0 else 0
+        datos = self._leer(f"{nombre}.datos", columna['dtype'], inicio, int(fines[-1]))
+        comienzos = np.concatenate(([inicio], fines[:-1])) - inicio
+        fines = fines - inicio
+        return [datos[comienzos[i - a]:fines[i - a]] for i in indices]
@@ -2,15 +2,32 @@
 Módulo para análisis espectral de señales
 """
 
+import inspect
+from collections import deque
 import numpy as np
-from scipy import signal
 import json
-import matplotlib.pyplot as plt
+
+from almacen_resultados import AlmacenResultados
+from cache_disenos import CacheLRU
+from importacion_diferida import importar_diferido
+from politica_tipos import tipo_complejo, tipo_real
+
+signal = importar_diferido('scipy.signal')
+
+# numpy >= 2.0 permite escribir la FFT en un buffer preasignado
+_RFFT_ACEPTA_OUT = 'out' in inspect.signature(np.fft.rfft).parameters
 
 class AnalizadorEspectral:
     def __init__(self, config):
         self.config = config
         self.fs = config.fs
+        self.tipo = tipo_real(config)
+        self.tipo_complejo = tipo_complejo(config)
+        
+        # Ventanas y ejes de frecuencia por tamaño, y buffers de trabajo de la FFT
+        self.cache_fft = CacheLRU(config.cache_fft_capacidad)
+        self.buffers_fft = CacheLRU(config.cache_fft_capacidad, solo_lectura=False)
+        self._almacenes = {}  # directorio -> AlmacenResultados
         
     def calcular_fft(self, senal, ventana=None, n_fft=None):
         """
@@ -21,26 +38,69 @@ class AnalizadorEspectral:
         if ventana is None:
             ventana = self.config.ventana_spectrogram
             
+        senal = np.asarray(senal, dtype=self.tipo)
+        n = len(senal)
+        win = self.obtener_ventana(ventana, n)
+        frecuencias = self.obtener_frecuencias(n_fft)
+        
+        # Buffers de trabajo reutilizados entre llamadas del mismo tamaño
+        senal_ventaneada, fft_compleja = self.buffers_fft.obtener(
+            ('fft', n, n_fft, self.tipo.str),
+            lambda: (np.empty(n, dtype=self.tipo),
+                     np.empty(n_fft // 2 + 1, dtype=self.tipo_complejo))
+        )
+        
         # Aplicar ventana
-        if ventana == 'hann':
-            win = signal.windows.hann(len(senal))
-        elif ventana == 'hamming':
-            win = signal.windows.hamming(len(senal))
-        else:
-            win = np.ones(len(senal))
-            
-        senal_ventaneada = senal * win
+        np.multiply(senal, win, out=senal_ventaneada)
         
         # Calcular FFT
-        fft_compleja = np.fft.rfft(senal_ventaneada, n=n_fft)
-        frecuencias = np.fft.rfftfreq(n_fft, 1/self.fs)
+        if _RFFT_ACEPTA_OUT:
+            np.fft.rfft(senal_ventaneada, n=n_fft, out=fft_compleja)
+        else:
+            fft_compleja = np.fft.rfft(senal_ventaneada, n=n_fft).astype(self.tipo_complejo, copy=False)
         magnitud = np.abs(fft_compleja)
         
         return frecuencias, magnitud
     
-    def calcular_espectrograma(self, senal, ventana=None, solape=None, n_fft=None):
+    def obtener_ventana(self, ventana, n):
+        """
+        Ventana de análisis de longitud n en el tipo de la política (en caché)
+        """
+        def calcular():
+            if ventana == 'hann':
+                return signal.windows.hann(n).astype(self.tipo)
+            elif ventana == 'hamming':
+                return signal.windows.hamming(n).astype(self.tipo)
+            return np.ones(n, dtype=self.tipo)
+        
+        return self.cache_fft.obtener(('ventana', ventana, n, self.tipo.str), calcular)
+    
+    def obtener_frecuencias(self, n_fft):
+        """
+        Eje de frecuencias de una FFT real de tamaño n_fft (en caché)
+        """
+        return self.cache_fft.obtener(
+            ('frecuencias', n_fft, self.fs),
+            lambda: np.fft.rfftfreq(n_fft, 1/self.fs)
+        )
+    
+    def estadisticas_cache(self):
+        """
+        Aciertos y fallos de las cachés de ventanas, ejes y buffers de la FFT
+        """
+        return {
+            'ventanas_frecuencias': self.cache_fft.estadisticas(),
+            'buffers': self.buffers_fft.estadisticas()
+        }
+    
+    def calcular_espectrograma(self, senal, ventana=None, solape=None, n_fft=None, segmentos=None):
         """
         Calcula espectrograma usando STFT
+
+        Con segmentos [(inicio, fin)] en muestras (p.ej. de
+        Preprocesador.segmentos_voz) solo se calculan las tramas que se
+        solapan con ellos; las demás quedan en el piso (-100 dB), con la
+        misma rejilla de tiempos que el espectrograma completo.
         """
         if n_fft is None:
             n_fft = self.config.ventana_fft
@@ -49,20 +109,59 @@ class AnalizadorEspectral:
         if solape is None:
             solape = self.config.solape_fft
             
-        f, t, Sxx = signal.spectrogram(
-            senal,
-            fs=self.fs,
-            window=ventana,
-            nperseg=n_fft,
-            noverlap=solape,
-            scaling='density'
-        )
+        senal = np.asarray(senal, dtype=self.tipo)
+
+        def espectrograma(tramo):
+            return signal.spectrogram(
+                tramo,
+                fs=self.fs,
+                window=ventana,
+                nperseg=n_fft,
+                noverlap=solape,
+                scaling='density'
+            )
+
+        if segmentos is None or len(senal) < n_fft:
+            f, t, Sxx = espectrograma(senal)
+        else:
+            # Tramas k (muestras [k·paso, k·paso + n_fft)) que tocan cada segmento
+            paso = n_fft - solape
+            n_tramas = (len(senal) - n_fft) // paso + 1
+            f = np.fft.rfftfreq(n_fft, 1 / self.fs)
+            t = (n_fft / 2 + paso * np.arange(n_tramas)) / self.fs
+            Sxx = np.zeros((len(f), n_tramas), dtype=self.tipo)
+            for inicio, fin in segmentos:
+                k0 = max(0, -(-(inicio - n_fft + 1) // paso))
+                k1 = min(n_tramas, (fin - 1) // paso + 1)
+                if k0 < k1:
+                    Sxx[:, k0:k1] = espectrograma(senal[k0 * paso:(k1 - 1) * paso + n_fft])[2]
         
         # Convertir a dB
         Sxx_db = 10 * np.log10(Sxx + 1e-10)
         
         return f, t, Sxx_db
     
+    def crear_stft_incremental(self, ventana=None, solape=None, n_fft=None):
+        """
+        Crea un STFT incremental con los mismos parámetros que calcular_espectrograma
+        """
+        if n_fft is None:
+            n_fft = self.config.ventana_fft
+        if ventana is None:
+            ventana = self.config.ventana_spectrogram
+        if solape is None:
+            solape = self.config.solape_fft
+            
+        return STFTIncremental(self.fs, ventana, n_fft, solape, self.tipo)
+
+    def crear_estimador_snr(self):
+        """
+        Crea un estimador de SNR incremental con los parámetros snr_* de config
+        """
+        return EstimadorSNR(self.fs, self.config.snr_duracion_trama_s, self.config.snr_duracion_segmento_s,
+                            self.config.snr_ventana_minimos_s, umbral_db=self.config.snr_umbral_db,
+                            tipo=self.tipo)
+    
     def calcular_snr(self, senal, metodo='silicio'):
         """
         Calcula relación señal-ruido (SNR) en dB
@@ -89,14 +188,18 @@ class AnalizadorEspectral:
             senal_util = senal[mascara_senal]
             ruido = senal[mascara_ruido]
             
+        elif metodo == 'minimos':
+            # Piso de ruido por estadística de mínimos sobre tramas (EstimadorSNR)
+            return self.crear_estimador_snr().estimar(senal)
+            
         else:
             raise ValueError("Método no válido")
         
         if len(senal_util) == 0 or len(ruido) == 0:
             return 0
             
-        potencia_senal = np.mean(senal_util**2)
-        potencia_ruido = np.mean(ruido**2)
+        potencia_senal = np.mean(senal_util**2, dtype=np.float64)
+        potencia_ruido = np.mean(ruido**2, dtype=np.float64)
         
         if potencia_ruido == 0:
             return float('inf')
@@ -116,7 +219,7 @@ class AnalizadorEspectral:
         for i in range(len(bandas) - 1):
             mascara = (frecuencias >= bandas[i]) & (frecuencias < bandas[i + 1])
             if np.any(mascara):
-                energia = np.sum(fft[mascara]**2)
+                energia = np.sum(fft[mascara]**2, dtype=np.float64)
                 energias.append(energia)
             else:
                 energias.append(0)
@@ -155,10 +258,133 @@ class AnalizadorEspectral:
             return frecuencias[idx[0]]
         return frecuencias[-1]
     
-    def guardar_resultados(self, resultados, archivo_salida):
+    def calcular_fft_lote(self, senales, ventana=None, n_fft=None):
+        """
+        Calcula la FFT de un lote de señales (arreglo 2-D, una señal por fila)
+        """
+        if n_fft is None:
+            n_fft = self.config.ventana_fft
+        if ventana is None:
+            ventana = self.config.ventana_spectrogram
+            
+        senales = np.atleast_2d(np.asarray(senales, dtype=self.tipo))
+        win = self.obtener_ventana(ventana, senales.shape[-1])
+        
+        espectros = np.fft.rfft(senales * win, n=n_fft, axis=-1).astype(self.tipo_complejo, copy=False)
+        magnitudes = np.abs(espectros)
+        frecuencias = self.obtener_frecuencias(n_fft)
+        
+        return frecuencias, magnitudes
+    
+    def calcular_energia_subbandas_lote(self, ffts, frecuencias, bandas=None):
+        """
+        Calcula energía en subbandas para un lote de espectros (filas × bins)
+        """
+        if bandas is None:
+            bandas = self.config.bandas_energia
+            
+        # Matriz bins × bandas con la pertenencia de cada bin a su banda
+        indice_banda = np.searchsorted(bandas, frecuencias, side='right') - 1
+        validos = (indice_banda >= 0) & (indice_banda < len(bandas) - 1)
+        pertenencia = np.zeros((len(frecuencias), len(bandas) - 1), dtype=self.tipo)
+        pertenencia[np.nonzero(validos)[0], indice_banda[validos]] = 1.0
+        
+        return (np.atleast_2d(ffts)**2) @ pertenencia
+    
+    def calcular_centroide_espectral_lote(self, ffts, frecuencias):
+        """
+        Calcula centroide espectral para un lote de espectros (filas × bins)
+        """
+        ffts = np.atleast_2d(ffts)
+        suma = np.sum(ffts, axis=-1)
+        ponderada = np.sum(frecuencias * ffts, axis=-1)
+        
+        centroides = np.zeros(len(suma))
+        np.divide(ponderada, suma, out=centroides, where=suma != 0)
+        return centroides
+    
+    def calcular_ancho_banda_espectral_lote(self, ffts, frecuencias, percentil=90):
+        """
+        Calcula ancho de banda espectral para un lote de espectros (filas × bins)
+        """
+        ffts = np.atleast_2d(ffts)
+        energia_total = np.cumsum(ffts, axis=-1)
+        total = energia_total[:, -1:]
+        
+        energia_normalizada = np.zeros_like(energia_total)
+        np.divide(energia_total, total, out=energia_normalizada, where=total != 0)
+        
+        # Primer bin donde se alcanza el percentil (último bin si no se alcanza)
+        alcanzado = energia_normalizada >= percentil/100
+        idx = np.where(alcanzado.any(axis=-1), alcanzado.argmax(axis=-1), len(frecuencias) - 1)
+        
+        anchos = np.asarray(frecuencias, dtype=float)[idx]
+        anchos[total[:, 0] == 0] = 0
+        return anchos
+    
+    def calcular_snr_lote(self, senales, metodo='silicio'):
         """
-        Guarda resultados en archivo JSON
+        Calcula SNR en dB para un lote de señales (arreglo 2-D, una señal por fila)
         """
+        senales = np.atleast_2d(senales)
+        cuadrados = senales**2
+        
+        if metodo == 'silicio' and senales.shape[-1] > 2000:
+            # Primeros 1000 samples como ruido
+            n_ruido = np.full(len(senales), 1000)
+            n_senal = np.full(len(senales), senales.shape[-1] - 1000)
+            potencia_ruido = np.mean(cuadrados[:, :1000], axis=-1)
+            potencia_senal = np.mean(cuadrados[:, 1000:], axis=-1)
+        else:
+            amplitud = np.abs(senales)
+            if metodo == 'silicio':
+                # Para señales cortas, usar percentil bajo como ruido
+                umbral = np.percentile(amplitud, 10, axis=-1, keepdims=True)
+                mascara_senal = amplitud >= umbral
+            elif metodo == 'segmentacion':
+                umbral = 0.1 * np.max(amplitud, axis=-1, keepdims=True)
+                mascara_senal = amplitud > umbral
+            else:
+                raise ValueError("Método no válido")
+            mascara_ruido = ~mascara_senal
+            
+            n_senal = np.count_nonzero(mascara_senal, axis=-1)
+            n_ruido = senales.shape[-1] - n_senal
+            potencia_senal = np.sum(cuadrados * mascara_senal, axis=-1) / np.maximum(n_senal, 1)
+            potencia_ruido = np.sum(cuadrados * mascara_ruido, axis=-1) / np.maximum(n_ruido, 1)
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            snr = 10 * np.log10(potencia_senal / potencia_ruido)
+        snr[potencia_ruido == 0] = np.inf
+        snr[(n_senal == 0) | (n_ruido == 0)] = 0
+        
+        return snr
+    
+    def analizar_lote(self, senales, metodo_snr='silicio'):
+        """
+        Análisis espectral completo de un lote de señales en una sola pasada
+        """
+        senales = np.atleast_2d(senales)
+        frecuencias, magnitudes = self.calcular_fft_lote(senales)
+        
+        return {
+            'frecuencias': frecuencias,
+            'fft': magnitudes,
+            'energias_subbandas': self.calcular_energia_subbandas_lote(magnitudes, frecuencias),
+            'centroide_espectral': self.calcular_centroide_espectral_lote(magnitudes, frecuencias),
+            'ancho_banda_espectral': self.calcular_ancho_banda_espectral_lote(magnitudes, frecuencias),
+            'snr': self.calcular_snr_lote(senales, metodo_snr)
+        }
+    
+    def guardar_resultados(self, resultados, archivo_salida, fuente=None):
+        """
+        Guarda resultados: en un almacén columnar si archivo_salida es un
+        directorio (ver almacen_resultados), o en un archivo JSON si
+        termina en .json
+        """
+        if not archivo_salida.endswith('.json'):
+            return self.guardar_resultados_almacen(resultados, archivo_salida, fuente)
+
         # Convertir numpy arrays a listas para JSON
         resultados_json = {}
         for key, value in resultados.items():
@@ -170,4 +396,218 @@ class AnalizadorEspectral:
         with open(archivo_salida, 'w') as f:
             json.dump(resultados_json, f, indent=4)
             
-        print(f"Resultados guardados en: {archivo_salida}")
\ No newline at end of file
+        print(f"Resultados guardados en: {archivo_salida}")
+
+    def guardar_resultados_almacen(self, resultados, directorio=None, fuente=None):
+        """
+        Agrega los resultados como una fila del almacén columnar
+
+        Retorna el índice de la fila agregada.
+        """
+        if directorio is None:
+            directorio = self.config.ruta_almacen
+        if directorio not in self._almacenes:
+            self._almacenes[directorio] = AlmacenResultados(directorio)
+
+        fila = self._almacenes[directorio].agregar(resultados, fuente)
+        print(f"Resultados agregados a: {directorio} (fila {fila})")
+        return fila
+
+
+class STFTIncremental:
+    """
+    Espectrograma por bloques con memoria fija
+
+    Recibe bloques de cualquier tamaño, conserva internamente el solape
+    entre tramas y entrega las columnas a medida que se completan. La
+    concatenación de todas las columnas coincide con signal.spectrogram
+    (detrend constante, escala de densidad, espectro unilateral) sobre la
+    señal completa. Ventana, muestras pendientes y columnas usan 'tipo'.
+    """
+
+    def __init__(self, fs, ventana, n_fft, solape, tipo=np.float64):
+        if not 0 <= solape < n_fft:
+            raise ValueError("El solape debe ser menor que la ventana")
+
+        self.fs = fs
+        self.tipo = np.dtype(tipo)
+        self.n_fft = n_fft
+        self.paso = n_fft - solape
+        self.ventana = signal.get_window(ventana, n_fft).astype(self.tipo)
+        self.frecuencias = np.fft.rfftfreq(n_fft, 1/fs)
+
+        # Escala de densidad espectral unilateral
+        self.escala = np.full(len(self.frecuencias), 1.0 / (fs * np.sum(self.ventana**2, dtype=np.float64)),
+                              dtype=self.tipo)
+        if n_fft % 2:
+            self.escala[1:] *= 2
+        else:
+            self.escala[1:-1] *= 2
+
+        self.reiniciar()
+
+    def reiniciar(self):
+        """
+        Descarta las muestras pendientes y reinicia el conteo de tramas
+        """
+        self._pendiente = np.zeros(0, dtype=self.tipo)
+        self.tramas = 0
+
+    def procesar_bloque(self, bloque, db=True):
+        """
+        Agrega un bloque y retorna (tiempos, columnas) de las tramas completadas
+
+        columnas tiene forma (frecuencias × tramas), igual que signal.spectrogram.
+        """
+        senal = np.concatenate((self._pendiente, np.asarray(bloque, dtype=self.tipo)))
+        n_tramas = 0
+        if len(senal) >= self.n_fft:
+            n_tramas = (len(senal) - self.n_fft) // self.paso + 1
+
+        if n_tramas == 0:
+            self._pendiente = senal
+            return np.zeros(0), np.zeros((len(self.frecuencias), 0), dtype=self.tipo)
+
+        tramas = np.lib.stride_tricks.sliding_window_view(senal, self.n_fft)[::self.paso][:n_tramas]
+        tramas = tramas - tramas.mean(axis=-1, keepdims=True)
+        espectro = np.fft.rfft(tramas * self.ventana, axis=-1)
+        Sxx = (espectro.real**2 + espectro.imag**2) * self.escala
+
+        tiempos = (self.n_fft / 2 + self.paso * (self.tramas + np.arange(n_tramas))) / self.fs
+        self.tramas += n_tramas
+        self._pendiente = senal[n_tramas * self.paso:].copy()
+
+        if db:
+            Sxx = 10 * np.log10(Sxx + 1e-10)
+
+        return tiempos, Sxx.T
+
+    def columnas(self, bloque, db=True):
+        """
+        Generador de (tiempo, columna) para cada trama completada por el bloque
+        """
+        tiempos, Sxx = self.procesar_bloque(bloque, db)
+        for i, t in enumerate(tiempos):
+            yield t, Sxx[:, i]
+
+
+class EstimadorSNR:
+    """
+    SNR incremental por tramas con memoria constante
+
+    Cada trama de duracion_trama segundos aporta su potencia media. El piso
+    de ruido se sigue por estadística de mínimos: la potencia suavizada
+    (alfa) se minimiza sobre una ventana de ~ventana_minimos segundos,
+    dividida en sub-ventanas cuyos mínimos se guardan en una cola fija, y
+    se corrige por el sesgo del mínimo. Las tramas que superan el piso en
+    umbral_db se cuentan como señal y el resto como ruido, igual que la
+    segmentación por energía de calcular_snr pero sin ver toda la señal.
+
+    SNR acumulado = 10·log10(P_media_tramas_señal / P_media_tramas_ruido)
+    SNR por segmento: igual, sobre cada segmento de duracion_segmento s,
+    con el piso de ruido vigente como referencia si el segmento no tuvo
+    tramas de ruido.
+    """
+
+    def __init__(self, fs, duracion_trama=0.02, duracion_segmento=1.0, ventana_minimos=3.0,
+                 sub_ventanas=8, alfa=0.85, sesgo=1.5, umbral_db=6.0, tipo=np.float64):
+        self.fs = fs
+        self.tipo = np.dtype(tipo)
+        self.tam_trama = max(int(round(duracion_trama * fs)), 1)
+        self.tramas_segmento = max(int(round(duracion_segmento * fs / self.tam_trama)), 1)
+        tramas_ventana = max(int(round(ventana_minimos * fs / self.tam_trama)), sub_ventanas)
+        self.tramas_sub_ventana = -(-tramas_ventana // sub_ventanas)
+        self.sub_ventanas = sub_ventanas
+        self.alfa = alfa
+        self.sesgo = sesgo
+        self.umbral = 10 ** (umbral_db / 10)
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Olvida el piso de ruido, los acumulados y las muestras pendientes"""
+        self._pendiente = np.zeros(0, dtype=self.tipo)
+        self._suavizada = None
+        self._minimos = deque(maxlen=self.sub_ventanas)
+        self._minimo_actual = np.inf
+        self._en_sub_ventana = 0
+        self.piso_ruido = None
+
+        self.tramas = 0
+        # [suma potencia, tramas] de señal y de ruido: total y segmento en curso
+        self._total = np.zeros((2, 2))
+        self._segmento = np.zeros((2, 2))
+        self._tramas_segmento = 0
+
+    def _actualizar_piso(self, potencia):
+        """Estadística de mínimos sobre la potencia suavizada de una trama"""
+        if self._suavizada is None:
+            self._suavizada = potencia
+        else:
+            self._suavizada = self.alfa * self._suavizada + (1 - self.alfa) * potencia
+
+        self._minimo_actual = min(self._minimo_actual, self._suavizada)
+        self._en_sub_ventana += 1
+        if self._en_sub_ventana == self.tramas_sub_ventana:
+            self._minimos.append(self._minimo_actual)
+            self._minimo_actual = np.inf
+            self._en_sub_ventana = 0
+
+        minimo = min(min(self._minimos, default=np.inf), self._minimo_actual)
+        self.piso_ruido = self.sesgo * minimo
+
+    @staticmethod
+    def _snr_db(acumulado, piso_ruido):
+        (p_senal, n_senal), (p_ruido, n_ruido) = acumulado
+        if n_senal == 0:
+            return 0.0
+        potencia_ruido = p_ruido / n_ruido if n_ruido > 0 else piso_ruido
+        if not potencia_ruido:
+            return float('inf')
+        return float(10 * np.log10((p_senal / n_senal) / potencia_ruido))
+
+    def procesar_bloque(self, bloque):
+        """
+        Agrega un bloque de cualquier tamaño
+
+        Retorna la lista de segmentos completados, cada uno un dict con
+        t_inicio, t_fin, snr_db, actividad (fracción de tramas de señal) y
+        piso_ruido.
+        """
+        senal = np.concatenate((self._pendiente, np.asarray(bloque, dtype=self.tipo)))
+        n_tramas = len(senal) // self.tam_trama
+        potencias = np.mean(senal[:n_tramas * self.tam_trama].reshape(n_tramas, self.tam_trama)**2, axis=1,
+                            dtype=np.float64)
+        self._pendiente = senal[n_tramas * self.tam_trama:].copy()
+
+        segmentos = []
+        for potencia in potencias:
+            self._actualizar_piso(potencia)
+            es_ruido = int(potencia <= self.umbral * self.piso_ruido)
+            self._total[es_ruido] += (potencia, 1)
+            self._segmento[es_ruido] += (potencia, 1)
+            self.tramas += 1
+            self._tramas_segmento += 1
+
+            if self._tramas_segmento == self.tramas_segmento:
+                t_fin = self.tramas * self.tam_trama / self.fs
+                segmentos.append({
+                    't_inicio': t_fin - self._tramas_segmento * self.tam_trama / self.fs,
+                    't_fin': t_fin,
+                    'snr_db': self._snr_db(self._segmento, self.piso_ruido),
+                    'actividad': self._segmento[0, 1] / self._tramas_segmento,
+                    'piso_ruido': self.piso_ruido
+                })
+                self._segmento[:] = 0
+                self._tramas_segmento = 0
+
+        return segmentos
+
+    def snr(self):
+        """SNR acumulado (dB) de todo lo procesado"""
+        return self._snr_db(self._total, self.piso_ruido)
+
+    def estimar(self, senal):
+        """SNR de una señal completa (reinicia el estado)"""
+        self.reiniciar()
+        self.procesar_bloque(senal)
+        return self.snr()
@@ -0,0 +1,164 @@
+"""
+Caché de diseños de filtros (LRU con persistencia opcional en disco)
+"""
+
+import atexit
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class CacheLRU:
+    """
+    Caché LRU acotada con persistencia opcional
+
+    Si se indica una ruta, el contenido se carga al crear la caché y se
+    reescribe (de forma atómica) cada guardar_cada entradas nuevas y al
+    terminar el proceso, de modo que un proceso reiniciado no vuelve a
+    calcular lo ya calculado.
+
+    Los arreglos de los valores se devuelven marcados como de solo
+    lectura, ya que todos los llamadores comparten el mismo objeto: quien
+    necesite modificarlos debe copiarlos. Con solo_lectura=False se pueden
+    modificar (p.ej. buffers de trabajo reutilizables).
+    """
+
+    def __init__(self, capacidad=128, ruta=None, solo_lectura=True, guardar_cada=32):
+        self.capacidad = capacidad
+        self.ruta = ruta
+        self.solo_lectura = solo_lectura
+        self.guardar_cada = guardar_cada
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self._sin_guardar = 0  # Entradas nuevas desde el último guardado
+
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+
+        if ruta is not None:
+            self.cargar()
+            atexit.register(self.guardar_pendiente)
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def __contains__(self, clave):
+        return clave in self._entradas
+
+    def obtener(self, clave, calcular):
+        """
+        Retorna el valor de la clave, calculándolo con calcular() si no está
+        """
+        with self._lock:
+            if clave in self._entradas:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return self._entradas[clave]
+            self.fallos += 1
+
+        valor = calcular()
+        if self.solo_lectura:
+            _solo_lectura(valor)
+
+        with self._lock:
+            self._entradas[clave] = valor
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.capacidad:
+                self._entradas.popitem(last=False)
+                self.desalojos += 1
+            self._sin_guardar += 1
+            guardar = self.ruta is not None and self._sin_guardar >= self.guardar_cada
+
+        if guardar:
+            self.guardar()
+
+        return valor
+
+    def estadisticas(self):
+        """Aciertos, fallos y ocupación de la caché"""
+        consultas = self.aciertos + self.fallos
+        return {
+            'entradas': len(self._entradas),
+            'capacidad': self.capacidad,
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'desalojos': self.desalojos,
+            'tasa_aciertos': self.aciertos / consultas if consultas else 0.0
+        }
+
+    def limpiar(self):
+        """Elimina todas las entradas (no borra el archivo persistido)"""
+        with self._lock:
+            self._entradas.clear()
+
+    def guardar(self):
+        """Escribe la caché en disco de forma atómica"""
+        directorio = os.path.dirname(self.ruta)
+        if directorio and not os.path.exists(directorio):
+            os.makedirs(directorio)
+
+        with self._lock:
+            contenido = list(self._entradas.items())
+            self._sin_guardar = 0
+
+        temporal = f"{self.ruta}.{os.getpid()}.tmp"
+        try:
+            with open(temporal, 'wb') as f:
+                pickle.dump(contenido, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporal, self.ruta)
+        except OSError as e:
+            print(f"⚠️  No se pudo guardar la caché de diseños: {e}")
+
+    def guardar_pendiente(self):
+        """Guarda la caché si tiene entradas nuevas sin persistir"""
+        if self.ruta is not None and self._sin_guardar > 0:
+            self.guardar()
+
+    def cargar(self):
+        """Carga las entradas persistidas, si existen"""
+        if not os.path.exists(self.ruta):
+            return
+
+        try:
+            with open(self.ruta, 'rb') as f:
+                contenido = pickle.load(f)
+        except Exception as e:
+            print(f"⚠️  Caché de diseños ilegible, se ignora: {e}")
+            return
+
+        with self._lock:
+            for clave, valor in contenido[-self.capacidad:]:
+                self._entradas[clave] = _solo_lectura(valor)
+
+
+def _solo_lectura(valor):
+    """Marca como no modificables los arreglos de un valor en caché"""
+    if isinstance(valor, np.ndarray):
+        valor.setflags(write=False)
+    elif isinstance(valor, (tuple, list)):
+        for elemento in valor:
+            _solo_lectura(elemento)
+    elif isinstance(valor, dict):
+        for elemento in valor.values():
+            _solo_lectura(elemento)
+    return valor
+
+
+_caches = {}
+
+
+def obtener_cache_disenos(config):
+    """
+    Caché de diseños compartida por todos los módulos con la misma ruta
+    """
+    ruta = config.cache_disenos_ruta
+    cache = _caches.get(ruta)
+    if cache is None:
+        cache = CacheLRU(config.cache_disenos_capacidad, ruta,
+                         guardar_cada=config.cache_disenos_guardar_cada)
+        _caches[ruta] = cache
+    return cache
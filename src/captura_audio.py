@@ -3,23 +3,25 @@ Módulo para captura y manejo de audio
 """
 
 import numpy as np
-try:
-    import sounddevice as sd
-    import soundfile as sf
-    import librosa
-except ImportError:
-    print("⚠️  Módulos de audio no disponibles, usando modo simulado")
-    sd = None
-    sf = None
-    librosa = None
 import os
 from datetime import datetime
 
+from importacion_diferida import importar_diferido
+from lector_wav import LectorWAV, FormatoWAVNoSoportado
+from politica_tipos import tipo_real
+from remuestreo import Remuestreador
+
+# Se importan al primer uso (grabación, escritura WAV o decodificación con librosa)
+sd = importar_diferido('sounddevice', aviso="⚠️  Módulo sounddevice no disponible, usando modo simulado")
+sf = importar_diferido('soundfile', aviso="⚠️  Módulo soundfile no disponible")
+librosa = importar_diferido('librosa', aviso="⚠️  Módulo librosa no disponible, solo se leen WAV nativos")
+
 class CapturadorAudio:
     def __init__(self, config):
         self.config = config
         self.fs = config.fs
         self.canales = config.canales
+        self.tipo = tipo_real(config)
         
     def grabar_audio(self, archivo_salida, duracion=None):
         """
@@ -41,7 +43,7 @@ class CapturadorAudio:
             sd.wait()  # Esperar hasta que termine la grabación
             
             # Convertir a array 1D si es estéreo
-            audio = audio.flatten()
+            audio = audio.flatten().astype(self.tipo, copy=False)
             
             # Guardar archivo WAV
             sf.write(archivo_salida, audio, self.fs)
@@ -54,19 +56,55 @@ class CapturadorAudio:
             # Crear señal de prueba si falla la grabación
             return self.generar_senal_prueba(duracion)
     
-    def cargar_audio(self, archivo_entrada):
+    def cargar_audio(self, archivo_entrada, respaldo=True):
         """
         Carga archivo de audio existente
+        
+        Los WAV PCM/float se leen con el lector nativo y, si no están a la
+        frecuencia de trabajo, se remuestrean con el filtro polifásico;
+        librosa queda solo para formatos comprimidos.
+        
+        Un WAV float32 mono con tipo_real float32 se retorna como vista de
+        solo lectura del mapeo (sin copia).
+        
+        Con respaldo=True un archivo faltante o ilegible se reemplaza por
+        la señal de prueba; con respaldo=False se propaga la excepción
+        (procesamiento por lotes).
         """
         try:
+            lector = self.abrir_audio(archivo_entrada)
+            if lector is not None:
+                with lector:
+                    audio = np.asarray(lector.leer(), dtype=self.tipo)
+                if lector.fs != self.fs:
+                    remuestreador = Remuestreador(self.config, lector.fs, self.fs)
+                    audio = remuestreador.remuestrear(audio)
+                print(f"Audio cargado: {archivo_entrada}")
+                return audio, self.fs
+            
             audio, fs = librosa.load(archivo_entrada, sr=self.fs)
             print(f"Audio cargado: {archivo_entrada}")
-            return audio, fs
+            return np.asarray(audio, dtype=self.tipo), fs
         except Exception as e:
+            if not respaldo:
+                raise
             print(f"Error cargando audio: {e}")
             # Generar señal de prueba si no existe el archivo
             return self.generar_senal_prueba(3), self.fs
     
+    def abrir_audio(self, archivo_entrada):
+        """
+        Abre un WAV como vista mapeada en memoria para leerlo por bloques
+        
+        Retorna None si el archivo no es un WAV que el lector nativo soporte.
+        """
+        if not archivo_entrada.lower().endswith('.wav'):
+            return None
+        try:
+            return LectorWAV(archivo_entrada)
+        except FormatoWAVNoSoportado:
+            return None
+    
     def generar_senal_prueba(self, duracion):
         """
         Genera señal de prueba senoidal con ruido
@@ -96,7 +134,7 @@ class CapturadorAudio:
         
         print("Generada señal de prueba (440 Hz + ruido 50 Hz + ruido blanco)")
         
-        return senal_completa
+        return senal_completa.astype(self.tipo)
     
     def listar_archivos_audio(self, directorio):
         """
@@ -5,27 +5,43 @@ Orange Pi 5 Plus - Procesamiento Digital de Señales
 """
 
 import json
+import threading
 import time
-try:
-    import paho.mqtt.client as mqtt
-except ImportError:
-    print("⚠️  Módulo paho-mqtt no disponible, comunicación MQTT deshabilitada")
-    mqtt = None
+from collections import OrderedDict, deque
 from datetime import datetime
 
+from formato_binario import crear_codificador
+from importacion_diferida import importar_diferido
+
+mqtt = importar_diferido('paho.mqtt.client',
+                         aviso="⚠️  Módulo paho-mqtt no disponible, comunicación MQTT deshabilitada")
+
 class ComunicadorMQTT:
     """Clase para manejar comunicación MQTT de datos procesados"""
 
-    def __init__(self, config, broker="broker.hivemq.com", port=1883, topic="dsp/proyecto/voz"):
-        """Inicializar cliente MQTT"""
+    def __init__(self, config, broker="broker.hivemq.com", port=1883, topic="dsp/proyecto/voz",
+                 cliente=None, verboso=True):
+        """
+        Inicializar cliente MQTT
+
+        cliente: cliente ya creado (p.ej. ClienteMQTTLocal para pruebas) en
+        lugar de conectar con paho-mqtt
+        """
         self.config = config
         self.broker = broker
         self.port = port
         self.topic = topic
+        self.verboso = verboso
         self.client = None
+        self.publicador = None
+        self.codificador = None
 
         # Inicializar cliente
-        self.conectar()
+        if cliente is not None:
+            self.client = cliente
+            self.client.on_publish = self.on_publish
+        else:
+            self.conectar()
 
     def conectar(self):
         """Conectar al broker MQTT"""
@@ -47,9 +63,36 @@ class ComunicadorMQTT:
         else:
             print(f"❌ Fallo de conexión MQTT, código: {rc}")
 
-    def on_publish(self, client, userdata, mid):
+    def on_publish(self, client, userdata, mid, *args):
         """Callback de publicación"""
-        print(f"✅ Mensaje publicado (ID: {mid})")
+        if self.publicador is not None:
+            self.publicador.confirmar(mid)
+        if self.verboso:
+            print(f"✅ Mensaje publicado (ID: {mid})")
+
+    def crear_publicador(self, topic=None, **opciones):
+        """
+        Crea (e inicia) un publicador asíncrono sobre este cliente
+
+        Las opciones no indicadas se toman de config (mqtt_*).
+        """
+        if self.client is None:
+            print("❌ Cliente MQTT no conectado")
+            return None
+
+        parametros = {
+            'codificador': crear_codificador(self.config) if self.config.mqtt_formato == 'binario' else None,
+            'capacidad': self.config.mqtt_capacidad_cola,
+            'tam_lote': self.config.mqtt_tam_lote,
+            'espera_lote': self.config.mqtt_espera_lote_s,
+            'politica': self.config.mqtt_politica_cola,
+            'max_en_vuelo': self.config.mqtt_max_en_vuelo
+        }
+        parametros.update(opciones)
+
+        self.publicador = PublicadorAsincrono(self.client, topic or self.topic, **parametros)
+        self.publicador.iniciar()
+        return self.publicador
 
     def publicar_datos(self, datos):
         """Publicar datos procesados via MQTT"""
@@ -87,9 +130,369 @@ class ComunicadorMQTT:
         }
         return self.publicar_datos(datos_evento)
 
+    def publicar_metricas(self, metricas):
+        """
+        Publicar métricas de instrumentación en <topic>/metricas (qos 0,
+        sin esperar confirmación)
+        """
+        if self.client is None:
+            print("❌ Cliente MQTT no conectado")
+            return False
+
+        try:
+            self.client.publish(f"{self.topic}/metricas", json.dumps(metricas), qos=0)
+            return True
+
+        except Exception as e:
+            print(f"❌ Error publicando métricas: {e}")
+            return False
+
+    def publicar_binario(self, valores, tipo='espectro'):
+        """
+        Publicar un espectro o vector de características en formato binario
+        (ver formato_binario) en el topic <topic>/bin
+        """
+        if self.client is None:
+            print("❌ Cliente MQTT no conectado")
+            return False
+
+        if self.codificador is None:
+            self.codificador = crear_codificador(self.config)
+
+        try:
+            payload = self.codificador.codificar(valores, tipo)
+            self.client.publish(f"{self.topic}/bin", payload, qos=1)
+            return True
+
+        except Exception as e:
+            print(f"❌ Error publicando datos binarios: {e}")
+            return False
+
     def desconectar(self):
-        """Desconectar del broker"""
+        """Desconectar del broker, enviando antes lo que quede en la cola del publicador"""
+        if self.publicador is not None:
+            self.publicador.detener()
+            self.publicador = None
         if self.client:
             self.client.loop_stop()
             self.client.disconnect()
-            print("✅ Desconectado de MQTT broker")
\ No newline at end of file
+            print("✅ Desconectado de MQTT broker")
+
+
+class PublicadorAsincrono:
+    """
+    Publicador MQTT no bloqueante con cola acotada y envío por lotes
+
+    publicar() solo encola y retorna de inmediato. Un hilo de fondo agrupa
+    hasta tam_lote tramas (o las que lleguen en espera_lote segundos) en un
+    único mensaje JSON y lo publica sin esperar la confirmación. Si hay
+    max_en_vuelo mensajes sin confirmar, el hilo deja de enviar y la cola
+    se llena; entonces se aplica la política:
+
+        'descartar_nuevos':   se rechaza la trama nueva
+        'descartar_antiguos': se descarta la trama más antigua de la cola
+        'coalescer':          la trama nueva reemplaza a la última encolada de
+                              su misma clase (arreglos del mismo tipo, o
+                              dicts de resultados); los eventos (dicts con
+                              'evento') nunca se reemplazan. Sin trama de la
+                              misma clase se descarta la más antigua
+
+    Con un codificador (formato_binario.CodificadorBinario) los arreglos
+    publicados con publicar(valores, tipo) se envían como tramas DSPB
+    concatenadas en <topic>/bin, con un codificador por tipo (cada uno con
+    su propia cadena de deltas); los dicts (eventos, metadatos) siguen
+    yendo como JSON a <topic>. Se codifican en el hilo de envío, después de
+    aplicar la política, para no romper la cadena de deltas con tramas
+    descartadas, y cada trama acumula el tamaño que tendría en JSON para
+    las estadísticas de ahorro.
+    """
+
+    POLITICAS = ('descartar_nuevos', 'descartar_antiguos', 'coalescer')
+
+    def __init__(self, cliente, topic, qos=1, capacidad=256, tam_lote=10, espera_lote=0.1,
+                 politica='descartar_antiguos', max_en_vuelo=20, codificador=None, tipo_binario='espectro'):
+        if politica not in self.POLITICAS:
+            raise ValueError(f"Política no válida: {politica}")
+
+        self.cliente = cliente
+        self.topic = topic
+        self.qos = qos
+        self.capacidad = capacidad
+        self.tam_lote = tam_lote
+        self.espera_lote = espera_lote
+        self.politica = politica
+        self.max_en_vuelo = max_en_vuelo
+        self.codificador = codificador
+        self.tipo_binario = tipo_binario
+        self.topic_binario = f"{topic}/bin"
+        self._codificadores = {tipo_binario: codificador} if codificador is not None else {}
+
+        self._cola = deque()  # (instante de encolado, datos, hora de encolado, tipo)
+        self._en_vuelo = {}  # mid -> instante de publicación
+        # Confirmaciones que llegaron antes de registrar su mid (acuse
+        # inmediato, p.ej. ClienteMQTTLocal sin latencia): mid -> instante
+        self._confirmadas_antes = OrderedDict()
+        self._condicion = threading.Condition()
+        self._activo = False
+        self._hilo = None
+
+        self.encoladas = 0
+        self.descartadas = 0
+        self.coalescidas = 0
+        self.tramas_enviadas = 0
+        self.mensajes_enviados = 0
+        self.mensajes_confirmados = 0
+        self.bytes_enviados = 0
+        self.errores = 0
+        self._espera_total = 0.0  # Suma de tiempos encolado → envío
+        self._confirmacion_total = 0.0  # Suma de tiempos envío → confirmación
+
+    def iniciar(self):
+        """Inicia el hilo de envío"""
+        if self._hilo is not None:
+            return
+        self._activo = True
+        self._hilo = threading.Thread(target=self._bucle, name="publicador-mqtt", daemon=True)
+        self._hilo.start()
+
+    def detener(self, vaciar=True, timeout=5.0):
+        """
+        Detiene el hilo de envío, enviando antes lo pendiente si vaciar=True
+        """
+        if self._hilo is None:
+            return
+        with self._condicion:
+            if not vaciar:
+                self.descartadas += len(self._cola)
+                self._cola.clear()
+            self._activo = False
+            self._condicion.notify_all()
+        self._hilo.join(timeout)
+        self._hilo = None
+
+    def publicar(self, datos, tipo=None):
+        """
+        Encola una trama para publicación sin bloquear
+
+        tipo: tipo de trama DSPB de un arreglo (formato binario; por
+        defecto tipo_binario). Los dicts se envían siempre como JSON.
+        Retorna False si la trama se rechazó por cola llena.
+        """
+        with self._condicion:
+            self.encoladas += 1
+            if len(self._cola) >= self.capacidad:
+                if self.politica == 'descartar_nuevos':
+                    self.descartadas += 1
+                    return False
+                if self.politica == 'coalescer':
+                    indice = self._ultima_de_clase(datos, tipo)
+                    if indice is not None:
+                        self._cola[indice] = self._cola[indice][:1] + (datos, time.time(), tipo)
+                        self.coalescidas += 1
+                        return True
+                self._cola.popleft()
+                self.descartadas += 1
+
+            self._cola.append((time.perf_counter(), datos, time.time(), tipo))
+            self._condicion.notify()
+        return True
+
+    def _clase(self, datos, tipo):
+        """Clase de coalescencia de una trama (None: no se reemplaza)"""
+        if isinstance(datos, dict):
+            return None if 'evento' in datos else 'resultado'
+        return tipo or self.tipo_binario
+
+    def _ultima_de_clase(self, datos, tipo):
+        """Índice en la cola de la última trama de la misma clase, o None"""
+        clase = self._clase(datos, tipo)
+        if clase is None:
+            return None
+        for indice in range(len(self._cola) - 1, -1, -1):
+            _, encolados, _, tipo_encolado = self._cola[indice]
+            if self._clase(encolados, tipo_encolado) == clase:
+                return indice
+        return None
+
+    def confirmar(self, mid):
+        """
+        Registra la confirmación del broker (llamar desde on_publish)
+
+        publish() se llama fuera del candado, así que la confirmación puede
+        llegar antes de que _publicar_lote registre el mid; en ese caso se
+        guarda y se descuenta al registrarlo.
+        """
+        with self._condicion:
+            t_envio = self._en_vuelo.pop(mid, None)
+            if t_envio is None:
+                self._confirmadas_antes[mid] = time.perf_counter()
+                # Acota los mids ajenos (otros publish del mismo cliente)
+                while len(self._confirmadas_antes) > 2 * self.max_en_vuelo:
+                    self._confirmadas_antes.popitem(last=False)
+                return
+            self.mensajes_confirmados += 1
+            self._confirmacion_total += time.perf_counter() - t_envio
+            self._condicion.notify_all()
+
+    def _bucle(self):
+        """Hilo de envío: forma lotes y los publica"""
+        while True:
+            with self._condicion:
+                # Esperar tramas y capacidad de envío
+                while self._activo and (not self._cola or len(self._en_vuelo) >= self.max_en_vuelo):
+                    self._condicion.wait(0.1)
+                if not self._cola:
+                    if not self._activo:
+                        return
+                    continue
+
+                # Completar el lote mientras no venza la espera
+                limite = self._cola[0][0] + self.espera_lote
+                while self._activo and len(self._cola) < self.tam_lote:
+                    restante = limite - time.perf_counter()
+                    if restante <= 0:
+                        break
+                    self._condicion.wait(restante)
+
+                lote = [self._cola.popleft() for _ in range(min(self.tam_lote, len(self._cola)))]
+
+            self._enviar(lote)
+
+    def _codificador(self, tipo):
+        """Codificador DSPB del flujo de un tipo de trama (se crea al primer uso)"""
+        codificador = self._codificadores.get(tipo)
+        if codificador is None:
+            codificador = self._codificadores[tipo] = self.codificador.para_tipo(tipo)
+        return codificador
+
+    def _enviar(self, lote):
+        """
+        Publica un lote de tramas como un único mensaje (dos con formato
+        binario si el lote mezcla arreglos y dicts)
+        """
+        ahora = time.perf_counter()
+        if self.codificador is None:
+            self._publicar_lote(self.topic, self._json_lote(lote), lote, ahora)
+            return
+
+        binarias = [trama for trama in lote if not isinstance(trama[1], dict)]
+        documentos = [trama for trama in lote if isinstance(trama[1], dict)]
+        if binarias:
+            try:
+                tramas = []
+                for _, datos, t_pared, tipo in binarias:
+                    tipo = tipo or self.tipo_binario
+                    tramas.append(self._codificador(tipo).codificar(datos, tipo, t_pared))
+                payload = b''.join(tramas)
+            except Exception:
+                with self._condicion:
+                    self.errores += 1
+            else:
+                self._publicar_lote(self.topic_binario, payload, binarias, ahora)
+        if documentos:
+            self._publicar_lote(self.topic, self._json_lote(documentos), documentos, ahora)
+
+    @staticmethod
+    def _json_lote(lote):
+        return json.dumps({
+            "timestamp": datetime.now().isoformat(),
+            "tipo": "lote_datos_espectrales",
+            "datos": [datos for _, datos, _, _ in lote]
+        })
+
+    def _publicar_lote(self, topic, payload, lote, ahora):
+        """Publica un mensaje ya armado y registra su mid en vuelo"""
+        try:
+            resultado = self.cliente.publish(topic, payload, qos=self.qos)
+        except Exception:
+            with self._condicion:
+                self.errores += 1
+            return
+
+        with self._condicion:
+            if getattr(resultado, 'rc', 0) != 0:
+                self.errores += 1
+                return
+            t_confirmacion = self._confirmadas_antes.pop(resultado.mid, None)
+            if self.qos > 0:
+                if t_confirmacion is not None:
+                    self.mensajes_confirmados += 1
+                    self._confirmacion_total += max(t_confirmacion - ahora, 0.0)
+                elif resultado.mid not in self._en_vuelo:
+                    self._en_vuelo[resultado.mid] = ahora
+            self.mensajes_enviados += 1
+            self.tramas_enviadas += len(lote)
+            self.bytes_enviados += len(payload)
+            self._espera_total += sum(ahora - t for t, _, _, _ in lote)
+
+    def estadisticas(self):
+        """Estadísticas de entrega"""
+        with self._condicion:
+            return {
+                'encoladas': self.encoladas,
+                'en_cola': len(self._cola),
+                'descartadas': self.descartadas,
+                'coalescidas': self.coalescidas,
+                'tramas_enviadas': self.tramas_enviadas,
+                'mensajes_enviados': self.mensajes_enviados,
+                'mensajes_confirmados': self.mensajes_confirmados,
+                'en_vuelo': len(self._en_vuelo),
+                'bytes_enviados': self.bytes_enviados,
+                'errores': self.errores,
+                'espera_media_ms': 1000 * self._espera_total / self.tramas_enviadas
+                if self.tramas_enviadas else 0.0,
+                'confirmacion_media_ms': 1000 * self._confirmacion_total / self.mensajes_confirmados
+                if self.mensajes_confirmados else 0.0,
+                'binario': {tipo: codificador.estadisticas()
+                            for tipo, codificador in self._codificadores.items()}
+            }
+
+
+class ClienteMQTTLocal:
+    """
+    Sustituto en proceso de un cliente paho-mqtt para pruebas sin broker
+
+    Guarda los mensajes publicados, los entrega a los suscriptores locales
+    y llama a on_publish tras 'latencia' segundos (simula un broker lento).
+    """
+
+    class _Info:
+        def __init__(self, mid):
+            self.mid = mid
+            self.rc = 0
+
+    def __init__(self, latencia=0.0):
+        self.latencia = latencia
+        self.on_publish = None
+        self.mensajes = []  # (topic, payload, qos)
+        self._suscriptores = []  # (topic, función)
+        self._mid = 0
+        self._lock = threading.Lock()
+
+    def suscribir(self, topic, funcion):
+        """Registra funcion(topic, payload) para los mensajes del topic"""
+        self._suscriptores.append((topic, funcion))
+
+    def publish(self, topic, payload, qos=0):
+        with self._lock:
+            self._mid += 1
+            mid = self._mid
+            self.mensajes.append((topic, payload, qos))
+
+        for topic_suscrito, funcion in self._suscriptores:
+            if topic_suscrito == topic:
+                funcion(topic, payload)
+
+        if self.on_publish is not None:
+            if self.latencia > 0:
+                threading.Timer(self.latencia, self.on_publish, (self, None, mid)).start()
+            else:
+                self.on_publish(self, None, mid)
+
+        return self._Info(mid)
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        pass
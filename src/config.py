@@ -9,29 +9,105 @@ class Config:
         self.duracion_grabacion = 3  # segundos
         self.canales = 1  # Mono
         
+        # Política de tipos numéricos (politica_tipos)
+        self.tipo_real = 'float32'  # Audio, estados de filtros, ventanas y espectros; FFT en complex64
+        
         # Parámetros preénfasis
         self.alpha_preenfasis = 0.97
         
+        # Parámetros detección de actividad de voz (DetectorActividadVoz)
+        self.vad_habilitado = False  # Omitir FFT/características/espectrograma/publicación en silencio
+        self.vad_trama_ms = 20
+        self.vad_umbral_db = 9.0  # Energía sobre el piso de ruido para marcar voz
+        self.vad_energia_min_db = -55.0  # Energía mínima absoluta (dBFS)
+        self.vad_zcr_fricativa = 0.25  # ZCR que admite tramas de menor energía
+        self.vad_colgado_ms = 200  # Hangover tras la última trama de voz
+        self.vad_subida_piso_db_s = 1.0  # Velocidad de subida del piso de ruido
+        
         # Parámetros filtro notch
         self.r_notch = 0.95  # Radio de polo (0 < r < 1)
         
+        # Parámetros cancelador adaptativo de red (CanceladorRed)
+        self.cancelador_red = False  # En tiempo real, reemplaza al notch fijo
+        self.red_frecuencia = 'auto'  # 50, 60 o 'auto'
+        self.red_armonicos = 5  # Armónicos cancelados (incluida la fundamental)
+        self.red_suavizado = 0.1  # Peso del ajuste de cada bloque en las amplitudes
+        self.red_seguimiento = 0.1  # Ganancia del seguimiento de frecuencia
+        self.red_desvio_max_hz = 1.0  # Desvío máximo respecto de la nominal
+        
         # Parámetros filtro pasabajos
         self.orden_fir = 101  # Orden del filtro FIR
         self.ventana_fir = 'hamming'
+        self.cache_motores_fir_capacidad = 16  # Motores FIR (espectros de coeficientes) en caché
+        
+        # Frecuencias de trabajo del pipeline
+        self.f_notch = 50  # Frecuencia de la red eléctrica (Hz)
+        self.f_corte = 3400  # Frecuencia de corte pasabajos (Hz)
+        
+        # Caché de diseños de filtros
+        self.cache_disenos_capacidad = 128  # Entradas (desalojo LRU)
+        self.cache_disenos_ruta = None  # p.ej. "datos/cache/disenos.pkl" para persistir
+        self.cache_disenos_guardar_cada = 32  # Entradas nuevas entre guardados (y al salir)
         
         # Parámetros análisis espectral
         self.ventana_fft = 1024
         self.solape_fft = 512
         self.ventana_spectrogram = 'hann'
+        self.cache_fft_capacidad = 16  # Ventanas/ejes de frecuencia en caché
+        
+        # Parámetros SNR incremental (EstimadorSNR)
+        self.snr_duracion_trama_s = 0.02
+        self.snr_duracion_segmento_s = 1.0  # SNR reportado por segmento
+        self.snr_ventana_minimos_s = 3.0  # Ventana de búsqueda del piso (más larga que las frases)
+        self.snr_umbral_db = 6.0  # Tramas sobre el piso + umbral cuentan como señal
         
         # Bandas para análisis de energía
         self.bandas_energia = [0, 250, 500, 1000, 2000, 4000, 8000]
         
+        # Parámetros procesamiento en tiempo real
+        self.duracion_bloque_ms = 20  # Duración de cada bloque (10-32 ms)
+        self.bloques_buffer = 50  # Capacidad del buffer circular en bloques
+        self.publicar_cada_bloques = 50  # Publicar resultados cada N bloques
+        
+        # Parámetros procesamiento por lotes
+        self.trabajadores_lote = None  # Procesos del pool (None = núcleos disponibles)
+        self.tam_lote_archivos = 8  # Archivos por tarea enviada a cada proceso
+        
+        # Parámetros publicación MQTT asíncrona
+        self.mqtt_habilitado = True  # False: sin conexión ni importación de paho-mqtt
+        self.mqtt_capacidad_cola = 256  # Tramas en cola como máximo
+        self.mqtt_tam_lote = 10  # Tramas por mensaje
+        self.mqtt_espera_lote_s = 0.1  # Espera máxima para completar un lote
+        self.mqtt_politica_cola = 'descartar_antiguos'  # o 'descartar_nuevos', 'coalescer'
+        self.mqtt_max_en_vuelo = 20  # Mensajes sin confirmar antes de frenar el envío
+        self.mqtt_formato = 'json'  # o 'binario' (formato_binario, topic <topic>/bin)
+        
+        # Parámetros formato binario
+        self.binario_codificacion = 'f16'  # 'f32', 'f16' o 'u8_db'
+        self.binario_delta = False  # Diferencias entre tramas consecutivas
+        self.binario_intervalo_clave = 50  # Tramas entre tramas clave (con delta)
+        self.binario_compresion = False  # zlib sobre la carga útil
+        self.binario_rango_db = 80.0  # Rango dinámico de 'u8_db'
+        
+        # Parámetros instrumentación
+        self.instrumentacion = False  # Tiempos y muestras por etapa
+        self.instrumentacion_memoria = False  # Además memoria por etapa (tracemalloc, más lento)
+        
         # Parámetros visualización
+        self.graficas = True  # False: sin gráficas ni importación de matplotlib
         self.dpi_figuras = 300
         self.formato_imagen = 'png'
+        self.visualizacion_segundo_plano = False  # Dibujar en un proceso aparte
+        self.visualizacion_cola_max = 4  # Trabajos de dibujo en espera como máximo
+        self.espectrograma_rango_db = 80  # Rango dinámico de la imagen
+        self.espectrograma_techo_db = None  # None: máximo de cada espectrograma
+        self.espectrograma_f_max = 4000  # Frecuencia máxima mostrada (Hz)
+        self.cascada_columnas = 512  # Tramas por tesela de la cascada
+        self.cascada_techo_db = -20  # Techo fijo de la cascada (dB)
+        self.cascada_directorio = "graficas/cascada"
         
         # Rutas
         self.ruta_audio = "datos/audio/"
         self.ruta_resultados = "datos/resultados/"
+        self.ruta_almacen = "datos/resultados/almacen/"
         self.ruta_figuras = "datos/resultados/figuras/"
\ No newline at end of file
@@ -0,0 +1,119 @@
+"""
+Decimación por envolvente mín/máx para graficar señales largas
+
+Una línea de N muestras dibujada en P píxeles de ancho solo puede mostrar,
+en cada columna de píxeles, el trazo vertical entre el mínimo y el máximo
+de las muestras que caen en ella. Reducir cada grupo de muestras a su
+mínimo y su máximo (en el orden en que aparecen) da la misma imagen con
+2·P puntos en lugar de N.
+"""
+
+import numpy as np
+
+
+def _min_max_por_grupo(posiciones, valores, tam):
+    """
+    Reduce grupos consecutivos de tam puntos a su mínimo y máximo
+
+    Retorna (posiciones, valores) intercalados, dos puntos por grupo en
+    orden de aparición. El último grupo puede ser incompleto.
+    """
+    n = len(valores)
+    grupos = -(-n // tam)
+    relleno = grupos * tam - n
+    if relleno:
+        valores_rellenos = np.concatenate((valores, np.repeat(valores[-1:], relleno)))
+    else:
+        valores_rellenos = valores
+    matriz = valores_rellenos.reshape(grupos, tam)
+
+    base = np.arange(grupos) * tam
+    i_min = np.minimum(base + np.argmin(matriz, axis=1), n - 1)
+    i_max = np.minimum(base + np.argmax(matriz, axis=1), n - 1)
+
+    indices = np.empty(2 * grupos, dtype=np.intp)
+    indices[0::2] = np.minimum(i_min, i_max)
+    indices[1::2] = np.maximum(i_min, i_max)
+    return posiciones[indices], valores[indices]
+
+
+def envolvente_min_max(y, n_pixeles, x=None):
+    """
+    Envolvente mín/máx de una serie para n_pixeles columnas
+
+    Retorna (x, y) con a lo sumo ~2·n_pixeles puntos. Si la serie ya es
+    corta se retorna sin cambios. x por defecto son los índices de muestra.
+    """
+    y = np.asarray(y)
+    if x is None:
+        x = np.arange(len(y))
+    if len(y) <= 2 * n_pixeles:
+        return x, y
+    return _min_max_por_grupo(np.asarray(x), y, -(-len(y) // n_pixeles))
+
+
+class PiramideMinMax:
+    """
+    Envolventes mín/máx precalculadas a varias resoluciones
+
+    El nivel 0 agrupa 'base' muestras por punto mín/máx y cada nivel
+    siguiente agrupa 'factor' grupos del anterior. Una consulta por rango
+    usa el nivel más grueso que aún tiene al menos un grupo por píxel, de
+    modo que acercarse a un tramo de una grabación larga no vuelve a
+    recorrer las muestras crudas (salvo los bordes, de menos de un grupo).
+    """
+
+    def __init__(self, y, x=None, base=64, factor=4):
+        self.y = np.asarray(y)
+        self.x = x
+        self.base = base
+        self.factor = factor
+
+        # Niveles: (muestras por grupo, posiciones, valores)
+        self.niveles = []
+        posiciones = np.arange(len(self.y))
+        valores = self.y
+        tam_grupo, agrupar = base, base
+        while len(valores) > 2 * agrupar:
+            posiciones, valores = _min_max_por_grupo(posiciones, valores, agrupar)
+            self.niveles.append((tam_grupo, posiciones, valores))
+            tam_grupo *= factor
+            agrupar = 2 * factor
+
+    def __len__(self):
+        return len(self.y)
+
+    def rango(self, inicio=0, fin=None, n_pixeles=1000):
+        """
+        Envolvente del tramo de muestras [inicio, fin) para n_pixeles columnas
+
+        Retorna (x, y); x son índices de muestra o valores de self.x.
+        """
+        fin = len(self.y) if fin is None else min(fin, len(self.y))
+        inicio = max(inicio, 0)
+
+        # Nivel más grueso con al menos un grupo por píxel
+        nivel = None
+        for tam_grupo, posiciones, valores in self.niveles:
+            if (fin - inicio) // tam_grupo >= n_pixeles:
+                nivel = (tam_grupo, posiciones, valores)
+
+        if nivel is None:
+            posiciones = np.arange(inicio, fin)
+            valores = self.y[inicio:fin]
+        else:
+            tam_grupo, posiciones_nivel, valores_nivel = nivel
+            # Grupos completos dentro del tramo; los bordes salen de las muestras crudas
+            primer = -(-inicio // tam_grupo)
+            ultimo = fin // tam_grupo
+            a, b = 2 * primer, 2 * ultimo
+            borde_ini, borde_fin = primer * tam_grupo, ultimo * tam_grupo
+            posiciones = np.concatenate((np.arange(inicio, borde_ini), posiciones_nivel[a:b],
+                                         np.arange(borde_fin, fin)))
+            valores = np.concatenate((self.y[inicio:borde_ini], valores_nivel[a:b],
+                                      self.y[borde_fin:fin]))
+
+        posiciones, valores = envolvente_min_max(valores, n_pixeles, posiciones)
+        if self.x is not None:
+            posiciones = np.asarray(self.x)[posiciones]
+        return posiciones, valores
@@ -0,0 +1,121 @@
+"""
+Módulo de extracción de características espectrales por trama
+"""
+
+import numpy as np
+
+from analisis_espectral import STFTIncremental
+from politica_tipos import tipo_real
+
+
+class ExtractorCaracteristicas:
+    """
+    Matriz de características (tramas × características) en float32
+
+    Los límites bin → banda de config.bandas_energia se calculan una sola
+    vez para el par (n_fft, fs). Por cada trama se obtienen, en una
+    pasada vectorizada: energías por subbanda, centroide, ancho de banda
+    (dispersión alrededor del centroide), frecuencias de rolloff en varios
+    percentiles y flujo espectral respecto de la trama anterior.
+    """
+
+    def __init__(self, config, n_fft=None, solape=None, percentiles_rolloff=(50, 85, 95)):
+        self.config = config
+        self.fs = config.fs
+        self.tipo = tipo_real(config)
+        self.n_fft = config.ventana_fft if n_fft is None else n_fft
+        if solape is None:
+            solape = config.solape_fft if self.n_fft == config.ventana_fft else self.n_fft // 2
+        self.percentiles_rolloff = tuple(percentiles_rolloff)
+
+        self.frecuencias = np.fft.rfftfreq(self.n_fft, 1/self.fs)
+        self._f = self.frecuencias.astype(self.tipo)  # Momentos en el tipo de la política
+
+        # Límites de banda como índices de bin (bandas [f_i, f_i+1))
+        bandas = np.asarray(config.bandas_energia, dtype=float)
+        limites = np.searchsorted(self.frecuencias, bandas, side='left')
+        self._inicio_bandas = limites[:-1]
+        self._fin_bandas = limites[-1]
+        self._bandas_vacias = limites[1:] == limites[:-1]
+        # reduceat no admite índices iguales a la longitud del eje
+        self._inicio_bandas = np.minimum(self._inicio_bandas, max(self._fin_bandas - 1, 0))
+
+        self.nombres = (
+            [f"energia_{int(bandas[i])}_{int(bandas[i + 1])}" for i in range(len(bandas) - 1)] +
+            ['centroide', 'ancho_banda'] +
+            [f"rolloff_{p}" for p in self.percentiles_rolloff] +
+            ['flujo']
+        )
+
+        self._stft = STFTIncremental(self.fs, config.ventana_spectrogram, self.n_fft, solape, self.tipo)
+        self.reiniciar()
+
+    def reiniciar(self):
+        """
+        Reinicia el STFT interno y la trama anterior usada por el flujo
+        """
+        self._stft.reiniciar()
+        self._anterior = None
+
+    def extraer(self, magnitudes):
+        """
+        Calcula las características de un conjunto de tramas
+
+        magnitudes: arreglo (tramas × bins) con |X(f)| de cada trama
+        """
+        magnitudes = np.atleast_2d(np.asarray(magnitudes, dtype=self.tipo))
+        n_tramas = magnitudes.shape[0]
+        caracteristicas = np.empty((n_tramas, len(self.nombres)), dtype=np.float32)
+        if n_tramas == 0:
+            return caracteristicas
+
+        n_bandas = len(self._inicio_bandas)
+        f = self._f
+
+        # Energías por subbanda
+        potencia = magnitudes[:, :self._fin_bandas]**2
+        if self._fin_bandas > 0:
+            energias = np.add.reduceat(potencia, self._inicio_bandas, axis=1)
+            energias[:, self._bandas_vacias] = 0
+        else:
+            energias = np.zeros((n_tramas, n_bandas))
+        caracteristicas[:, :n_bandas] = energias
+
+        # Centroide y ancho de banda (momentos de |X(f)|)
+        total = magnitudes.sum(axis=1)
+        hay_energia = total > 0
+        divisor = np.where(hay_energia, total, 1.0)
+        centroide = (magnitudes @ f) / divisor
+        varianza = (magnitudes @ f**2) / divisor - centroide**2
+        ancho_banda = np.sqrt(np.maximum(varianza, 0))
+        caracteristicas[:, n_bandas] = np.where(hay_energia, centroide, 0)
+        caracteristicas[:, n_bandas + 1] = np.where(hay_energia, ancho_banda, 0)
+
+        # Rolloff: primer bin donde la energía acumulada alcanza el percentil
+        acumulada = np.cumsum(magnitudes, axis=1)
+        for i, p in enumerate(self.percentiles_rolloff):
+            idx = np.count_nonzero(acumulada < (p / 100) * total[:, None], axis=1)
+            rolloff = f[np.minimum(idx, len(f) - 1)]
+            caracteristicas[:, n_bandas + 2 + i] = np.where(hay_energia, rolloff, 0)
+
+        # Flujo espectral: norma de la diferencia con la trama anterior
+        anterior = magnitudes[0] if self._anterior is None else self._anterior
+        diferencias = np.diff(magnitudes, axis=0, prepend=anterior[None, :])
+        caracteristicas[:, -1] = np.sqrt(np.sum(diferencias**2, axis=1))
+        self._anterior = magnitudes[-1].copy()
+
+        return caracteristicas
+
+    def extraer_bloque(self, bloque):
+        """
+        Agrega un bloque de audio y retorna (tiempos, características) de las tramas completadas
+        """
+        tiempos, Sxx = self._stft.procesar_bloque(bloque, db=False)
+        return tiempos, self.extraer(np.sqrt(Sxx.T))
+
+    def extraer_senal(self, senal):
+        """
+        Matriz de características de una señal completa
+        """
+        self.reiniciar()
+        return self.extraer_bloque(senal)
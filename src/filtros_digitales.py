@@ -2,14 +2,25 @@
 Módulo para diseño e implementación de filtros digitales
 """
 
+import time
+
 import numpy as np
-from scipy import signal
-import matplotlib.pyplot as plt
+
+from cache_disenos import CacheLRU, obtener_cache_disenos
+from importacion_diferida import importar_diferido
+from politica_tipos import tipo_real
+
+fft = importar_diferido('scipy.fft')
+signal = importar_diferido('scipy.signal')
 
 class FiltrosDigitales:
     def __init__(self, config):
         self.config = config
         self.fs = config.fs
+        self.tipo = tipo_real(config)
+        self.cache = obtener_cache_disenos(config)
+        # Motores FIR por coeficientes (espectros en caché); tienen estado, no son de solo lectura
+        self._motores_fir = CacheLRU(config.cache_motores_fir_capacidad, solo_lectura=False)
         
     def diseñar_filtro_notch(self, f0, r=None):
         """
@@ -20,20 +31,26 @@ class FiltrosDigitales:
         if r is None:
             r = self.config.r_notch
             
-        w0 = 2 * np.pi * f0 / self.fs
+        def calcular():
+            w0 = 2 * np.pi * f0 / self.fs
+            
+            # Coeficientes del filtro
+            b = [1, -2 * np.cos(w0), 1]
+            a = [1, -2 * r * np.cos(w0), r * r]
+            
+            return b, a
         
-        # Coeficientes del filtro
-        b = [1, -2 * np.cos(w0), 1]
-        a = [1, -2 * r * np.cos(w0), r * r]
+        b, a = self.cache.obtener(('notch', float(f0), float(r), self.fs), calcular)
         
-        return b, a
+        return list(b), list(a)
     
     def aplicar_filtro_notch(self, senal, f0, r=None):
         """
         Aplica filtro notch a la señal
         """
         b, a = self.diseñar_filtro_notch(f0, r)
-        senal_filtrada = signal.lfilter(b, a, senal)
+        senal_filtrada = signal.lfilter(np.asarray(b, dtype=self.tipo), np.asarray(a, dtype=self.tipo),
+                                        np.asarray(senal, dtype=self.tipo))
         
         return senal_filtrada
     
@@ -42,36 +59,77 @@ class FiltrosDigitales:
         Diseña filtro FIR pasabajos usando método de ventana
         
         h[n] = (ωc/π) · sinc(ωc/π · (n - M/2)) · w[n]
+
+        Retorna una copia de los coeficientes en caché (modificable).
         """
         if orden is None:
             orden = self.config.orden_fir
         if ventana is None:
             ventana = self.config.ventana_fir
             
-        nyquist = self.fs / 2
-        fc_normalizada = fc / nyquist
+        def calcular():
+            nyquist = self.fs / 2
+            fc_normalizada = fc / nyquist
+            
+            # Diseñar filtro
+            if ventana == 'hamming':
+                return signal.firwin(orden, fc_normalizada, window='hamming')
+            elif ventana == 'hann':
+                return signal.firwin(orden, fc_normalizada, window='hann')
+            elif ventana == 'blackman':
+                return signal.firwin(orden, fc_normalizada, window='blackman')
+            return signal.firwin(orden, fc_normalizada)
         
-        # Diseñar filtro
-        if ventana == 'hamming':
-            taps = signal.firwin(orden, fc_normalizada, window='hamming')
-        elif ventana == 'hann':
-            taps = signal.firwin(orden, fc_normalizada, window='hann')
-        elif ventana == 'blackman':
-            taps = signal.firwin(orden, fc_normalizada, window='blackman')
-        else:
-            taps = signal.firwin(orden, fc_normalizada)
+        clave = ('fir', float(fc), int(orden), ventana, self.fs)
+        taps = self.cache.obtener(clave, calcular)
             
-        return taps
+        return taps.copy()
     
     def aplicar_filtro_pasabajos(self, senal, fc, orden=None):
         """
         Aplica filtro pasabajos FIR a la señal
         """
         taps = self.diseñar_filtro_pasabajos(fc, orden)
-        senal_filtrada = signal.convolve(senal, taps, mode='same')
+        senal_filtrada = self.obtener_motor_fir(taps).filtrar(senal, modo='same')
         
         return senal_filtrada
     
+    def obtener_motor_fir(self, taps):
+        """
+        Retorna el motor FIR de unos coeficientes, reutilizando sus espectros
+        """
+        clave = np.asarray(taps, dtype=float).tobytes()
+        return self._motores_fir.obtener(clave, lambda: MotorFIR(taps, self.tipo))
+    
+    def crear_cadena(self, f0=None, fc=None, r=None, orden=None):
+        """
+        Crea una cadena notch + pasabajos con estado para procesar por bloques
+        """
+        if f0 is None:
+            f0 = self.config.f_notch
+        if fc is None:
+            fc = self.config.f_corte
+            
+        return CadenaFiltros(self, f0, fc, r, orden)
+
+    def crear_cancelador_red(self, f_red=None):
+        """
+        Crea un cancelador adaptativo de zumbido de red con los parámetros red_* de config
+        """
+        if f_red is None:
+            f_red = self.config.red_frecuencia
+
+        return CanceladorRed(self.fs, f_red, self.config.red_armonicos, self.config.red_suavizado,
+                             self.config.red_seguimiento, self.config.red_desvio_max_hz, tipo=self.tipo)
+
+    def cancelar_red(self, senal, f_red=None):
+        """
+        Elimina el zumbido de red y sus armónicos de una señal completa
+        (en lugar de encadenar un notch por armónico)
+        """
+        tam_bloque = int(round(self.config.duracion_bloque_ms * self.fs / 1000))
+        return self.crear_cancelador_red(f_red).procesar(senal, tam_bloque)
+    
     def respuesta_frecuencia_filtro(self, b, a=None, n_points=2000):
         """
         Calcula respuesta en frecuencia de un filtro
@@ -87,28 +145,36 @@ class FiltrosDigitales:
         """
         Análisis completo de un filtro
         """
-        w, h = self.respuesta_frecuencia_filtro(b, a)
-        
-        # Magnitud en dB
-        magnitud_db = 20 * np.log10(np.abs(h) + 1e-10)
+        def calcular():
+            w, h = self.respuesta_frecuencia_filtro(b, a)
+            
+            # Magnitud en dB
+            magnitud_db = 20 * np.log10(np.abs(h) + 1e-10)
+            
+            # Fase en grados
+            fase = np.angle(h, deg=True)
+            
+            # Retardo de grupo si es IIR
+            if a is not None:
+                w_gd, gd = signal.group_delay((b, a), fs=self.fs)
+            else:
+                w_gd, gd = w, np.zeros_like(w)
+                
+            return {
+                'frecuencias': w,
+                'magnitud': np.abs(h),
+                'magnitud_db': magnitud_db,
+                'fase': fase,
+                'frecuencias_gd': w_gd,
+                'retardo_grupo': gd
+            }
         
-        # Fase en grados
-        fase = np.angle(h, deg=True)
+        clave = ('analisis',
+                 np.asarray(b, dtype=float).tobytes(),
+                 None if a is None else np.asarray(a, dtype=float).tobytes(),
+                 self.fs)
         
-        # Retardo de grupo si es IIR
-        if a is not None:
-            w_gd, gd = signal.group_delay((b, a), fs=self.fs)
-        else:
-            w_gd, gd = w, np.zeros_like(w)
-            
-        return {
-            'frecuencias': w,
-            'magnitud': np.abs(h),
-            'magnitud_db': magnitud_db,
-            'fase': fase,
-            'frecuencias_gd': w_gd,
-            'retardo_grupo': gd
-        }
+        return {nombre: valor.copy() for nombre, valor in self.cache.obtener(clave, calcular).items()}
     
     def calcular_ancho_banda(self, w, h, nivel_db=-3):
         """
@@ -120,4 +186,378 @@ class FiltrosDigitales:
         idx = np.where(magnitud_db >= nivel_db)[0]
         if len(idx) > 0:
             return w[idx[-1]] - w[idx[0]]
-        return 0
\ No newline at end of file
+        return 0
+
+class CadenaFiltros:
+    """
+    Cadena notch IIR + pasabajos FIR que conserva su estado entre bloques
+
+    El notch se ejecuta como secciones de segundo orden (una por cada
+    frecuencia de f0) y el FIR mantiene sus últimas muestras de entrada,
+    de modo que procesar una señal completa o en bloques de cualquier
+    tamaño produce el mismo resultado (salvo error de redondeo).
+    Coeficientes, estados y salida usan el tipo de la política de filtros.
+
+    La salida es causal: el FIR de fase lineal la atrasa retardo muestras
+    respecto de la entrada. procesar(..., alinear=True) la compensa y
+    coincide con aplicar_filtro_pasabajos(..., 'same') sobre la señal con
+    notch.
+    """
+
+    def __init__(self, filtros, f0, fc, r=None, orden=None):
+        self.tipo = filtros.tipo
+        frecuencias_notch = np.atleast_1d(f0)
+
+        # Secciones de segundo orden del notch: [b0 b1 b2 a0 a1 a2]
+        # (f0 vacío: sin notch, p.ej. si la red la elimina CanceladorRed)
+        secciones = []
+        for f in frecuencias_notch:
+            b, a = filtros.diseñar_filtro_notch(f, r)
+            secciones.append(np.concatenate((b, a)))
+        self.sos = np.array(secciones, dtype=self.tipo).reshape(-1, 6)
+
+        self.taps = filtros.diseñar_filtro_pasabajos(fc, orden)
+        self.motor_fir = MotorFIR(self.taps, self.tipo)
+
+        # Retardo de grupo del FIR (fase lineal) en muestras
+        self.retardo = (len(self.taps) - 1) // 2
+
+        self.reiniciar()
+
+    def reiniciar(self):
+        """
+        Reinicia las condiciones iniciales de todas las etapas
+        """
+        self.zi_notch = np.zeros((self.sos.shape[0], 2), dtype=self.tipo)
+        self.motor_fir.reiniciar()
+
+    def procesar_bloque(self, bloque):
+        """
+        Filtra un bloque continuando el estado del bloque anterior
+        (salida atrasada retardo muestras)
+        """
+        bloque = np.asarray(bloque, dtype=self.tipo)
+        if len(self.sos):
+            senal_notch, self.zi_notch = signal.sosfilt(self.sos, bloque, zi=self.zi_notch)
+        else:
+            senal_notch = bloque
+        senal_filtrada = self.motor_fir.procesar_bloque(senal_notch)
+
+        return senal_filtrada
+
+    def procesar(self, senal, tam_bloque=None, alinear=False):
+        """
+        Filtra una señal completa desde estado cero, opcionalmente por bloques
+
+        Con alinear=True se vacía el FIR con retardo ceros y se descartan las
+        primeras retardo muestras, de modo que la salida queda alineada con
+        la entrada (sin el atraso de grupo del FIR).
+        """
+        self.reiniciar()
+        if tam_bloque is None:
+            salida = self.procesar_bloque(senal)
+        else:
+            salida = np.empty(len(senal), dtype=self.tipo)
+            for inicio in range(0, len(senal), tam_bloque):
+                fin = inicio + tam_bloque
+                salida[inicio:fin] = self.procesar_bloque(senal[inicio:fin])
+
+        if alinear:
+            cola = self.motor_fir.procesar_bloque(np.zeros(self.retardo, dtype=self.tipo))
+            salida = np.concatenate((salida, cola))[self.retardo:]
+
+        return salida
+
+
+class MotorFIR:
+    """
+    Convolución FIR por bloques con selección directa / FFT (overlap-save)
+
+    Conserva las últimas len(taps)-1 muestras de entrada entre bloques y
+    guarda en caché el espectro de los coeficientes para cada tamaño de
+    FFT usado. Para cada bloque de L muestras se elige el método de menor
+    costo estimado (en ns):
+
+        directo: t_dir + L·(k_dir + k_tap·M)
+        FFT:     ceil(L / (N - M + 1)) · (t_fft + k_fft·N·log2(N))
+
+    con M coeficientes y FFT de tamaño N. Las constantes se pueden ajustar
+    a la plataforma con calibrar().
+
+    Coeficientes, historia y salida se guardan en 'tipo' (float32 usa la
+    FFT en complex64).
+    """
+
+    # Modelo de costo (ns), medido en un núcleo x86; ajustable con calibrar()
+    t_dir = 3000.0
+    k_dir = 19.0
+    k_tap = 0.09
+    t_fft = 30000.0
+    k_fft = 1.9
+
+    def __init__(self, taps, tipo=np.float64):
+        self.tipo = np.dtype(tipo)
+        self.taps = np.asarray(taps, dtype=self.tipo)
+        self.n_taps = len(self.taps)
+        self._espectros = {}  # n_fft -> rfft(taps, n_fft)
+        self.reiniciar()
+
+    def reiniciar(self):
+        """
+        Reinicia la historia de entrada (estado cero)
+        """
+        self.historia = np.zeros(self.n_taps - 1, dtype=self.tipo)
+
+    def costo_directo(self, n_bloque):
+        """
+        Costo estimado de la convolución directa de un bloque
+        """
+        return self.t_dir + n_bloque * (self.k_dir + self.k_tap * self.n_taps)
+
+    def costo_fft(self, n_bloque, n_fft):
+        """
+        Costo estimado de overlap-save de un bloque con FFT de tamaño n_fft
+        """
+        paso = n_fft - self.n_taps + 1
+        if paso <= 0:
+            return np.inf
+        segmentos = -(-n_bloque // paso)
+        return segmentos * (self.t_fft + self.k_fft * n_fft * np.log2(n_fft))
+
+    def tamano_fft(self, n_bloque):
+        """
+        Tamaño de FFT de menor costo para un bloque: el mínimo que lo cubre
+        en un solo segmento, o una potencia de 2 menor con varios segmentos
+        """
+        minimo = fft.next_fast_len(n_bloque + self.n_taps - 1, real=True)
+        mejor, mejor_costo = minimo, self.costo_fft(n_bloque, minimo)
+        n_fft = 1 << int(np.ceil(np.log2(2 * self.n_taps)))
+        while n_fft < minimo:
+            costo = self.costo_fft(n_bloque, n_fft)
+            if costo < mejor_costo:
+                mejor, mejor_costo = n_fft, costo
+            n_fft *= 2
+
+        return mejor
+
+    def elegir_metodo(self, n_bloque):
+        """
+        Retorna ('directo', None) o ('fft', n_fft) según el modelo de costo
+        """
+        n_fft = self.tamano_fft(n_bloque)
+        if self.costo_fft(n_bloque, n_fft) < self.costo_directo(n_bloque):
+            return 'fft', n_fft
+        return 'directo', None
+
+    def calibrar(self, n_bloque=4096, repeticiones=20):
+        """
+        Ajusta las constantes del modelo de costo midiendo en esta plataforma
+        """
+        x = np.random.randn(n_bloque + self.n_taps - 1).astype(self.tipo)
+        corto = x[:self.n_taps + 63]
+        taps_largos = np.resize(self.taps, 4 * self.n_taps)
+
+        def medir(funcion):
+            t0 = time.perf_counter()
+            for _ in range(repeticiones):
+                funcion()
+            return 1e9 * (time.perf_counter() - t0) / repeticiones
+
+        # Directo: costo fijo (bloque de 64 salidas) y costo por muestra con
+        # M y 4·M coeficientes, que separa k_dir de k_tap
+        t_corto = medir(lambda: np.convolve(corto, self.taps, mode='valid'))
+        t_largo = medir(lambda: np.convolve(x, self.taps, mode='valid'))
+        x_largo = np.concatenate((x, x[:len(taps_largos) - self.n_taps]))
+        t_taps = medir(lambda: np.convolve(x_largo, taps_largos, mode='valid'))
+        por_muestra = max(t_largo - t_corto, 0.0) / (n_bloque - 64)
+        self.t_dir = max(t_corto - 64 * por_muestra, 0.0)
+        por_muestra_taps = max(t_taps - self.t_dir, 0.0) / n_bloque
+        self.k_tap = max(por_muestra_taps - por_muestra, 0.0) / (len(taps_largos) - self.n_taps)
+        self.k_dir = max(por_muestra - self.k_tap * self.n_taps, 0.0)
+
+        # FFT: costo fijo y costo por punto·etapa con dos tamaños
+        n_chico = fft.next_fast_len(2 * self.n_taps, real=True)
+        n_grande = fft.next_fast_len(len(x), real=True)
+        t_chico = medir(lambda: fft.irfft(fft.rfft(x[:n_chico], n_chico), n_chico))
+        t_grande = medir(lambda: fft.irfft(fft.rfft(x, n_grande), n_grande))
+        trabajo_chico = n_chico * np.log2(n_chico)
+        trabajo_grande = n_grande * np.log2(n_grande)
+        self.k_fft = max(t_grande - t_chico, 0.0) / (trabajo_grande - trabajo_chico)
+        self.t_fft = max(t_chico - self.k_fft * trabajo_chico, 0.0)
+
+    def espectro(self, n_fft):
+        """
+        Espectro de los coeficientes para un tamaño de FFT (en caché)
+        """
+        H = self._espectros.get(n_fft)
+        if H is None:
+            H = fft.rfft(self.taps, n_fft)
+            self._espectros[n_fft] = H
+        return H
+
+    def _convolucion_valida(self, extendida):
+        """
+        Convolución en modo 'valid' de una entrada precedida por su historia
+        """
+        n_salida = len(extendida) - self.n_taps + 1
+        metodo, n_fft = self.elegir_metodo(n_salida)
+        if metodo == 'directo':
+            return np.convolve(extendida, self.taps, mode='valid')
+
+        # Overlap-save: cada segmento produce n_fft - M + 1 salidas válidas
+        H = self.espectro(n_fft)
+        paso = n_fft - self.n_taps + 1
+        salida = np.empty(n_salida, dtype=self.tipo)
+        for inicio in range(0, n_salida, paso):
+            segmento = extendida[inicio:inicio + n_fft]
+            y = fft.irfft(fft.rfft(segmento, n_fft) * H, n_fft)
+            n = min(paso, n_salida - inicio)
+            salida[inicio:inicio + n] = y[self.n_taps - 1:self.n_taps - 1 + n]
+
+        return salida
+
+    def procesar_bloque(self, bloque):
+        """
+        Filtra un bloque continuando la historia de entrada (salida causal)
+        """
+        bloque = np.asarray(bloque, dtype=self.tipo)
+        if len(bloque) == 0:
+            return np.zeros(0, dtype=self.tipo)
+
+        extendida = np.concatenate((self.historia, bloque))
+        self.historia = extendida[len(extendida) - (self.n_taps - 1):]
+
+        return self._convolucion_valida(extendida)
+
+    def filtrar(self, senal, modo='full'):
+        """
+        Convolución de una señal completa sin modificar el estado ('full' o 'same')
+        """
+        ceros = np.zeros(self.n_taps - 1, dtype=self.tipo)
+        senal = np.asarray(senal, dtype=self.tipo)
+        completa = self._convolucion_valida(np.concatenate((ceros, senal, ceros)))
+        if modo == 'full':
+            return completa
+        if modo == 'same':
+            inicio = (self.n_taps - 1) // 2
+            return completa[inicio:inicio + len(senal)]
+        raise ValueError("Modo no válido")
+
+
+class CanceladorRed:
+    """
+    Cancelador adaptativo de zumbido de red (fundamental y armónicos)
+
+    Por bloque ajusta por mínimos cuadrados una base de cosenos y senos
+    en k·f_red (k = 1..armonicos) con fase continua entre bloques, suaviza
+    las amplitudes ajustadas (suavizado por bloque) y resta el zumbido
+    estimado. La deriva de la fase ajustada de la fundamental entre
+    bloques consecutivos da el error de frecuencia, que corrige f_red
+    dentro de ±desvio_max Hz del valor nominal.
+
+    Con f_red='auto' se arranca en 50 Hz y, durante deteccion_s segundos,
+    se compara la energía que explican las bases de 50 y 60 Hz; luego se
+    fija la que más explica.
+
+    La base y el ajuste se calculan en float64 (la fase de los armónicos
+    necesita esa precisión); el audio de salida usa 'tipo'.
+    """
+
+    CANDIDATAS = (50.0, 60.0)
+
+    def __init__(self, fs, f_red='auto', armonicos=5, suavizado=0.1, seguimiento=0.1,
+                 desvio_max=1.0, deteccion_s=0.5, tipo=np.float64):
+        self.fs = fs
+        self.tipo = np.dtype(tipo)
+        self.auto = f_red == 'auto'
+        self.f_nominal = self.CANDIDATAS[0] if self.auto else float(f_red)
+        self.armonicos = armonicos
+        self.suavizado = suavizado
+        self.seguimiento = seguimiento
+        self.desvio_max = desvio_max
+        self.deteccion_muestras = int(deteccion_s * fs)
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Vuelve a la frecuencia nominal con amplitudes nulas"""
+        if self.auto:
+            self.f_nominal = self.CANDIDATAS[0]
+            self._energia_candidatas = np.zeros(len(self.CANDIDATAS))
+            self._muestras_deteccion = 0
+        self._fijar_frecuencia(self.f_nominal)
+
+    def _fijar_frecuencia(self, f_red):
+        self.f_red = f_red
+        self.fase = 0.0
+        self.k = np.arange(1, self._numero_armonicos(f_red) + 1)
+        self.amplitudes = np.zeros(2 * len(self.k))  # [cos_1..cos_K, sen_1..sen_K]
+        self._fase_fundamental = None
+
+    def _numero_armonicos(self, f_red):
+        return max(min(self.armonicos, int((self.fs / 2 - 1) // f_red)), 1)
+
+    def _base(self, f_red, fase, n, k):
+        """Matriz (n × 2K) de cosenos y senos de los armónicos"""
+        angulos = np.outer(fase + 2 * np.pi * f_red / self.fs * np.arange(n), k)
+        return np.hstack((np.cos(angulos), np.sin(angulos)))
+
+    def _detectar(self, bloque):
+        """Acumula la energía explicada por cada candidata y fija la red al terminar"""
+        for i, f in enumerate(self.CANDIDATAS):
+            base = self._base(f, 2 * np.pi * f * self._muestras_deteccion / self.fs, len(bloque),
+                              np.arange(1, self._numero_armonicos(f) + 1))
+            coeficientes = np.linalg.lstsq(base, bloque, rcond=None)[0]
+            self._energia_candidatas[i] += np.sum((base @ coeficientes)**2)
+        self._muestras_deteccion += len(bloque)
+
+        if self._muestras_deteccion >= self.deteccion_muestras:
+            self.auto = False
+            elegida = self.CANDIDATAS[int(np.argmax(self._energia_candidatas))]
+            if elegida != self.f_nominal:
+                self.f_nominal = elegida
+                self._fijar_frecuencia(elegida)
+
+    def procesar_bloque(self, bloque):
+        """
+        Resta el zumbido estimado de un bloque, continuando el estado
+        """
+        bloque = np.asarray(bloque, dtype=self.tipo)
+        n = len(bloque)
+        if n == 0:
+            return bloque.copy()
+        if self.auto:
+            self._detectar(bloque)
+
+        f_usada = self.f_red
+        base = self._base(f_usada, self.fase, n, self.k)
+
+        if n > 2 * len(self.amplitudes):
+            coeficientes = np.linalg.lstsq(base, bloque, rcond=None)[0]
+            self.amplitudes += self.suavizado * (coeficientes - self.amplitudes)
+
+            # Deriva de fase de la fundamental → error de frecuencia
+            fase_fundamental = np.arctan2(-coeficientes[len(self.k)], coeficientes[0])
+            if self._fase_fundamental is not None:
+                deriva = np.angle(np.exp(1j * (fase_fundamental - self._fase_fundamental)))
+                error_hz = deriva * self.fs / (2 * np.pi * n)
+                self.f_red = float(np.clip(self.f_red + self.seguimiento * error_hz,
+                                           self.f_nominal - self.desvio_max,
+                                           self.f_nominal + self.desvio_max))
+            self._fase_fundamental = fase_fundamental
+
+        salida = bloque - (base @ self.amplitudes).astype(self.tipo)
+
+        # Fase al inicio del bloque siguiente con la frecuencia usada en éste
+        self.fase = float(np.mod(self.fase + 2 * np.pi * f_usada * n / self.fs, 2 * np.pi))
+        return salida
+
+    def procesar(self, senal, tam_bloque):
+        """
+        Cancela el zumbido de una señal completa, por bloques, desde el estado inicial
+        """
+        self.reiniciar()
+        salida = np.empty(len(senal), dtype=self.tipo)
+        for inicio in range(0, len(senal), tam_bloque):
+            fin = inicio + tam_bloque
+            salida[inicio:fin] = self.procesar_bloque(senal[inicio:fin])
+        return salida
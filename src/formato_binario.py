@@ -0,0 +1,303 @@
+"""
+Formato binario compacto para espectros y vectores de características
+
+Cada trama es una cabecera de tamaño fijo seguida del arreglo codificado:
+
+    magia       4s   b'DSPB'
+    version     B
+    tipo        B    0 genérico, 1 espectro, 2 características
+    codificacion B   0 float32, 1 float16, 2 dB cuantizado a uint8
+    banderas    B    bit 0 delta, bit 1 trama clave, bit 2 zlib
+    secuencia   I
+    timestamp   d    segundos (time.time())
+    filas       I
+    columnas    I
+    escala      f    paso de cuantización (solo uint8)
+    offset      f    valor del código 0 (solo uint8)
+    longitud    I    bytes de carga útil que siguen
+
+Las tramas son autodelimitadas, así que un mensaje MQTT puede llevar
+varias concatenadas. Con delta activo, cada trama lleva la diferencia con
+la reconstrucción de la anterior (lazo cerrado: el error de cuantización
+no se acumula) y cada intervalo_clave tramas se envía una trama clave
+absoluta para que un suscriptor pueda engancharse a mitad del flujo.
+"""
+
+import json
+import struct
+import time
+import zlib
+from datetime import datetime
+
+import numpy as np
+
+MAGIA = b'DSPB'
+VERSION = 2  # v2: filas y columnas en uint32 (v1: uint16)
+CABECERA = struct.Struct('<4sBBBBIdIIffI')
+
+TIPOS = {'generico': 0, 'espectro': 1, 'caracteristicas': 2}
+CODIFICACIONES = {'f32': 0, 'f16': 1, 'u8_db': 2}
+
+BANDERA_DELTA = 0x01
+BANDERA_CLAVE = 0x02
+BANDERA_ZLIB = 0x04
+
+_PISO_LINEAL = 1e-12
+
+
+class TramaInvalida(ValueError):
+    """Los bytes recibidos no forman una trama DSPB válida"""
+
+
+class CodificadorBinario:
+    """
+    Codifica arreglos (1-D o filas × columnas) como tramas DSPB
+
+    codificacion: 'f32', 'f16' o 'u8_db'. Con 'u8_db' los valores lineales
+    (magnitudes) se pasan a dB y se cuantizan a 256 niveles en el rango
+    [máximo - rango_db, máximo] de cada trama. Con delta el rango se fija en
+    cada trama clave (con margen_db de holgura) y las tramas delta lo
+    reutilizan, para que los códigos sean comparables entre tramas.
+    compresion: comprime la carga útil con zlib (donde el delta rinde más)
+    """
+
+    def __init__(self, codificacion='f16', delta=False, intervalo_clave=50, compresion=False,
+                 rango_db=80.0, margen_db=6.0):
+        if codificacion not in CODIFICACIONES:
+            raise ValueError(f"Codificación no válida: {codificacion}")
+
+        self.codificacion = codificacion
+        self.delta = delta
+        self.intervalo_clave = intervalo_clave
+        self.compresion = compresion
+        self.rango_db = rango_db
+        self.margen_db = margen_db
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Olvida la referencia del delta y reinicia contadores"""
+        self._referencia = None
+        self._desde_clave = 0
+        self._rango_clave = (0.0, 0.0)
+        self.secuencia = 0
+        self.tramas = 0
+        self.bytes_binario = 0
+        self.bytes_json = 0
+        self._t_primera = None
+        self._t_ultima = None
+
+    def codificar(self, valores, tipo='generico', timestamp=None, valores_en_db=False,
+                  comparar_json=True):
+        """
+        Codifica un arreglo y retorna los bytes de la trama
+
+        valores_en_db: con 'u8_db', indica que los valores ya están en dB
+        comparar_json: acumula el tamaño que tendría el mismo dato en JSON
+        (como lo envía publicar_datos) para las estadísticas
+        """
+        valores = np.asarray(valores)
+        if valores.ndim > 2:
+            raise ValueError("Solo se codifican arreglos 1-D o 2-D")
+        if timestamp is None:
+            timestamp = time.time()
+        filas, columnas = (1, valores.size) if valores.ndim < 2 else valores.shape
+
+        if comparar_json:
+            self.bytes_json += len(json.dumps({
+                "timestamp": datetime.fromtimestamp(timestamp).isoformat(),
+                "tipo": tipo,
+                "datos": valores.tolist()
+            }))
+
+        if self.codificacion == 'u8_db' and not valores_en_db:
+            valores = 20 * np.log10(np.maximum(np.abs(valores), _PISO_LINEAL))
+        valores = valores.astype(np.float32).reshape(filas, columnas)
+
+        es_clave = (not self.delta or self._referencia is None or
+                    self._referencia.shape != valores.shape or
+                    self._desde_clave >= self.intervalo_clave)
+
+        banderas = BANDERA_CLAVE if es_clave else 0
+        if self.delta:
+            banderas |= BANDERA_DELTA
+        escala, offset = 0.0, 0.0
+
+        if self.codificacion == 'u8_db':
+            if es_clave:
+                techo = float(valores.max()) if valores.size else 0.0
+                if self.delta:
+                    techo += self.margen_db
+                self._rango_clave = (techo - self.rango_db, self.rango_db / 255)
+            offset, escala = self._rango_clave
+            codigos = np.clip(np.rint((valores - offset) / escala), 0, 255).astype(np.uint8)
+            if es_clave:
+                carga = codigos
+            else:
+                # Diferencia módulo 256: exacta en el dominio de los códigos
+                carga = codigos - self._referencia
+            referencia = codigos
+        else:
+            tipo_dato = np.float32 if self.codificacion == 'f32' else np.float16
+            if es_clave:
+                carga = valores.astype(tipo_dato)
+                referencia = carga.astype(np.float32)
+            else:
+                carga = (valores - self._referencia).astype(tipo_dato)
+                referencia = self._referencia + carga.astype(np.float32)
+
+        if self.delta:
+            self._referencia = referencia
+            self._desde_clave = 1 if es_clave else self._desde_clave + 1
+
+        carga = carga.tobytes()
+        if self.compresion:
+            carga = zlib.compress(carga, 1)
+            banderas |= BANDERA_ZLIB
+
+        cabecera = CABECERA.pack(MAGIA, VERSION, TIPOS[tipo], CODIFICACIONES[self.codificacion],
+                                 banderas, self.secuencia & 0xFFFFFFFF, timestamp,
+                                 filas, columnas, escala, offset, len(carga))
+        self.secuencia += 1
+
+        trama = cabecera + carga
+        self.tramas += 1
+        self.bytes_binario += len(trama)
+        if self._t_primera is None:
+            self._t_primera = timestamp
+        self._t_ultima = timestamp
+        return trama
+
+    def para_tipo(self, tipo):
+        """
+        Codificador nuevo con los mismos parámetros para otro flujo de tramas
+
+        Cada flujo (espectro, características) necesita su propia referencia
+        de delta. 'u8_db' solo sirve para magnitudes: los demás tipos usan f16.
+        """
+        codificacion = self.codificacion
+        if codificacion == 'u8_db' and tipo != 'espectro':
+            codificacion = 'f16'
+        return CodificadorBinario(codificacion, self.delta, self.intervalo_clave, self.compresion,
+                                  self.rango_db, self.margen_db)
+
+    def estadisticas(self):
+        """
+        Bytes enviados frente a JSON, por trama y por segundo de flujo
+        """
+        duracion = (self._t_ultima - self._t_primera) if self.tramas > 1 else 0.0
+        ahorrados = self.bytes_json - self.bytes_binario
+        return {
+            'tramas': self.tramas,
+            'bytes_binario': self.bytes_binario,
+            'bytes_json': self.bytes_json,
+            'bytes_por_trama': self.bytes_binario / self.tramas if self.tramas else 0.0,
+            'bytes_json_por_trama': self.bytes_json / self.tramas if self.tramas else 0.0,
+            'relacion_compresion': self.bytes_json / self.bytes_binario if self.bytes_binario else 0.0,
+            'bytes_por_s': self.bytes_binario / duracion if duracion > 0 else 0.0,
+            'bytes_json_por_s': self.bytes_json / duracion if duracion > 0 else 0.0,
+            'bytes_ahorrados_por_s': ahorrados / duracion if duracion > 0 else 0.0
+        }
+
+
+class DecodificadorBinario:
+    """
+    Decodifica tramas DSPB, manteniendo la referencia de las tramas delta
+
+    Si se pierde una trama (salto de secuencia), las tramas delta se
+    descartan hasta la siguiente trama clave. Cada tipo de trama es un
+    flujo con su propia secuencia y referencia (un codificador por tipo).
+    """
+
+    def __init__(self):
+        self.reiniciar()
+
+    def reiniciar(self):
+        self._flujos = {}  # tipo -> [referencia, secuencia esperada]
+        self.tramas = 0
+        self.perdidas = 0
+        self.descartadas = 0
+
+    def decodificar(self, datos):
+        """
+        Decodifica una trama y retorna (trama, bytes consumidos)
+
+        trama es un dict con secuencia, timestamp, tipo y valores (float32,
+        en dB para 'u8_db'), o None si era una trama delta sin referencia.
+        """
+        datos = memoryview(datos)
+        if len(datos) < CABECERA.size:
+            raise TramaInvalida("Trama incompleta")
+
+        (magia, version, tipo, codificacion, banderas, secuencia, timestamp,
+         filas, columnas, escala, offset, longitud) = CABECERA.unpack_from(datos)
+        if magia != MAGIA:
+            raise TramaInvalida("Marca DSPB ausente")
+        if version != VERSION:
+            raise TramaInvalida(f"Versión {version} no soportada")
+        fin = CABECERA.size + longitud
+        if len(datos) < fin:
+            raise TramaInvalida("Carga útil incompleta")
+
+        flujo = self._flujos.setdefault(tipo, [None, None])
+        referencia, esperada = flujo
+        if esperada is not None and secuencia != esperada:
+            self.perdidas += (secuencia - esperada) & 0xFFFFFFFF
+            referencia = None
+        flujo[1] = (secuencia + 1) & 0xFFFFFFFF
+
+        carga = bytes(datos[CABECERA.size:fin])
+        if banderas & BANDERA_ZLIB:
+            carga = zlib.decompress(carga)
+
+        es_clave = bool(banderas & BANDERA_CLAVE)
+        es_delta = bool(banderas & BANDERA_DELTA)
+        if not es_clave and (referencia is None or referencia.shape != (filas, columnas)):
+            flujo[0] = None
+            self.descartadas += 1
+            return None, fin
+
+        if codificacion == CODIFICACIONES['u8_db']:
+            codigos = np.frombuffer(carga, dtype=np.uint8).reshape(filas, columnas)
+            if not es_clave:
+                codigos = codigos + referencia
+            if es_delta:
+                referencia = codigos
+            valores = codigos.astype(np.float32) * np.float32(escala) + np.float32(offset)
+        else:
+            tipo_dato = np.float32 if codificacion == CODIFICACIONES['f32'] else np.float16
+            valores = np.frombuffer(carga, dtype=tipo_dato).reshape(filas, columnas).astype(np.float32)
+            if not es_clave:
+                valores = referencia + valores
+            if es_delta:
+                referencia = valores
+        flujo[0] = referencia
+
+        self.tramas += 1
+        nombres_tipo = {v: k for k, v in TIPOS.items()}
+        trama = {
+            'secuencia': secuencia,
+            'timestamp': timestamp,
+            'tipo': nombres_tipo.get(tipo, 'generico'),
+            'valores': valores[0] if filas == 1 else valores
+        }
+        return trama, fin
+
+    def decodificar_mensaje(self, payload):
+        """
+        Decodifica todas las tramas concatenadas de un mensaje MQTT
+        """
+        tramas = []
+        vista = memoryview(payload)
+        while len(vista) > 0:
+            trama, consumidos = self.decodificar(vista)
+            if trama is not None:
+                tramas.append(trama)
+            vista = vista[consumidos:]
+        return tramas
+
+
+def crear_codificador(config):
+    """Codificador con los parámetros binario_* de config"""
+    return CodificadorBinario(config.binario_codificacion, config.binario_delta,
+                              config.binario_intervalo_clave, config.binario_compresion,
+                              config.binario_rango_db)
@@ -0,0 +1,89 @@
+"""
+Importación diferida de dependencias pesadas
+
+Las bibliotecas pesadas (matplotlib, scipy.signal, librosa, sounddevice,
+paho-mqtt...) se declaran como ModuloDiferido y solo se importan la
+primera vez que se usa uno de sus atributos, es decir, cuando corre la
+etapa que las necesita. Cada carga queda registrada con su duración para
+el reporte de arranque.
+"""
+
+import importlib
+import sys
+import time
+
+# Dependencias cuyo costo de importación interesa vigilar
+MODULOS_PESADOS = ['numpy', 'scipy', 'scipy.signal', 'scipy.fft', 'matplotlib',
+                   'matplotlib.pyplot', 'librosa', 'sounddevice', 'soundfile', 'paho.mqtt.client']
+
+# nombre -> segundos que tomó la importación diferida
+tiempos_carga = {}
+
+
+class ModuloDiferido:
+    """
+    Sustituto de un módulo que lo importa en el primer acceso a un atributo
+
+    antes: función a ejecutar justo antes de importar (p.ej. elegir backend)
+    aviso: mensaje a mostrar una vez si la dependencia opcional no está
+    """
+
+    def __init__(self, nombre, antes=None, aviso=None):
+        self._nombre = nombre
+        self._antes = antes
+        self._aviso = aviso
+        self._modulo = None
+
+    def _cargar(self):
+        if self._modulo is None:
+            ya_importado = self._nombre in sys.modules
+            t0 = time.perf_counter()
+            try:
+                if self._antes is not None:
+                    self._antes()
+                self._modulo = importlib.import_module(self._nombre)
+            except ImportError:
+                if self._aviso is not None:
+                    print(self._aviso)
+                    self._aviso = None
+                raise
+            # Otro ModuloDiferido del mismo nombre ya pagó (y registró) la carga
+            if not ya_importado:
+                tiempos_carga[self._nombre] = time.perf_counter() - t0
+        return self._modulo
+
+    def __getattr__(self, atributo):
+        return getattr(self._cargar(), atributo)
+
+    @property
+    def cargado(self):
+        """Indica si el módulo ya se importó"""
+        return self._modulo is not None
+
+    def __repr__(self):
+        estado = 'cargado' if self.cargado else 'diferido'
+        return f"<ModuloDiferido {self._nombre} ({estado})>"
+
+
+def importar_diferido(nombre, antes=None, aviso=None):
+    """
+    Retorna el módulo si ya está importado, o un ModuloDiferido en caso contrario
+    """
+    if nombre in sys.modules and antes is None:
+        return sys.modules[nombre]
+    return ModuloDiferido(nombre, antes, aviso)
+
+
+def reporte_arranque(t_inicio=None):
+    """
+    Estado de las dependencias pesadas: cuáles están cargadas y cuánto
+    costaron las cargas diferidas realizadas hasta ahora
+    """
+    reporte = {
+        'modulos_cargados': [m for m in MODULOS_PESADOS if m in sys.modules],
+        'modulos_no_cargados': [m for m in MODULOS_PESADOS if m not in sys.modules],
+        'cargas_diferidas_s': dict(tiempos_carga)
+    }
+    if t_inicio is not None:
+        reporte['tiempo_desde_inicio_s'] = time.perf_counter() - t_inicio
+    return reporte
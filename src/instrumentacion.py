@@ -0,0 +1,155 @@
+"""
+Instrumentación por etapa del pipeline: tiempos, memoria y muestras
+
+    instr = Instrumentacion(habilitada=True)
+    with instr.etapa('notch', muestras=len(senal)):
+        senal = filtros.aplicar_filtro_notch(senal, 50)
+    instr.exportar_json('metricas.json')
+
+Deshabilitada, etapa() retorna siempre el mismo contexto vacío: el costo
+por etapa es una llamada a método y un with, sin leer relojes.
+"""
+
+import json
+import time
+import tracemalloc
+from datetime import datetime
+
+
+class _ContextoNulo:
+    """Contexto sin efecto para la instrumentación deshabilitada"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_NULO = _ContextoNulo()
+
+
+class _Medicion:
+    """Contexto que mide una ejecución de una etapa"""
+
+    __slots__ = ('instrumentacion', 'nombre', 'muestras', 'inicio', 'memoria_inicial')
+
+    def __init__(self, instrumentacion, nombre, muestras):
+        self.instrumentacion = instrumentacion
+        self.nombre = nombre
+        self.muestras = muestras
+
+    def __enter__(self):
+        if self.instrumentacion.memoria:
+            tracemalloc.reset_peak()
+            self.memoria_inicial = tracemalloc.get_traced_memory()[0]
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        duracion = time.perf_counter() - self.inicio
+        asignados = pico = 0
+        if self.instrumentacion.memoria:
+            actual, pico = tracemalloc.get_traced_memory()
+            asignados = actual - self.memoria_inicial
+            pico -= self.memoria_inicial
+        self.instrumentacion._registrar(self.nombre, duracion, self.muestras, asignados, pico)
+        return False
+
+
+class Instrumentacion:
+    """
+    Acumula por etapa: llamadas, tiempo total/máximo/último, muestras
+    procesadas y, con memoria=True (tracemalloc), bytes retenidos y pico
+    de memoria sobre el inicio de la etapa
+
+    El pico de memoria de etapas anidadas no es exacto: cada etapa
+    reinicia el pico de tracemalloc al comenzar.
+    """
+
+    def __init__(self, habilitada=False, memoria=False):
+        self.habilitada = habilitada
+        self.memoria = habilitada and memoria
+        if self.memoria and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.reiniciar()
+
+    @classmethod
+    def desde_config(cls, config):
+        return cls(config.instrumentacion, config.instrumentacion_memoria)
+
+    def reiniciar(self):
+        """Borra las métricas acumuladas"""
+        self.etapas = {}
+        self._inicio = time.perf_counter()
+
+    def etapa(self, nombre, muestras=0):
+        """Contexto que mide una ejecución de la etapa 'nombre'"""
+        if not self.habilitada:
+            return _NULO
+        return _Medicion(self, nombre, muestras)
+
+    def _registrar(self, nombre, duracion, muestras, asignados, pico):
+        metricas = self.etapas.get(nombre)
+        if metricas is None:
+            metricas = self.etapas[nombre] = {
+                'llamadas': 0, 'tiempo_total_s': 0.0, 'tiempo_max_s': 0.0, 'tiempo_ultimo_s': 0.0,
+                'muestras': 0, 'bytes_retenidos': 0, 'pico_bytes': 0
+            }
+        metricas['llamadas'] += 1
+        metricas['tiempo_total_s'] += duracion
+        metricas['tiempo_ultimo_s'] = duracion
+        if duracion > metricas['tiempo_max_s']:
+            metricas['tiempo_max_s'] = duracion
+        metricas['muestras'] += muestras
+        metricas['bytes_retenidos'] += asignados
+        if pico > metricas['pico_bytes']:
+            metricas['pico_bytes'] = pico
+
+    def instantanea(self):
+        """
+        Métricas actuales como dict serializable, con derivados por etapa
+        (tiempo medio, muestras por segundo, fracción del tiempo medido)
+        """
+        tiempo_medido = sum(m['tiempo_total_s'] for m in self.etapas.values())
+        etapas = {}
+        for nombre, metricas in self.etapas.items():
+            derivadas = dict(metricas)
+            derivadas['tiempo_medio_ms'] = 1000 * metricas['tiempo_total_s'] / metricas['llamadas']
+            derivadas['muestras_por_s'] = (metricas['muestras'] / metricas['tiempo_total_s']
+                                           if metricas['tiempo_total_s'] > 0 else 0.0)
+            derivadas['fraccion'] = metricas['tiempo_total_s'] / tiempo_medido if tiempo_medido > 0 else 0.0
+            etapas[nombre] = derivadas
+
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'habilitada': self.habilitada,
+            'memoria': self.memoria,
+            'tiempo_transcurrido_s': time.perf_counter() - self._inicio,
+            'tiempo_medido_s': tiempo_medido,
+            'etapas': etapas
+        }
+
+    def exportar_json(self, ruta):
+        """Escribe la instantánea actual en un archivo JSON"""
+        instantanea = self.instantanea()
+        with open(ruta, 'w') as f:
+            json.dump(instantanea, f, indent=2)
+        return instantanea
+
+    def publicar(self, comunicador):
+        """Publica la instantánea en el topic de métricas del comunicador MQTT"""
+        return comunicador.publicar_metricas(self.instantanea())
+
+    def resumen(self):
+        """Tabla de texto con las etapas ordenadas por tiempo total"""
+        instantanea = self.instantanea()
+        lineas = [f"{'Etapa':16s} {'llamadas':>8s} {'total ms':>10s} {'medio ms':>10s} "
+                  f"{'máx ms':>10s} {'%':>6s} {'Mmuestras/s':>12s}"]
+        for nombre, m in sorted(instantanea['etapas'].items(), key=lambda e: -e[1]['tiempo_total_s']):
+            lineas.append(f"{nombre:16s} {m['llamadas']:8d} {1000 * m['tiempo_total_s']:10.2f} "
+                          f"{m['tiempo_medio_ms']:10.3f} {1000 * m['tiempo_max_s']:10.2f} "
+                          f"{100 * m['fraccion']:6.1f} {m['muestras_por_s'] / 1e6:12.2f}")
+        return "\n".join(lineas)
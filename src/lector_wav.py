@@ -0,0 +1,168 @@
+"""
+Lector nativo de archivos WAV (PCM / IEEE float) con mapeo en memoria
+
+Las muestras se acceden con np.memmap sin copiar el archivo a memoria y
+se decodifican a float32 solo cuando se piden, por rangos o por bloques.
+"""
+
+import os
+import struct
+
+import numpy as np
+
+# Códigos de formato de la cabecera 'fmt '
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class FormatoWAVNoSoportado(ValueError):
+    """El archivo no es un WAV PCM/float que el lector nativo pueda mapear"""
+
+
+class LectorWAV:
+    """Vista mapeada en memoria de un archivo WAV con decodificación bajo demanda"""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._leer_cabecera()
+
+        if self.bits == 24:
+            # Sin tipo nativo de 3 bytes: se mapean los bytes crudos
+            forma = (self.num_muestras, self.canales, 3)
+            tipo = np.uint8
+        else:
+            forma = (self.num_muestras, self.canales)
+            tipo = self.tipo_muestra
+
+        if self.num_muestras > 0:
+            self.datos = np.memmap(ruta, dtype=tipo, mode='r', offset=self.offset_datos, shape=forma)
+        else:
+            self.datos = np.zeros(forma, dtype=tipo)
+
+    def _leer_cabecera(self):
+        """Recorre los chunks RIFF hasta encontrar 'fmt ' y 'data'"""
+        formato = None
+        tamano_archivo = os.path.getsize(self.ruta)
+
+        with open(self.ruta, 'rb') as f:
+            inicio = f.read(12)
+            if len(inicio) < 12:
+                raise FormatoWAVNoSoportado(f"{self.ruta}: cabecera RIFF incompleta")
+            riff, _, wave = struct.unpack('<4sI4s', inicio)
+            if riff != b'RIFF' or wave != b'WAVE':
+                raise FormatoWAVNoSoportado(f"{self.ruta} no es un archivo RIFF/WAVE")
+
+            while True:
+                cabecera = f.read(8)
+                if len(cabecera) < 8:
+                    raise FormatoWAVNoSoportado(f"{self.ruta} no tiene chunk 'data'")
+                identificador, tamano = struct.unpack('<4sI', cabecera)
+
+                if identificador == b'fmt ':
+                    contenido = f.read(tamano)
+                    if len(contenido) < 16:
+                        raise FormatoWAVNoSoportado(f"{self.ruta}: chunk 'fmt ' incompleto")
+                    formato, canales, fs, _, alineacion, bits = struct.unpack('<HHIIHH', contenido[:16])
+                    if formato == WAVE_FORMAT_EXTENSIBLE and len(contenido) >= 26:
+                        # Los dos primeros bytes del GUID de subformato son el código real
+                        formato = struct.unpack('<H', contenido[24:26])[0]
+                    if tamano % 2:
+                        f.seek(1, os.SEEK_CUR)
+
+                elif identificador == b'data':
+                    if formato is None:
+                        raise FormatoWAVNoSoportado(f"{self.ruta}: chunk 'data' antes de 'fmt '")
+                    self.offset_datos = f.tell()
+                    # Archivos truncados o con tamaño de datos 0xFFFFFFFF (streaming)
+                    tamano = min(tamano, tamano_archivo - self.offset_datos)
+                    break
+
+                else:
+                    f.seek(tamano + tamano % 2, os.SEEK_CUR)
+
+        tipos = {
+            (WAVE_FORMAT_PCM, 8): np.uint8,
+            (WAVE_FORMAT_PCM, 16): np.dtype('<i2'),
+            (WAVE_FORMAT_PCM, 24): None,
+            (WAVE_FORMAT_PCM, 32): np.dtype('<i4'),
+            (WAVE_FORMAT_IEEE_FLOAT, 32): np.dtype('<f4'),
+            (WAVE_FORMAT_IEEE_FLOAT, 64): np.dtype('<f8'),
+        }
+        if (formato, bits) not in tipos:
+            raise FormatoWAVNoSoportado(f"{self.ruta}: formato {formato:#06x} de {bits} bits no soportado")
+        if canales == 0 or alineacion != canales * bits // 8:
+            raise FormatoWAVNoSoportado(f"{self.ruta}: {canales} canales con alineación {alineacion} "
+                                        f"no válidos para {bits} bits")
+
+        self.formato = formato
+        self.canales = canales
+        self.fs = fs
+        self.bits = bits
+        self.tipo_muestra = tipos[(formato, bits)]
+        self.num_muestras = tamano // alineacion
+
+    def __len__(self):
+        return self.num_muestras
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.cerrar()
+
+    @property
+    def duracion(self):
+        """Duración del archivo en segundos"""
+        return self.num_muestras / self.fs
+
+    def cerrar(self):
+        """Libera el mapeo del archivo"""
+        self.datos = None
+
+    def vista(self, inicio=0, n=None):
+        """
+        Muestras crudas (sin decodificar) como vista del mapeo, sin copia
+        """
+        fin = self.num_muestras if n is None else min(inicio + n, self.num_muestras)
+        return self.datos[inicio:fin]
+
+    def leer(self, inicio=0, n=None, mono=True):
+        """
+        Decodifica un rango de muestras a float32 en [-1, 1)
+
+        Para archivos float32 mono el resultado es la propia vista del mapeo
+        (solo lectura, sin copia).
+        """
+        crudas = self.vista(inicio, n)
+
+        if self.bits == 24:
+            # Ensamblar enteros de 24 bits (little endian) con signo
+            enteros = (crudas[..., 0].astype(np.int32) |
+                       (crudas[..., 1].astype(np.int32) << 8) |
+                       (crudas[..., 2].astype(np.int32) << 16))
+            enteros = np.where(enteros >= 1 << 23, enteros - (1 << 24), enteros)
+            audio = enteros.astype(np.float32) / np.float32(1 << 23)
+        elif self.tipo_muestra == np.uint8:
+            audio = (crudas.astype(np.float32) - 128) / np.float32(128)
+        elif self.tipo_muestra == np.dtype('<i2'):
+            audio = crudas.astype(np.float32) / np.float32(1 << 15)
+        elif self.tipo_muestra == np.dtype('<i4'):
+            audio = (crudas / float(1 << 31)).astype(np.float32)
+        elif self.tipo_muestra == np.dtype('<f8'):
+            audio = crudas.astype(np.float32)
+        else:
+            audio = crudas
+
+        if not mono:
+            return audio
+        if self.canales == 1:
+            return audio[:, 0]
+        return audio.mean(axis=1, dtype=np.float32)
+
+    def bloques(self, tam_bloque, mono=True):
+        """
+        Generador de bloques decodificados de tam_bloque muestras
+        """
+        for inicio in range(0, self.num_muestras, tam_bloque):
+            yield self.leer(inicio, tam_bloque, mono)
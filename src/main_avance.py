@@ -7,14 +7,16 @@ Estudiante: NICOLAS ENRIQUE RUIZ VEGA
 Código: 20251583005
 """
 
+import time
+_T_INICIO = time.perf_counter()  # Referencia para el reporte de arranque
+
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')  # Para uso en Orange Pi sin interfaz gráfica
-import matplotlib.pyplot as plt
 import os
-import time
+import sys
 from datetime import datetime
 
+# Las dependencias pesadas (matplotlib, scipy.signal, librosa, sounddevice,
+# paho-mqtt) se cargan de forma diferida cuando su etapa se ejecuta
 # Importar módulos personalizados
 from config import Config
 from captura_audio import CapturadorAudio
@@ -23,14 +25,41 @@ from filtros_digitales import FiltrosDigitales
 from analisis_espectral import AnalizadorEspectral
 from visualizacion import Visualizador
 from comunicacion import ComunicadorMQTT
-from utils import verificar_sistema, crear_directorios
+from procesamiento_tiempo_real import PipelineTiempoReal, FuenteSenal, FuenteMicrofono
+from importacion_diferida import reporte_arranque
+from instrumentacion import Instrumentacion
+
+def _verificar_sistema():
+    """Respaldo de utils.verificar_sistema: versiones de Python y numpy"""
+    print(f"Python {sys.version.split()[0]}, numpy {np.__version__}")
+
+def _crear_directorios():
+    """Respaldo de utils.crear_directorios: rutas de datos de Config"""
+    config = Config()
+    for ruta in (config.ruta_audio, config.ruta_resultados, config.ruta_almacen, config.ruta_figuras):
+        os.makedirs(ruta, exist_ok=True)
+
+def main(archivo_metricas=None, graficas=None, mqtt=None):
+    """
+    Función principal del avance del proyecto
 
-def main():
-    """Función principal del avance del proyecto"""
+    archivo_metricas: activa la instrumentación por etapa y guarda la
+    instantánea final en ese archivo JSON
+    graficas, mqtt: generar gráficas / publicar por MQTT (por defecto
+    config.graficas y config.mqtt_habilitado). Deshabilitados, el
+    visualizador y el cliente MQTT no se crean, y matplotlib y paho-mqtt
+    no se importan.
+    """
     
     print("=== AVANCE PROYECTO DSP - ORANGE PI 5 PLUS ===")
     print(f"Inicio: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
+    try:
+        from utils import verificar_sistema, crear_directorios
+    except ImportError:
+        # utils.py es opcional (p.ej. fuera de la placa): respaldos locales
+        verificar_sistema, crear_directorios = _verificar_sistema, _crear_directorios
+    
     # Verificar sistema
     verificar_sistema()
     
@@ -39,14 +68,21 @@ def main():
     
     # Cargar configuración
     config = Config()
+    if graficas is None:
+        graficas = config.graficas
+    if mqtt is None:
+        mqtt = config.mqtt_habilitado
     
     # Inicializar módulos
     capturador = CapturadorAudio(config)
     preprocesador = Preprocesador(config)
     filtros = FiltrosDigitales(config)
     analizador = AnalizadorEspectral(config)
-    visualizador = Visualizador(config)
-    comunicador = ComunicadorMQTT(config)
+    visualizador = Visualizador(config) if graficas else None
+    comunicador = ComunicadorMQTT(config) if mqtt else None
+    instrumentacion = Instrumentacion(config.instrumentacion or archivo_metricas is not None,
+                                      config.instrumentacion_memoria)
+    etapa = instrumentacion.etapa
     
     try:
         # 1. Captura de audio (usar archivo existente o grabar nuevo)
@@ -61,22 +97,28 @@ def main():
             print("Usando archivo de audio existente...")
         
         # Cargar audio
-        senal_original, fs = capturador.cargar_audio(archivo_audio)
+        with etapa('captura'):
+            senal_original, fs = capturador.cargar_audio(archivo_audio)
+        n = len(senal_original)
         print(f"Duración: {len(senal_original)/fs:.2f}s, Muestras: {len(senal_original)}")
         
         # 2. Preprocesamiento
         print("\n2. PREPROCESAMIENTO")
-        senal_preenfasis = preprocesador.aplicar_preenfasis(senal_original)
+        with etapa('preenfasis', n):
+            senal_preenfasis = preprocesador.aplicar_preenfasis(senal_original)
         
         # 3. Filtrado digital
         print("\n3. FILTRADO DIGITAL")
-        senal_notch = filtros.aplicar_filtro_notch(senal_preenfasis, 50)
-        senal_filtrada = filtros.aplicar_filtro_pasabajos(senal_notch, 3400)
+        with etapa('notch', n):
+            senal_notch = filtros.aplicar_filtro_notch(senal_preenfasis, 50)
+        with etapa('fir', n):
+            senal_filtrada = filtros.aplicar_filtro_pasabajos(senal_notch, 3400)
         
         # 4. Análisis de SNR
         print("\n4. ANÁLISIS DE SNR")
-        snr_original = analizador.calcular_snr(senal_original)
-        snr_filtrado = analizador.calcular_snr(senal_filtrada)
+        with etapa('snr', 2 * n):
+            snr_original = analizador.calcular_snr(senal_original)
+            snr_filtrado = analizador.calcular_snr(senal_filtrada)
         
         print(f"SNR original: {snr_original:.2f} dB")
         print(f"SNR filtrado: {snr_filtrado:.2f} dB")
@@ -84,28 +126,37 @@ def main():
         
         # 5. Análisis espectral
         print("\n5. ANÁLISIS ESPECTRAL")
-        frecuencias, fft_original = analizador.calcular_fft(senal_original)
-        frecuencias, fft_filtrada = analizador.calcular_fft(senal_filtrada)
+        with etapa('fft', 2 * n):
+            frecuencias, fft_original = analizador.calcular_fft(senal_original)
+            frecuencias, fft_filtrada = analizador.calcular_fft(senal_filtrada)
         
-        # Espectrograma
-        f, t, espectrograma = analizador.calcular_espectrograma(senal_filtrada)
+        # Espectrograma (con VAD, solo las tramas de voz)
+        segmentos = None
+        if config.vad_habilitado:
+            with etapa('vad', n):
+                segmentos = preprocesador.segmentos_voz(senal_original)
+        with etapa('espectrograma', n):
+            f, t, espectrograma = analizador.calcular_espectrograma(senal_filtrada, segmentos=segmentos)
         
         # Características espectrales
-        energias = analizador.calcular_energia_subbandas(fft_filtrada, frecuencias)
-        centroide = analizador.calcular_centroide_espectral(fft_filtrada, frecuencias)
+        with etapa('caracteristicas'):
+            energias = analizador.calcular_energia_subbandas(fft_filtrada, frecuencias)
+            centroide = analizador.calcular_centroide_espectral(fft_filtrada, frecuencias)
         
         print(f"Centroide espectral: {centroide:.2f} Hz")
         print(f"Energías por subbandas: {[f'{e:.2f}' for e in energias]}")
         
         # 6. Visualización
-        print("\n6. GENERACIÓN DE VISUALIZACIONES")
-        visualizador.graficas_comparativas(
-            senal_original, 
-            senal_filtrada,
-            fft_original,
-            fft_filtrada,
-            espectrograma, f, t
-        )
+        if visualizador is not None:
+            print("\n6. GENERACIÓN DE VISUALIZACIONES")
+            with etapa('graficas', n):
+                visualizador.graficas_comparativas(
+                    senal_original, 
+                    senal_filtrada,
+                    fft_original,
+                    fft_filtrada,
+                    espectrograma, f, t
+                )
         
         # 7. Guardar resultados
         print("\n7. GUARDANDO RESULTADOS")
@@ -118,15 +169,35 @@ def main():
             'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
         
-        analizador.guardar_resultados(resultados, "datos/resultados/resultados_avance.json")
+        # El espectro va solo al almacén (arreglo tipado), no al mensaje MQTT
+        with etapa('guardado'):
+            analizador.guardar_resultados(dict(resultados, espectro_filtrado=fft_filtrada.astype(np.float32)),
+                                          config.ruta_almacen, fuente=archivo_audio)
 
         # 8. Comunicación MQTT
-        print("\n8. PUBLICACIÓN DE DATOS VIA MQTT")
-        comunicador.publicar_datos(resultados)
+        if comunicador is not None:
+            print("\n8. PUBLICACIÓN DE DATOS VIA MQTT")
+            with etapa('publicacion'):
+                comunicador.publicar_datos(resultados)
+
+        # Esperar a que terminen las gráficas pendientes (modo en segundo plano)
+        if visualizador is not None:
+            with etapa('graficas_pendientes'):
+                visualizador.cerrar()
+
+        if instrumentacion.habilitada:
+            print("\nMÉTRICAS POR ETAPA")
+            print(instrumentacion.resumen())
+            if archivo_metricas:
+                instrumentacion.exportar_json(archivo_metricas)
+                print(f"Métricas guardadas en: {archivo_metricas}")
+            if comunicador is not None:
+                instrumentacion.publicar(comunicador)
 
         print("\n✅ AVANCE COMPLETADO EXITOSAMENTE")
         print(f"Resultados guardados en: datos/resultados/")
-        print("Datos publicados via MQTT")
+        if comunicador is not None:
+            print("Datos publicados via MQTT")
         
     except Exception as e:
         print(f"❌ Error durante la ejecución: {e}")
@@ -134,5 +205,120 @@ def main():
     
     return 0
 
+def main_tiempo_real(fuente='microfono', duracion=None, graficas=None, mqtt=None):
+    """
+    Pipeline por bloques: cada bloque de captura se procesa y publica
+    sin esperar a grabar el clip completo
+
+    fuente: 'microfono', 'prueba' o ruta de un archivo de audio
+    mqtt: publicar por MQTT (por defecto config.mqtt_habilitado); sin MQTT
+    no se crea el cliente ni se importa paho-mqtt. graficas se acepta por
+    simetría con main (este modo no genera gráficas)
+    """
+    print("=== PROYECTO DSP - MODO TIEMPO REAL ===")
+    print(f"Inicio: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+    config = Config()
+    if mqtt is None:
+        mqtt = config.mqtt_habilitado
+    capturador = CapturadorAudio(config)
+    comunicador = ComunicadorMQTT(config, verboso=False) if mqtt else None
+    # Publicación en segundo plano: el bucle de bloques nunca espera al broker
+    publicador = comunicador.crear_publicador() if comunicador is not None else None
+    pipeline = PipelineTiempoReal(config, publicar=publicador.publicar if publicador else None)
+
+    if duracion is None:
+        duracion = config.duracion_grabacion
+
+    if fuente == 'microfono':
+        entrada = FuenteMicrofono(config, pipeline.tam_bloque)
+    elif fuente == 'prueba':
+        entrada = FuenteSenal.desde_prueba(capturador, duracion, tiempo_real=True)
+    else:
+        entrada = FuenteSenal.desde_archivo(capturador, fuente, tiempo_real=True)
+
+    print(f"Bloques de {pipeline.tam_bloque} muestras ({config.duracion_bloque_ms} ms)")
+
+    try:
+        estadisticas = pipeline.ejecutar(entrada, duracion_max=duracion)
+    except Exception as e:
+        print(f"❌ Error durante la ejecución: {e}")
+        return 1
+    finally:
+        if publicador is not None:
+            publicador.detener()
+        if comunicador is not None:
+            comunicador.desconectar()
+
+    print(f"Bloques procesados: {estadisticas['bloques']}")
+    if publicador is not None:
+        envio = publicador.estadisticas()
+        print(f"MQTT: {envio['tramas_enviadas']} tramas en {envio['mensajes_enviados']} mensajes, "
+              f"{envio['descartadas']} descartadas, {envio['coalescidas']} coalescidas")
+    if estadisticas['bloques'] > 0:
+        print(f"Latencia media: {estadisticas['latencia_media_ms']:.2f} ms")
+        print(f"Latencia p95: {estadisticas['latencia_p95_ms']:.2f} ms")
+        print(f"Latencia máxima: {estadisticas['latencia_max_ms']:.2f} ms")
+        print(f"Muestras descartadas: {estadisticas['muestras_descartadas']}")
+    if pipeline.instrumentacion.habilitada:
+        print(pipeline.instrumentacion.resumen())
+
+    print("\n✅ MODO TIEMPO REAL FINALIZADO")
+    return 0
+
+def main_reporte_arranque(graficas=False, mqtt=False):
+    """
+    Reporte de arranque de una ejecución real del pipeline (main), por
+    defecto sin gráficas ni MQTT: tiempo total, dependencias pesadas
+    cargadas o no y costo de cada carga diferida
+    """
+    codigo = main(graficas=graficas, mqtt=mqtt)
+    
+    reporte = reporte_arranque(_T_INICIO)
+    print("\n=== REPORTE DE ARRANQUE ===")
+    print(f"Gráficas: {'sí' if graficas else 'no'}, MQTT: {'sí' if mqtt else 'no'}")
+    print(f"Ejecución completa en: {1000 * reporte['tiempo_desde_inicio_s']:.1f} ms")
+    print(f"Dependencias cargadas: {', '.join(reporte['modulos_cargados']) or '-'}")
+    print(f"Dependencias diferidas: {', '.join(reporte['modulos_no_cargados']) or '-'}")
+    for modulo, tiempo in reporte['cargas_diferidas_s'].items():
+        print(f"  carga diferida {modulo}: {1000 * tiempo:.1f} ms")
+    
+    return codigo
+
+def main_validar_tipos(archivo_reporte=None):
+    """
+    Reporte de desviación de cada etapa con la política de tipos
+    (config.tipo_real) respecto de la ruta float64
+    """
+    from politica_tipos import validar_tipos, resumen_validacion
+    
+    config = Config()
+    print(f"=== VALIDACIÓN DE TIPOS: {config.tipo_real} vs float64 ===")
+    reporte = validar_tipos(config)
+    print(resumen_validacion(reporte))
+    
+    if archivo_reporte:
+        import json
+        with open(archivo_reporte, 'w') as f:
+            json.dump(reporte, f, indent=2)
+        print(f"Reporte guardado en: {archivo_reporte}")
+    
+    return 0
+
 if __name__ == "__main__":
-    exit(main())
\ No newline at end of file
+    # --sin-graficas / --sin-mqtt pueden acompañar a cualquier modo
+    opciones = {'graficas': None if '--sin-graficas' not in sys.argv else False,
+                'mqtt': None if '--sin-mqtt' not in sys.argv else False}
+    sys.argv = [a for a in sys.argv if a not in ('--sin-graficas', '--sin-mqtt')]
+    if len(sys.argv) > 1 and sys.argv[1] == '--reporte-arranque':
+        exit(main_reporte_arranque())
+    if len(sys.argv) > 1 and sys.argv[1] == '--tiempo-real':
+        exit(main_tiempo_real(*sys.argv[2:3], **opciones))
+    if len(sys.argv) > 1 and sys.argv[1] == '--lote':
+        from procesamiento_lote import main as main_lote
+        exit(main_lote(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == '--validar-tipos':
+        exit(main_validar_tipos(*sys.argv[2:3]))
+    if len(sys.argv) > 1 and sys.argv[1] == '--metricas':
+        exit(main(sys.argv[2] if len(sys.argv) > 2 else "datos/resultados/metricas.json", **opciones))
+    exit(main(**opciones))
\ No newline at end of file
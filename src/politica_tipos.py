@@ -0,0 +1,129 @@
+"""
+Política de tipos numéricos del pipeline
+
+config.tipo_real fija el tipo de punto flotante del audio, los estados de
+los filtros, las ventanas y los espectros ('float32' por defecto); la FFT
+usa el complejo del mismo ancho (complex64 para float32). Cada módulo
+convierte su entrada al tipo de la política al recibirla (sin copia si ya
+lo tiene) y guarda coeficientes y ventanas ya convertidos, de modo que
+ninguna etapa promueve el audio a float64 por mezclarlo con un arreglo
+float64.
+
+Los diseños (coeficientes, ventanas) se calculan en float64 y se
+convierten al final: solo el filtrado y las FFT corren en float32.
+
+validar_tipos() ejecuta las etapas con la política y con float64 y
+reporta la desviación numérica de cada una.
+"""
+
+import copy
+
+import numpy as np
+
+
+def tipo_real(config):
+    """dtype real de la política (float32 o float64)"""
+    tipo = np.dtype(config.tipo_real)
+    if tipo.kind != 'f':
+        raise ValueError(f"tipo_real debe ser de punto flotante, no {tipo}")
+    return tipo
+
+
+def tipo_complejo(config):
+    """dtype complejo de la FFT para la política (complex64 para float32)"""
+    return np.result_type(tipo_real(config), np.complex64)
+
+
+def _desviacion(valor, referencia):
+    """Error máximo, error relativo (norma 2) y SNR de la desviación (dB)"""
+    valor = np.asarray(valor, dtype=np.float64)
+    referencia = np.asarray(referencia, dtype=np.float64)
+    error = valor - referencia
+    norma = np.linalg.norm(referencia)
+    relativo = float(np.linalg.norm(error) / norma) if norma > 0 else 0.0
+    return {
+        'error_max': float(np.max(np.abs(error))) if error.size else 0.0,
+        'error_relativo': relativo,
+        'snr_desviacion_db': float(-20 * np.log10(relativo)) if relativo > 0 else float('inf')
+    }
+
+
+def _etapas(config, senal):
+    """Salidas de cada etapa del pipeline con la política de config"""
+    from preprocesamiento import Preprocesador
+    from filtros_digitales import FiltrosDigitales
+    from analisis_espectral import AnalizadorEspectral
+    from extraccion_caracteristicas import ExtractorCaracteristicas
+
+    preprocesador = Preprocesador(config)
+    filtros = FiltrosDigitales(config)
+    analizador = AnalizadorEspectral(config)
+    extractor = ExtractorCaracteristicas(config)
+    tam_bloque = int(round(config.duracion_bloque_ms * config.fs / 1000))
+
+    salidas = {}
+    salidas['preenfasis'] = senal_preenfasis = preprocesador.aplicar_preenfasis(senal)
+    salidas['notch'] = senal_notch = filtros.aplicar_filtro_notch(senal_preenfasis, config.f_notch)
+    salidas['pasabajos'] = senal_filtrada = filtros.aplicar_filtro_pasabajos(senal_notch, config.f_corte)
+    salidas['cadena_bloques'] = filtros.crear_cadena().procesar(senal_preenfasis, tam_bloque)
+    salidas['cancelador_red'] = filtros.cancelar_red(senal_preenfasis)
+    salidas['fft'] = analizador.calcular_fft(senal_filtrada)[1]
+    salidas['espectrograma_db'] = analizador.calcular_espectrograma(senal_filtrada)[2]
+    stft = analizador.crear_stft_incremental()
+    salidas['stft_bloques_db'] = np.concatenate(
+        [stft.procesar_bloque(senal_filtrada[i:i + tam_bloque])[1]
+         for i in range(0, len(senal_filtrada), tam_bloque)], axis=1)
+    salidas['caracteristicas'] = extractor.extraer_senal(senal_filtrada)[1]
+    salidas['snr_db'] = analizador.calcular_snr(senal_filtrada)
+    return salidas
+
+
+def validar_tipos(config, senal=None, duracion=5.0):
+    """
+    Compara cada etapa con la política de config contra la ruta float64
+
+    Ambas rutas reciben la misma señal ya cuantizada al tipo de la
+    política, de modo que la desviación mide solo la precisión del
+    procesamiento. Retorna {etapa: {dtype, bytes, bytes_float64,
+    error_max, error_relativo, snr_desviacion_db}}; los espectrogramas
+    se comparan en dB solo sobre los bins a menos de
+    espectrograma_rango_db del máximo.
+    """
+    if senal is None:
+        from captura_audio import CapturadorAudio
+        np.random.seed(0)
+        senal = CapturadorAudio(config).generar_senal_prueba(duracion)
+    senal = np.asarray(senal, dtype=tipo_real(config))
+
+    referencia = copy.copy(config)
+    referencia.tipo_real = 'float64'
+
+    salidas = _etapas(config, senal)
+    salidas_ref = _etapas(referencia, senal)
+
+    reporte = {}
+    for nombre, valor in salidas.items():
+        ref = salidas_ref[nombre]
+        if nombre.endswith('_db') and np.ndim(ref):
+            visibles = ref >= np.max(ref) - config.espectrograma_rango_db
+            desviacion = _desviacion(np.asarray(valor)[visibles], ref[visibles])
+        else:
+            desviacion = _desviacion(valor, ref)
+        reporte[nombre] = dict(
+            dtype=str(np.asarray(valor).dtype),
+            bytes=int(np.asarray(valor).nbytes),
+            bytes_float64=int(np.asarray(ref).nbytes),
+            **desviacion
+        )
+    return reporte
+
+
+def resumen_validacion(reporte):
+    """Tabla de texto del reporte de validar_tipos"""
+    lineas = [f"{'Etapa':18s} {'dtype':>10s} {'KiB':>9s} {'KiB f64':>9s} "
+              f"{'error máx':>11s} {'error rel':>11s} {'SNR dB':>8s}"]
+    for nombre, r in reporte.items():
+        lineas.append(f"{nombre:18s} {r['dtype']:>10s} {r['bytes'] / 1024:9.1f} "
+                      f"{r['bytes_float64'] / 1024:9.1f} {r['error_max']:11.3e} "
+                      f"{r['error_relativo']:11.3e} {r['snr_desviacion_db']:8.1f}")
+    return "\n".join(lineas)
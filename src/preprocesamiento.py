@@ -3,36 +3,84 @@ Módulo para preprocesamiento de señales de audio
 """
 
 import numpy as np
-from scipy import signal
-import matplotlib.pyplot as plt
+
+from cache_disenos import obtener_cache_disenos
+from importacion_diferida import importar_diferido
+from politica_tipos import tipo_real
+
+signal = importar_diferido('scipy.signal')
 
 class Preprocesador:
     def __init__(self, config):
         self.config = config
         self.alpha = config.alpha_preenfasis
+        self.tipo = tipo_real(config)
+        self._muestra_previa = 0.0  # x[n-1] del último bloque procesado
+        self.cache = obtener_cache_disenos(config)
         
     def aplicar_preenfasis(self, senal):
         """
         Aplica filtro de preénfasis: y[n] = x[n] - alpha * x[n-1]
         """
-        senal_preenfasis = np.zeros_like(senal)
+        senal = np.asarray(senal, dtype=self.tipo)
+        senal_preenfasis = np.empty_like(senal)
+        if len(senal) == 0:
+            return senal_preenfasis
+            
         senal_preenfasis[0] = senal[0]
+        senal_preenfasis[1:] = senal[1:] - self.alpha * senal[:-1]
         
-        for i in range(1, len(senal)):
-            senal_preenfasis[i] = senal[i] - self.alpha * senal[i-1]
+        return senal_preenfasis
+    
+    def aplicar_preenfasis_bloque(self, bloque):
+        """
+        Aplica preénfasis a un bloque de un flujo continuo
+        
+        Conserva la última muestra entre llamadas, de modo que procesar la
+        señal por bloques equivale a procesarla completa.
+        """
+        bloque = np.asarray(bloque, dtype=self.tipo)
+        senal_preenfasis = np.empty_like(bloque)
+        if len(bloque) == 0:
+            return senal_preenfasis
             
-        # Alternativa vectorizada (más eficiente)
-        # senal_preenfasis = np.append(senal[0], senal[1:] - self.alpha * senal[:-1])
+        senal_preenfasis[0] = bloque[0] - self.alpha * self._muestra_previa
+        senal_preenfasis[1:] = bloque[1:] - self.alpha * bloque[:-1]
+        self._muestra_previa = bloque[-1]
         
         return senal_preenfasis
     
+    def reiniciar_preenfasis(self):
+        """
+        Reinicia el estado del preénfasis por bloques (x[-1] = 0)
+        """
+        self._muestra_previa = 0.0
+    
+    def aplicar_preenfasis_lote(self, senales):
+        """
+        Aplica preénfasis a un lote de señales (arreglo 2-D, una señal por fila)
+        """
+        senales = np.asarray(senales, dtype=self.tipo)
+        senales_preenfasis = np.empty_like(senales)
+        if senales.shape[-1] == 0:
+            return senales_preenfasis
+            
+        senales_preenfasis[..., 0] = senales[..., 0]
+        senales_preenfasis[..., 1:] = senales[..., 1:] - self.alpha * senales[..., :-1]
+        
+        return senales_preenfasis
+    
     def respuesta_frecuencia_preenfasis(self):
         """
         Calcula respuesta en frecuencia del filtro de preénfasis
         """
-        w, h = signal.freqz([1, -self.alpha], [1], worN=2000, fs=self.config.fs)
+        def calcular():
+            return signal.freqz([1, -self.alpha], [1], worN=2000, fs=self.config.fs)
+        
+        clave = ('preenfasis', float(self.alpha), 2000, self.config.fs)
+        w, h = self.cache.obtener(clave, calcular)
         
-        return w, h
+        return w.copy(), h.copy()
     
     def normalizar_senal(self, senal):
         """
@@ -64,6 +112,25 @@ class Preprocesador:
         
         return senal[inicio:fin]
     
+    def segmentos_voz(self, senal):
+        """
+        Segmentos de voz [(inicio, fin)] en muestras según DetectorActividadVoz
+        """
+        detector = DetectorActividadVoz(self.config)
+        detector.procesar_bloque(senal)
+        detector.finalizar()
+        return [(int(round(t0 * self.config.fs)), int(round(t1 * self.config.fs)))
+                for t0, t1 in detector.segmentos]
+    
+    def extraer_voz(self, senal):
+        """
+        Concatena los segmentos de voz, quitando también los silencios internos
+        """
+        segmentos = self.segmentos_voz(senal)
+        if not segmentos:
+            return senal[:0]
+        return np.concatenate([senal[inicio:fin] for inicio, fin in segmentos])
+    
     def obtener_estadisticas(self, senal):
         """
         Calcula estadísticas básicas de la señal
@@ -73,4 +140,111 @@ class Preprocesador:
             'pico_maximo': np.max(np.abs(senal)),
             'media': np.mean(senal),
             'desviacion_estandar': np.std(senal)
-        }
\ No newline at end of file
+        }
+
+
+class DetectorActividadVoz:
+    """
+    Detector de actividad de voz (VAD) por tramas, incremental
+
+    Por trama calcula energía (dB) y tasa de cruces por cero (ZCR). Una
+    trama es de voz si su energía supera el piso de ruido en umbral_db, o
+    en la mitad de ese umbral con ZCR alta (fricativas sordas), y en ambos
+    casos supera energia_min_db. El piso baja de inmediato con tramas más
+    silenciosas y sube lento (subida_piso_db_s), así se adapta al ruido sin
+    absorber la voz. Tras la última trama de voz el estado se mantiene
+    durante colgado_ms (hangover) para no cortar finales de palabra.
+
+    procesar_bloque retorna los eventos ('inicio'/'fin', tiempo) a medida
+    que ocurren; en_voz indica si el último bloque tiene voz.
+    """
+
+    def __init__(self, config):
+        self.fs = config.fs
+        self.tipo = tipo_real(config)
+        self.tam_trama = max(int(round(config.vad_trama_ms * self.fs / 1000)), 1)
+        self.umbral_db = config.vad_umbral_db
+        self.energia_min_db = config.vad_energia_min_db
+        self.zcr_fricativa = config.vad_zcr_fricativa
+        self.tramas_colgado = int(round(config.vad_colgado_ms / config.vad_trama_ms))
+        self.subida_piso_db = config.vad_subida_piso_db_s * self.tam_trama / self.fs
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Reinicia piso de ruido, estado y segmentos"""
+        self._pendiente = np.zeros(0, dtype=self.tipo)
+        self.piso_db = None
+        self.en_voz = False
+        self._colgado = 0
+        self._inicio_segmento = None
+        self.tramas = 0
+        self.tramas_voz = 0
+        self.segmentos = []  # (t_inicio, t_fin) en segundos
+
+    def procesar_bloque(self, bloque):
+        """
+        Agrega un bloque de audio
+
+        Retorna (voz, eventos): voz es un arreglo booleano por trama
+        completada (incluye el hangover) y eventos la lista de
+        ('inicio' | 'fin', tiempo en s) ocurridos en el bloque.
+        """
+        senal = np.concatenate((self._pendiente, np.asarray(bloque, dtype=self.tipo)))
+        n_tramas = len(senal) // self.tam_trama
+        tramas = senal[:n_tramas * self.tam_trama].reshape(n_tramas, self.tam_trama)
+        self._pendiente = senal[n_tramas * self.tam_trama:].copy()
+
+        energias = 10 * np.log10(np.mean(tramas**2, axis=1) + 1e-12)
+        signos = np.signbit(tramas)
+        zcr = np.count_nonzero(signos[:, 1:] != signos[:, :-1], axis=1) / self.tam_trama
+
+        voz = np.zeros(n_tramas, dtype=bool)
+        eventos = []
+        for i in range(n_tramas):
+            energia = energias[i]
+            if self.piso_db is None or energia < self.piso_db:
+                self.piso_db = energia
+            else:
+                self.piso_db += self.subida_piso_db
+
+            sobre_piso = energia - self.piso_db
+            activa = energia > self.energia_min_db and (
+                sobre_piso > self.umbral_db or
+                (sobre_piso > self.umbral_db / 2 and zcr[i] > self.zcr_fricativa))
+
+            if activa:
+                self._colgado = self.tramas_colgado
+                if not self.en_voz:
+                    self.en_voz = True
+                    self._inicio_segmento = self.tramas * self.tam_trama / self.fs
+                    eventos.append(('inicio', self._inicio_segmento))
+            elif self.en_voz:
+                if self._colgado > 0:
+                    self._colgado -= 1
+                else:
+                    eventos.append(('fin', self._cerrar_segmento()))
+
+            voz[i] = self.en_voz
+            self.tramas += 1
+
+        self.tramas_voz += int(np.count_nonzero(voz))
+        return voz, eventos
+
+    def _cerrar_segmento(self):
+        """Cierra el segmento en curso al final de la trama actual"""
+        t_fin = self.tramas * self.tam_trama / self.fs
+        self.segmentos.append((self._inicio_segmento, t_fin))
+        self.en_voz = False
+        self._inicio_segmento = None
+        return t_fin
+
+    def finalizar(self):
+        """Cierra el segmento abierto al terminar el flujo; retorna sus eventos"""
+        if not self.en_voz:
+            return []
+        return [('fin', self._cerrar_segmento())]
+
+    @property
+    def fraccion_voz(self):
+        """Fracción de tramas marcadas como voz"""
+        return self.tramas_voz / self.tramas if self.tramas else 0.0
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Procesamiento por lotes de un corpus de audio en paralelo
+Orange Pi 5 Plus - Procesamiento Digital de Señales
+
+Reparte los archivos de un directorio entre un pool de procesos y escribe
+una única tabla de resultados (CSV) con una fila por archivo.
+"""
+
+import argparse
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from config import Config
+from captura_audio import CapturadorAudio
+from preprocesamiento import Preprocesador
+from filtros_digitales import FiltrosDigitales
+from analisis_espectral import AnalizadorEspectral
+
+# Módulos de cada proceso trabajador (se crean una vez por proceso)
+_trabajador = {}
+
+
+def _inicializar_trabajador(config):
+    """Crea los módulos DSP del proceso trabajador"""
+    _trabajador['config'] = config
+    _trabajador['capturador'] = CapturadorAudio(config)
+    _trabajador['preprocesador'] = Preprocesador(config)
+    _trabajador['filtros'] = FiltrosDigitales(config)
+    _trabajador['analizador'] = AnalizadorEspectral(config)
+
+
+def procesar_archivo(ruta):
+    """
+    Ejecuta el pipeline DSP sobre un archivo y retorna su fila de resultados
+    """
+    if not _trabajador:
+        _inicializar_trabajador(Config())
+
+    config = _trabajador['config']
+    analizador = _trabajador['analizador']
+    filtros = _trabajador['filtros']
+
+    inicio = time.perf_counter()
+    fila = {'archivo': ruta}
+    try:
+        senal_original, fs = _trabajador['capturador'].cargar_audio(ruta, respaldo=False)
+        senal_preenfasis = _trabajador['preprocesador'].aplicar_preenfasis(senal_original)
+        senal_notch = filtros.aplicar_filtro_notch(senal_preenfasis, config.f_notch)
+        senal_filtrada = filtros.aplicar_filtro_pasabajos(senal_notch, config.f_corte)
+
+        snr_original = analizador.calcular_snr(senal_original)
+        snr_filtrado = analizador.calcular_snr(senal_filtrada)
+        frecuencias, fft_filtrada = analizador.calcular_fft(senal_filtrada)
+        energias = analizador.calcular_energia_subbandas(fft_filtrada, frecuencias)
+
+        fila.update({
+            'duracion_s': len(senal_original) / fs,
+            'fs': fs,
+            'snr_original': snr_original,
+            'snr_filtrado': snr_filtrado,
+            'mejora_snr': snr_filtrado - snr_original,
+            'centroide_espectral': analizador.calcular_centroide_espectral(fft_filtrada, frecuencias),
+            'ancho_banda_espectral': analizador.calcular_ancho_banda_espectral(fft_filtrada, frecuencias)
+        })
+        for nombre, energia in zip(nombres_bandas(config), energias):
+            fila[nombre] = energia
+        fila['error'] = ''
+
+    except Exception as e:
+        fila['error'] = str(e)
+
+    fila['tiempo_proceso_s'] = time.perf_counter() - inicio
+    return fila
+
+
+def nombres_bandas(config):
+    """Nombres de columna de las energías por subbanda"""
+    bandas = config.bandas_energia
+    return [f"energia_{bandas[i]}_{bandas[i + 1]}" for i in range(len(bandas) - 1)]
+
+
+class ProcesadorCorpus:
+    """Procesa todos los archivos de audio de un directorio con un pool de procesos"""
+
+    def __init__(self, config, trabajadores=None, tam_lote=None):
+        self.config = config
+        self.trabajadores = trabajadores or config.trabajadores_lote or os.cpu_count()
+        self.tam_lote = tam_lote or config.tam_lote_archivos
+
+    def columnas(self):
+        """Columnas de la tabla consolidada"""
+        return (['archivo', 'duracion_s', 'fs', 'snr_original', 'snr_filtrado',
+                 'mejora_snr', 'centroide_espectral', 'ancho_banda_espectral'] +
+                nombres_bandas(self.config) +
+                ['tiempo_proceso_s', 'error'])
+
+    def procesar_directorio(self, directorio, archivo_salida):
+        """
+        Procesa el directorio y escribe la tabla de resultados en archivo_salida (CSV)
+        """
+        archivos = sorted(CapturadorAudio(self.config).listar_archivos_audio(directorio))
+        print(f"Procesando {len(archivos)} archivos con {self.trabajadores} procesos "
+              f"(lotes de {self.tam_lote})")
+
+        directorio_salida = os.path.dirname(archivo_salida)
+        if directorio_salida and not os.path.exists(directorio_salida):
+            os.makedirs(directorio_salida)
+
+        inicio = time.perf_counter()
+        duracion_audio = 0.0
+        errores = 0
+
+        with open(archivo_salida, 'w', newline='') as f, \
+                ProcessPoolExecutor(max_workers=self.trabajadores,
+                                    initializer=_inicializar_trabajador,
+                                    initargs=(self.config,)) as pool:
+            escritor = csv.DictWriter(f, fieldnames=self.columnas())
+            escritor.writeheader()
+
+            # Las filas se escriben a medida que llegan, en el orden de los archivos
+            for fila in pool.map(procesar_archivo, archivos, chunksize=self.tam_lote):
+                escritor.writerow(fila)
+                if fila['error']:
+                    errores += 1
+                else:
+                    duracion_audio += fila['duracion_s']
+
+        tiempo_total = time.perf_counter() - inicio
+        reporte = {
+            'archivos': len(archivos),
+            'errores': errores,
+            'tiempo_total_s': tiempo_total,
+            'duracion_audio_s': duracion_audio,
+            'archivos_por_s': len(archivos) / tiempo_total if tiempo_total > 0 else 0.0,
+            'audio_s_por_s': duracion_audio / tiempo_total if tiempo_total > 0 else 0.0
+        }
+
+        print(f"✅ Tabla de resultados: {archivo_salida}")
+        print(f"Archivos: {reporte['archivos']} ({reporte['errores']} con error)")
+        print(f"Tiempo total: {reporte['tiempo_total_s']:.2f} s")
+        print(f"Throughput: {reporte['archivos_por_s']:.2f} archivos/s, "
+              f"{reporte['audio_s_por_s']:.2f} s de audio/s")
+
+        return reporte
+
+
+def main(argumentos=None):
+    """Punto de entrada por línea de comandos"""
+    parser = argparse.ArgumentParser(description="Procesamiento DSP por lotes de un directorio de audio")
+    parser.add_argument('directorio', help="Directorio con archivos WAV/FLAC/MP3")
+    parser.add_argument('-s', '--salida', default=None,
+                        help="Archivo CSV de resultados (por defecto en config.ruta_resultados)")
+    parser.add_argument('-w', '--trabajadores', type=int, default=None,
+                        help="Número de procesos (por defecto config.trabajadores_lote o núcleos)")
+    parser.add_argument('-c', '--tam-lote', type=int, default=None,
+                        help="Archivos enviados a cada proceso por tarea")
+    args = parser.parse_args(argumentos)
+
+    config = Config()
+    salida = args.salida or os.path.join(config.ruta_resultados, "resultados_lote.csv")
+
+    procesador = ProcesadorCorpus(config, args.trabajadores, args.tam_lote)
+    reporte = procesador.procesar_directorio(args.directorio, salida)
+
+    return 0 if reporte['errores'] < reporte['archivos'] or reporte['archivos'] == 0 else 1
+
+
+if __name__ == "__main__":
+    exit(main())
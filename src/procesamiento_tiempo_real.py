@@ -0,0 +1,434 @@
+"""
+Módulo de procesamiento en tiempo real por bloques
+Orange Pi 5 Plus - Procesamiento Digital de Señales
+
+Captura → buffer circular → preénfasis → notch → pasabajos →
+características espectrales → publicación, bloque a bloque.
+"""
+
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from analisis_espectral import AnalizadorEspectral
+from filtros_digitales import FiltrosDigitales
+from preprocesamiento import Preprocesador, DetectorActividadVoz
+from importacion_diferida import importar_diferido
+from instrumentacion import Instrumentacion
+from politica_tipos import tipo_real
+from remuestreo import Remuestreador
+
+sd = importar_diferido('sounddevice')
+
+
+class BufferCircular:
+    """Buffer circular de muestras con memoria acotada y marcas de tiempo de captura"""
+
+    def __init__(self, capacidad, tipo=np.float32):
+        self.capacidad = int(capacidad)
+        self.datos = np.zeros(self.capacidad, dtype=tipo)
+        self._escritas = 0  # Índice absoluto de la próxima muestra a escribir
+        self._leidas = 0  # Índice absoluto de la próxima muestra a leer
+        self._marcas = deque()  # (índice absoluto final, instante de captura)
+        self._lock = threading.Lock()
+        self.descartadas = 0
+
+    def disponibles(self):
+        """Número de muestras pendientes de lectura"""
+        with self._lock:
+            return self._escritas - self._leidas
+
+    def escribir(self, muestras, t_captura=None):
+        """
+        Escribe muestras en el buffer (apto para el callback de captura)
+
+        Si el buffer se llena se sobrescriben las muestras más antiguas.
+        """
+        if t_captura is None:
+            t_captura = time.perf_counter()
+        muestras = np.asarray(muestras, dtype=self.datos.dtype).ravel()
+        n = len(muestras)
+        if n == 0:
+            return
+
+        with self._lock:
+            # Si el bloque no cabe completo, solo se conservan las últimas muestras
+            if n > self.capacidad:
+                self._escritas += n - self.capacidad
+                muestras = muestras[-self.capacidad:]
+                n = self.capacidad
+
+            inicio = self._escritas % self.capacidad
+            primera = min(n, self.capacidad - inicio)
+            self.datos[inicio:inicio + primera] = muestras[:primera]
+            self.datos[:n - primera] = muestras[primera:]
+            self._escritas += n
+            self._marcas.append((self._escritas, t_captura))
+
+            # Desbordamiento: se pierden las muestras no leídas más antiguas
+            exceso = self._escritas - self._leidas - self.capacidad
+            if exceso > 0:
+                self.descartadas += exceso
+                self._leidas += exceso
+
+    def leer(self, n, parcial=False):
+        """
+        Lee n muestras del buffer
+
+        Retorna (bloque, t_captura) donde t_captura es el instante en que
+        se capturó la última muestra del bloque, o (None, None) si no hay
+        suficientes muestras.
+        """
+        with self._lock:
+            pendientes = self._escritas - self._leidas
+            if pendientes < n:
+                if not parcial or pendientes == 0:
+                    return None, None
+                n = pendientes
+
+            inicio = self._leidas % self.capacidad
+            indices = (inicio + np.arange(n)) % self.capacidad
+            bloque = self.datos[indices]
+            self._leidas += n
+
+            # Marca de la escritura que contiene la última muestra leída
+            while self._marcas[0][0] < self._leidas:
+                self._marcas.popleft()
+            t_captura = self._marcas[0][1]
+
+        return bloque, t_captura
+
+
+class FuenteSenal:
+    """Fuente de audio a partir de un arreglo en memoria (archivo o señal de prueba)"""
+
+    def __init__(self, senal, fs, tiempo_real=False):
+        self.senal = np.asarray(senal, dtype=np.float32)
+        self.fs = fs
+        self.tiempo_real = tiempo_real
+        self._posicion = 0  # Posición de lectura en la señal de origen
+        self._entregadas = 0  # Muestras entregadas al buffer (a self.fs)
+        self._t_inicio = None
+
+    def iniciar(self, buffer):
+        self._posicion = 0
+        self._entregadas = 0
+        self._t_inicio = time.perf_counter()
+
+    def alimentar(self, buffer, n):
+        """
+        Entrega hasta n muestras al buffer. Retorna False cuando la fuente se agota
+        """
+        if self.agotada():
+            return False
+
+        if self.tiempo_real:
+            # Esperar a que las muestras "existan" según el reloj de muestreo
+            t_disponible = self._t_inicio + (self._entregadas + n) / self.fs
+            espera = t_disponible - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+
+        bloque = self._siguiente(n)
+        self._entregadas += len(bloque)
+        buffer.escribir(bloque)
+        return True
+
+    def agotada(self):
+        return self._posicion >= len(self.senal)
+
+    def _siguiente(self, n):
+        bloque = self.senal[self._posicion:self._posicion + n]
+        self._posicion += len(bloque)
+        return bloque
+
+    def detener(self):
+        pass
+
+    @classmethod
+    def desde_archivo(cls, capturador, archivo, tiempo_real=False):
+        """
+        Crea una fuente a partir de un archivo de audio
+
+        Los WAV se decodifican por bloques desde el mapeo en memoria (y se
+        remuestrean por bloques si hace falta); el resto se carga completo
+        con cargar_audio.
+        """
+        lector = capturador.abrir_audio(archivo)
+        if lector is not None:
+            remuestreador = None
+            if lector.fs != capturador.fs:
+                remuestreador = Remuestreador(capturador.config, lector.fs, capturador.fs)
+            return FuenteArchivo(lector, tiempo_real, remuestreador)
+        senal, fs = capturador.cargar_audio(archivo)
+        return cls(senal, fs, tiempo_real)
+
+    @classmethod
+    def desde_prueba(cls, capturador, duracion, tiempo_real=False):
+        """Crea una fuente con la señal de prueba de CapturadorAudio"""
+        senal = capturador.generar_senal_prueba(duracion)
+        return cls(senal, capturador.fs, tiempo_real)
+
+
+class FuenteArchivo(FuenteSenal):
+    """
+    Fuente que decodifica bajo demanda los bloques de un WAV mapeado en memoria,
+    opcionalmente remuestreados a la frecuencia de trabajo
+    """
+
+    def __init__(self, lector, tiempo_real=False, remuestreador=None):
+        self.lector = lector
+        self.remuestreador = remuestreador
+        self.fs = lector.fs if remuestreador is None else remuestreador.fs_salida
+        self.tiempo_real = tiempo_real
+        self._posicion = 0
+        self._entregadas = 0
+        self._t_inicio = None
+
+    def iniciar(self, buffer):
+        super().iniciar(buffer)
+        if self.remuestreador is not None:
+            self.remuestreador.reiniciar()
+
+    def agotada(self):
+        return self._posicion >= len(self.lector)
+
+    def _siguiente(self, n):
+        if self.remuestreador is None:
+            bloque = self.lector.leer(self._posicion, n)
+            self._posicion += len(bloque)
+            return bloque
+
+        # Muestras de entrada necesarias para ~n muestras de salida
+        n_entrada = -(-n * self.remuestreador.down // self.remuestreador.up)
+        bloque = self.lector.leer(self._posicion, n_entrada)
+        self._posicion += len(bloque)
+        return self.remuestreador.procesar_bloque(bloque)
+
+    def detener(self):
+        self.lector.cerrar()
+
+
+class FuenteMicrofono:
+    """Fuente de audio en vivo: el callback de captura escribe en el buffer circular"""
+
+    def __init__(self, config, tam_bloque):
+        self.config = config
+        self.fs = config.fs
+        self.tam_bloque = tam_bloque
+        self.stream = None
+
+    def iniciar(self, buffer):
+        def callback(indata, frames, tiempo, estado):
+            # Solo copiar al buffer: nada de procesamiento dentro del callback
+            buffer.escribir(indata[:, 0])
+
+        self.stream = sd.InputStream(
+            samplerate=self.fs,
+            channels=self.config.canales,
+            dtype='float32',
+            blocksize=self.tam_bloque,
+            callback=callback
+        )
+        self.stream.start()
+
+    def alimentar(self, buffer, n):
+        """Espera a que el callback produzca más muestras"""
+        if self.stream is None or not self.stream.active:
+            return False
+        time.sleep(0.5 * n / self.fs)
+        return True
+
+    def detener(self):
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+
+
+class PipelineTiempoReal:
+    """Pipeline DSP por bloques con estado entre bloques y latencia medible"""
+
+    def __init__(self, config, publicar=None, f_notch=None, fc=None, instrumentacion=None):
+        self.config = config
+        self.instrumentacion = instrumentacion or Instrumentacion.desde_config(config)
+        self.fs = config.fs
+        self.tam_bloque = int(round(config.duracion_bloque_ms * self.fs / 1000))
+        self.buffer = BufferCircular(self.tam_bloque * config.bloques_buffer, tipo_real(config))
+        self.publicar = publicar
+        self.publicar_cada = config.publicar_cada_bloques
+        # Formato binario: espectro y características como arreglos con tipo
+        # DSPB (publicar(valores, tipo)); los eventos de voz siguen en JSON
+        self.formato_binario = config.mqtt_formato == 'binario'
+
+        if f_notch is None:
+            f_notch = config.f_notch
+        if fc is None:
+            fc = config.f_corte
+
+        self.preprocesador = Preprocesador(config)
+        self.filtros = FiltrosDigitales(config)
+        self.analizador = AnalizadorEspectral(config)
+
+        # Notch + pasabajos con estado entre bloques; con el cancelador de
+        # red (fundamental y armónicos adaptativos) la cadena no lleva notch
+        self.cancelador = self.filtros.crear_cancelador_red() if config.cancelador_red else None
+        self.cadena = self.filtros.crear_cadena([] if self.cancelador else f_notch, fc)
+
+        # Con VAD, los bloques de silencio no pasan por FFT, características ni publicación
+        # (el pipeline por bloques no calcula SNR ni espectrograma)
+        self.vad = DetectorActividadVoz(config) if config.vad_habilitado else None
+
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Reinicia estados de filtros y estadísticas"""
+        self.preprocesador.reiniciar_preenfasis()
+        self.cadena.reiniciar()
+        if self.cancelador is not None:
+            self.cancelador.reiniciar()
+        if self.vad is not None:
+            self.vad.reiniciar()
+
+        self.bloques_procesados = 0
+        self.bloques_silencio = 0
+        self.muestras_procesadas = 0
+        self._latencias = deque(maxlen=1000)
+        self._latencia_max = 0.0
+        self._latencia_total = 0.0
+        self.ultimo_resultado = None
+
+    def procesar_bloque(self, bloque, t_captura=None):
+        """
+        Procesa un bloque de audio y retorna sus características
+        """
+        if t_captura is None:
+            t_captura = time.perf_counter()
+
+        etapa = self.instrumentacion.etapa
+        n = len(bloque)
+
+        # 1. Preénfasis con la última muestra del bloque anterior
+        with etapa('preenfasis', n):
+            senal_preenfasis = self.preprocesador.aplicar_preenfasis_bloque(bloque)
+
+        # 2. Notch IIR y pasabajos FIR conservando condiciones iniciales
+        #    (también en silencio, para no romper el estado de los filtros)
+        if self.cancelador is not None:
+            with etapa('cancelador_red', n):
+                senal_preenfasis = self.cancelador.procesar_bloque(senal_preenfasis)
+        with etapa('filtros', n):
+            senal_filtrada = self.cadena.procesar_bloque(senal_preenfasis)
+
+        # Detección de voz: los eventos de inicio/fin se publican al ocurrir
+        hay_voz = True
+        if self.vad is not None:
+            with etapa('vad', n):
+                voz, eventos = self.vad.procesar_bloque(bloque)
+            hay_voz = bool(voz.any()) if len(voz) else self.vad.en_voz
+            if self.publicar is not None:
+                for evento, tiempo in eventos:
+                    self.publicar({'evento': f"{evento}_voz", 'tiempo': tiempo})
+
+        # 3. Características espectrales del bloque
+        if hay_voz:
+            with etapa('fft', n):
+                frecuencias, fft_bloque = self.analizador.calcular_fft(senal_filtrada)
+            with etapa('caracteristicas', n):
+                resultado = self._caracteristicas(senal_filtrada, frecuencias, fft_bloque)
+            if self.vad is not None:
+                resultado['voz'] = True
+        else:
+            resultado = {'bloque': self.bloques_procesados,
+                         'tiempo': self.muestras_procesadas / self.fs,
+                         'voz': False}
+            self.bloques_silencio += 1
+
+        self.bloques_procesados += 1
+        self.muestras_procesadas += len(bloque)
+
+        # 4. Publicación
+        if (hay_voz and self.publicar is not None and
+                self.bloques_procesados % self.publicar_cada == 0):
+            with etapa('publicacion'):
+                if self.formato_binario:
+                    self.publicar(fft_bloque, 'espectro')
+                    self.publicar(self.vector_caracteristicas(resultado), 'caracteristicas')
+                else:
+                    self.publicar(resultado)
+
+        # Latencia captura → resultado
+        latencia = time.perf_counter() - t_captura
+        resultado['latencia_ms'] = 1000 * latencia
+        self._latencias.append(latencia)
+        self._latencia_total += latencia
+        self._latencia_max = max(self._latencia_max, latencia)
+        self.ultimo_resultado = resultado
+
+        return resultado, senal_filtrada
+
+    def _caracteristicas(self, senal_filtrada, frecuencias, fft_bloque):
+        """Resultado publicable de un bloque filtrado"""
+        return {
+            'bloque': self.bloques_procesados,
+            'tiempo': self.muestras_procesadas / self.fs,
+            'rms': float(np.sqrt(np.mean(senal_filtrada**2))),
+            'centroide_espectral': float(
+                self.analizador.calcular_centroide_espectral(fft_bloque, frecuencias)),
+            'energias_subbandas': [float(e) for e in
+                                   self.analizador.calcular_energia_subbandas(fft_bloque, frecuencias)]
+        }
+
+    @staticmethod
+    def vector_caracteristicas(resultado):
+        """[rms, centroide_espectral, energias_subbandas...] de un resultado, en float32"""
+        return np.array([resultado['rms'], resultado['centroide_espectral']] +
+                        resultado['energias_subbandas'], dtype=np.float32)
+
+    def ejecutar(self, fuente, duracion_max=None, al_resultado=None):
+        """
+        Ejecuta el pipeline sobre una fuente hasta que se agote o se alcance duracion_max
+        """
+        max_bloques = None
+        if duracion_max is not None:
+            max_bloques = int(np.ceil(duracion_max * self.fs / self.tam_bloque))
+
+        fuente.iniciar(self.buffer)
+        try:
+            while max_bloques is None or self.bloques_procesados < max_bloques:
+                bloque, t_captura = self.buffer.leer(self.tam_bloque)
+                if bloque is None:
+                    if fuente.alimentar(self.buffer, self.tam_bloque):
+                        continue
+                    # Fuente agotada: procesar las muestras restantes
+                    bloque, t_captura = self.buffer.leer(self.tam_bloque, parcial=True)
+                    if bloque is None:
+                        break
+
+                resultado, _ = self.procesar_bloque(bloque, t_captura)
+                if al_resultado is not None:
+                    al_resultado(resultado)
+        finally:
+            fuente.detener()
+
+        return self.estadisticas()
+
+    def estadisticas(self):
+        """Resumen de latencia y carga del pipeline"""
+        if self.bloques_procesados == 0:
+            return {'bloques': 0}
+
+        latencias = np.array(self._latencias) * 1000
+        return {
+            'bloques': self.bloques_procesados,
+            'muestras': self.muestras_procesadas,
+            'duracion_audio_s': self.muestras_procesadas / self.fs,
+            'tam_bloque': self.tam_bloque,
+            'latencia_media_ms': 1000 * self._latencia_total / self.bloques_procesados,
+            'latencia_p95_ms': float(np.percentile(latencias, 95)),
+            'latencia_max_ms': 1000 * self._latencia_max,
+            'muestras_descartadas': self.buffer.descartadas,
+            'bloques_silencio': self.bloques_silencio
+        }
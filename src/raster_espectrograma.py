@@ -0,0 +1,187 @@
+"""
+Renderizado raster de espectrogramas
+
+La matriz en dB se cuantiza a uint8 sobre un rango fijo y cada código se
+traduce a RGB con una tabla de colores precalculada (una indexación por
+píxel). La imagen resultante se escribe directo como PNG (zlib + struct),
+sin pasar por matplotlib, o se entrega a imshow como mapa de bits.
+"""
+
+import json
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from importacion_diferida import importar_diferido
+
+matplotlib = importar_diferido('matplotlib')
+
+# nombre -> tabla (256 × 3) uint8
+_tablas = {}
+
+
+def tabla_colores(nombre='viridis'):
+    """
+    Tabla de 256 colores RGB uint8 del colormap de matplotlib indicado
+
+    Sin matplotlib se usa una escala de grises.
+    """
+    if nombre not in _tablas:
+        try:
+            mapa = matplotlib.colormaps[nombre]
+            tabla = np.rint(mapa(np.linspace(0, 1, 256))[:, :3] * 255).astype(np.uint8)
+        except ImportError:
+            tabla = np.repeat(np.arange(256, dtype=np.uint8)[:, None], 3, axis=1)
+        _tablas[nombre] = tabla
+    return _tablas[nombre]
+
+
+def cuantizar_db(Sxx_db, piso_db, techo_db):
+    """
+    Cuantiza valores en dB a códigos uint8 (piso → 0, techo → 255)
+    """
+    escala = 255 / (techo_db - piso_db)
+    codigos = (np.asarray(Sxx_db, dtype=np.float32) - np.float32(piso_db)) * np.float32(escala)
+    np.clip(codigos, 0, 255, out=codigos)
+    return np.rint(codigos, out=codigos).astype(np.uint8)
+
+
+def escribir_png(ruta, rgb):
+    """
+    Escribe una imagen RGB uint8 (alto × ancho × 3) como PNG de 8 bits
+    """
+    rgb = np.ascontiguousarray(rgb, dtype=np.uint8)
+    alto, ancho = rgb.shape[:2]
+
+    # Cada fila va precedida del tipo de filtro (0: ninguno)
+    filas = np.zeros((alto, 1 + 3 * ancho), dtype=np.uint8)
+    filas[:, 1:] = rgb.reshape(alto, 3 * ancho)
+
+    def chunk(tipo, datos):
+        return (struct.pack('>I', len(datos)) + tipo + datos +
+                struct.pack('>I', zlib.crc32(tipo + datos) & 0xFFFFFFFF))
+
+    with open(ruta, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', ancho, alto, 8, 2, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(filas.tobytes(), 6)))
+        f.write(chunk(b'IEND', b''))
+
+
+class RasterEspectrograma:
+    """
+    Convierte matrices de espectrograma en dB (frecuencias × tiempos) en
+    imágenes RGB con una tabla de colores
+
+    techo_db=None toma el máximo de cada matriz; el piso es techo - rango_db.
+    f_max recorta las filas por encima de esa frecuencia.
+    """
+
+    def __init__(self, config, rango_db=None, techo_db=None, mapa='viridis', f_max=None):
+        self.config = config
+        self.rango_db = config.espectrograma_rango_db if rango_db is None else rango_db
+        self.techo_db = config.espectrograma_techo_db if techo_db is None else techo_db
+        self.f_max = config.espectrograma_f_max if f_max is None else f_max
+        self.mapa = mapa
+
+    def limites(self, Sxx_db):
+        """(piso_db, techo_db) usados para cuantizar Sxx_db"""
+        techo = float(np.max(Sxx_db)) if self.techo_db is None else self.techo_db
+        return techo - self.rango_db, techo
+
+    def filas_visibles(self, f):
+        """Número de filas de frecuencia hasta f_max"""
+        if self.f_max is None:
+            return len(f)
+        return int(np.searchsorted(f, self.f_max, side='right'))
+
+    def imagen(self, Sxx_db, f=None, limites=None):
+        """
+        Imagen RGB uint8 (alto × ancho × 3) con las frecuencias bajas abajo
+        """
+        if f is not None:
+            Sxx_db = Sxx_db[:self.filas_visibles(f)]
+        piso, techo = self.limites(Sxx_db) if limites is None else limites
+        codigos = cuantizar_db(Sxx_db[::-1], piso, techo)
+        return tabla_colores(self.mapa)[codigos]
+
+    def guardar(self, Sxx_db, ruta, f=None):
+        """Escribe el espectrograma como PNG (un píxel por bin y trama)"""
+        escribir_png(ruta, self.imagen(Sxx_db, f))
+
+
+class CascadaEspectrograma:
+    """
+    Espectrograma en cascada para monitoreo continuo
+
+    Recibe columnas del STFT incremental (en dB) y las acumula en teselas
+    de 'columnas' tramas de ancho; cada tesela llena se escribe como PNG en
+    el directorio junto con un índice JSON de tiempos. Se usa un rango de
+    dB fijo para que las teselas sean comparables entre sí.
+    """
+
+    def __init__(self, config, frecuencias, directorio=None, columnas=None, piso_db=None, techo_db=None,
+                 mapa='viridis'):
+        self.directorio = config.cascada_directorio if directorio is None else directorio
+        self.columnas = config.cascada_columnas if columnas is None else columnas
+        techo = config.cascada_techo_db if techo_db is None else techo_db
+        piso = techo - config.espectrograma_rango_db if piso_db is None else piso_db
+        self.raster = RasterEspectrograma(config, techo - piso, techo, mapa)
+        self.limites = (piso, techo)
+
+        self.filas = self.raster.filas_visibles(frecuencias)
+        self.teselas = []  # {'archivo', 't_inicio', 't_fin', 'columnas'}
+
+        if not os.path.exists(self.directorio):
+            os.makedirs(self.directorio)
+
+        # Tesela en construcción: códigos uint8 (filas × columnas)
+        self._codigos = np.zeros((self.filas, self.columnas), dtype=np.uint8)
+        self._llenas = 0
+        self._t_inicio = None
+        self._t_fin = None
+
+    def agregar(self, tiempos, Sxx_db):
+        """
+        Agrega columnas (frecuencias × tramas, como las de STFTIncremental)
+
+        Retorna la lista de archivos de teselas completadas.
+        """
+        escritas = []
+        codigos = cuantizar_db(Sxx_db[:self.filas], *self.limites)
+        tomadas = 0
+        while tomadas < codigos.shape[1]:
+            n = min(self.columnas - self._llenas, codigos.shape[1] - tomadas)
+            self._codigos[:, self._llenas:self._llenas + n] = codigos[:, tomadas:tomadas + n]
+            if self._t_inicio is None:
+                self._t_inicio = float(tiempos[tomadas])
+            self._t_fin = float(tiempos[tomadas + n - 1])
+            self._llenas += n
+            tomadas += n
+            if self._llenas == self.columnas:
+                escritas.append(self._escribir_tesela())
+        return escritas
+
+    def _escribir_tesela(self):
+        """Escribe la tesela en construcción y actualiza el índice"""
+        archivo = os.path.join(self.directorio, f"cascada_{len(self.teselas):05d}.png")
+        rgb = tabla_colores(self.raster.mapa)[self._codigos[::-1, :self._llenas]]
+        escribir_png(archivo, rgb)
+
+        self.teselas.append({'archivo': os.path.basename(archivo), 't_inicio': self._t_inicio,
+                             't_fin': self._t_fin, 'columnas': self._llenas})
+        with open(os.path.join(self.directorio, "indice.json"), 'w') as f:
+            json.dump({'piso_db': self.limites[0], 'techo_db': self.limites[1],
+                       'teselas': self.teselas}, f, indent=2)
+
+        self._llenas = 0
+        self._t_inicio = None
+        return archivo
+
+    def cerrar(self):
+        """Escribe la tesela incompleta, si la hay"""
+        if self._llenas:
+            return self._escribir_tesela()
+        return None
@@ -0,0 +1,102 @@
+"""
+Módulo de remuestreo polifásico racional (fs_entrada → fs_salida)
+"""
+
+from fractions import Fraction
+
+import numpy as np
+
+from cache_disenos import obtener_cache_disenos
+from importacion_diferida import importar_diferido
+from politica_tipos import tipo_real
+
+signal = importar_diferido('scipy.signal')
+
+
+class Remuestreador:
+    """
+    Remuestreo por factor racional up/down con filtro polifásico
+
+    El filtro antialias es el mismo que usa signal.resample_poly (FIR con
+    ventana de Kaiser, beta=5, 20·max(up, down)+1 coeficientes) y se guarda
+    en la caché de diseños por relación up/down. Sirve tanto para arreglos
+    completos (remuestrear) como para flujos por bloques con estado
+    (procesar_bloque), sin formar nunca la señal sobremuestreada.
+    """
+
+    def __init__(self, config, fs_entrada, fs_salida=None):
+        if fs_salida is None:
+            fs_salida = config.fs
+
+        self.fs_entrada = fs_entrada
+        self.fs_salida = fs_salida
+        relacion = Fraction(int(fs_salida), int(fs_entrada))
+        self.up = relacion.numerator
+        self.down = relacion.denominator
+
+        self.tipo = tipo_real(config)
+        cache = obtener_cache_disenos(config)
+        self.taps = cache.obtener(('remuestreo', self.up, self.down), self._diseñar_filtro)
+
+        # Matriz polifásica (up × coeficientes por fase), con la ganancia up
+        self.coef_por_fase = -(-len(self.taps) // self.up)
+        h = np.zeros(self.up * self.coef_por_fase)
+        h[:len(self.taps)] = self.taps * self.up
+        self.polifase = h.reshape(self.coef_por_fase, self.up).T.astype(self.tipo)
+
+        # Retardo del filtro en muestras de salida (fase lineal)
+        self.retardo = (len(self.taps) - 1) / 2 / self.down
+
+        self.reiniciar()
+
+    def _diseñar_filtro(self):
+        """
+        Filtro antialias/anti-imagen con los parámetros de resample_poly
+        """
+        max_rate = max(self.up, self.down)
+        if max_rate == 1:
+            return np.ones(1)
+        return signal.firwin(2 * 10 * max_rate + 1, 1.0 / max_rate, window=('kaiser', 5.0))
+
+    def reiniciar(self):
+        """
+        Reinicia el estado del flujo (entrada previa nula)
+        """
+        self._historia = np.zeros(self.coef_por_fase - 1, dtype=self.tipo)
+        self._recibidas = 0  # Muestras de entrada recibidas
+        self._generadas = 0  # Muestras de salida generadas
+
+    def remuestrear(self, senal):
+        """
+        Remuestrea una señal completa (compensando el retardo del filtro)
+        """
+        senal = np.asarray(senal, dtype=self.tipo)
+        if self.up == self.down:
+            return senal.copy()
+        return signal.resample_poly(senal, self.up, self.down, window=np.array(self.taps, dtype=self.tipo))
+
+    def procesar_bloque(self, bloque):
+        """
+        Remuestrea un bloque de un flujo continuo (salida causal)
+
+        y[m] = Σ_t x[i0 - t] · h[p + t·up],  con i0 = ⌊m·down/up⌋ y p = m·down mod up
+        """
+        bloque = np.asarray(bloque, dtype=self.tipo)
+        extendida = np.concatenate((self._historia, bloque))
+        self._recibidas += len(bloque)
+
+        # Salidas cuya última muestra de entrada necesaria ya llegó
+        m_fin = (self._recibidas * self.up - 1) // self.down + 1
+        m = np.arange(self._generadas, m_fin)
+        self._generadas = m_fin
+
+        posiciones = m * self.down
+        fases = posiciones % self.up
+        # Índice de x[i0] dentro de 'extendida'
+        i0 = posiciones // self.up - (self._recibidas - len(extendida))
+        indices = i0[:, None] - np.arange(self.coef_por_fase)[None, :]
+
+        salida = np.einsum('ij,ij->i', extendida[indices], self.polifase[fases])
+
+        self._historia = extendida[len(extendida) - (self.coef_por_fase - 1):]
+        return salida
@@ -4,126 +4,332 @@ Módulo de visualización para el proyecto DSP
 Orange Pi 5 Plus - Procesamiento Digital de Señales
 """
 
-import matplotlib
-matplotlib.use('Agg')  # Para uso sin interfaz gráfica
-import matplotlib.pyplot as plt
+import multiprocessing
 import numpy as np
 import os
+import queue
 from datetime import datetime
 
+from decimacion import PiramideMinMax, envolvente_min_max
+from importacion_diferida import importar_diferido
+from raster_espectrograma import RasterEspectrograma
+
+
+def _preparar_matplotlib():
+    import matplotlib
+    matplotlib.use('Agg')  # Para uso sin interfaz gráfica
+
+
+# pyplot se importa con la primera gráfica, no al importar el módulo
+plt = importar_diferido('matplotlib.pyplot', antes=_preparar_matplotlib)
+
+# Resolución de las imágenes guardadas (fija el ancho en píxeles para decimar)
+DPI_GRAFICAS = 150
+
 class Visualizador:
     """Clase para generar visualizaciones de señales y análisis espectral"""
 
-    def __init__(self, config):
-        """Inicializar visualizador con configuración"""
+    def __init__(self, config, segundo_plano=None):
+        """
+        Inicializar visualizador con configuración
+
+        segundo_plano: renderizar en un proceso aparte (RenderizadorSegundoPlano);
+        por defecto config.visualizacion_segundo_plano
+        """
         self.config = config
         self.directorio_graficas = "graficas"
 
+        self._estilo_configurado = False
+        # Figuras reutilizadas entre llamadas: nombre -> (figura, ejes, artistas)
+        self._figuras = {}
+        self.raster = RasterEspectrograma(config)
+
         # Crear directorio si no existe
         if not os.path.exists(self.directorio_graficas):
             os.makedirs(self.directorio_graficas)
 
-        # Configurar estilo de gráficos
+        if segundo_plano is None:
+            segundo_plano = config.visualizacion_segundo_plano
+        self.renderizador = RenderizadorSegundoPlano(config) if segundo_plano else None
+
+    def _configurar_estilo(self):
+        """Configurar estilo de gráficos (carga matplotlib en el primer uso)"""
+        if self._estilo_configurado:
+            return
         plt.style.use('default')
         plt.rcParams['figure.figsize'] = (12, 8)
         plt.rcParams['font.size'] = 10
+        self._estilo_configurado = True
+
+    def _figura(self, nombre, figsize, filas=1):
+        """
+        Figura y ejes reutilizables para un tipo de gráfica
+
+        Retorna (figura, ejes, artistas, nueva); artistas es un dict que el
+        llamador llena la primera vez con las líneas a actualizar después.
+        """
+        if nombre in self._figuras:
+            return self._figuras[nombre] + (False,)
+        self._configurar_estilo()
+        figura, ejes = plt.subplots(filas, 1, figsize=figsize, squeeze=False)
+        self._figuras[nombre] = (figura, list(ejes[:, 0]), {})
+        return self._figuras[nombre] + (True,)
+
+    @staticmethod
+    def _decimar(figura, y, x=None, inicio=0, fin=None):
+        """
+        Envolvente mín/máx de y[inicio:fin] al ancho en píxeles de la figura
+
+        y puede ser un arreglo o una PiramideMinMax precalculada.
+        """
+        n_pixeles = int(figura.get_figwidth() * DPI_GRAFICAS)
+        if isinstance(y, PiramideMinMax):
+            return y.rango(inicio, fin, n_pixeles)
+        y = np.asarray(y)
+        fin = len(y) if fin is None else fin
+        x = np.arange(inicio, fin) if x is None else np.asarray(x)[inicio:fin]
+        return envolvente_min_max(y[inicio:fin], n_pixeles, x)
+
+    @staticmethod
+    def _actualizar_linea(eje, linea, x, y):
+        """Reemplaza los datos de una línea y reajusta la escala del eje"""
+        linea.set_data(x, y)
+        eje.relim()
+        eje.autoscale_view()
+
+    def cerrar(self):
+        """Libera las figuras y detiene el renderizador en segundo plano"""
+        if self.renderizador is not None:
+            self.renderizador.detener()
+            self.renderizador = None
+        for figura, _, _ in self._figuras.values():
+            plt.close(figura)
+        self._figuras.clear()
 
     def graficas_comparativas(self, senal_original, senal_filtrada, fft_original, fft_filtrada, espectrograma, f, t):
         """Generar gráficas comparativas de señales y espectros"""
+        if self.renderizador is not None:
+            return self.renderizador.enviar('graficas_comparativas', senal_original, senal_filtrada,
+                                            fft_original, fft_filtrada, espectrograma, f, t)
 
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
         # 1. Gráfico temporal: señal original vs filtrada
-        plt.figure(figsize=(15, 6))
-
-        plt.subplot(2, 1, 1)
-        plt.plot(senal_original, 'b-', alpha=0.7, label='Señal Original')
-        plt.title('Señal de Voz - Temporal')
-        plt.xlabel('Muestras')
-        plt.ylabel('Amplitud')
-        plt.legend()
-        plt.grid(True, alpha=0.3)
-
-        plt.subplot(2, 1, 2)
-        plt.plot(senal_filtrada, 'r-', alpha=0.7, label='Señal Filtrada')
-        plt.title('Señal de Voz Filtrada - Temporal')
-        plt.xlabel('Muestras')
-        plt.ylabel('Amplitud')
-        plt.legend()
-        plt.grid(True, alpha=0.3)
-
-        plt.tight_layout()
-        plt.savefig(f"{self.directorio_graficas}/senal_temporal_{timestamp}.png", dpi=150, bbox_inches='tight')
-        plt.close()
+        figura, ejes, lineas, nueva = self._figura('temporal', (15, 6), filas=2)
+        if nueva:
+            for eje, color, etiqueta, titulo in zip(
+                    ejes, ('b-', 'r-'), ('Señal Original', 'Señal Filtrada'),
+                    ('Señal de Voz - Temporal', 'Señal de Voz Filtrada - Temporal')):
+                lineas[etiqueta], = eje.plot([], [], color, alpha=0.7, label=etiqueta)
+                eje.set_title(titulo)
+                eje.set_xlabel('Muestras')
+                eje.set_ylabel('Amplitud')
+                eje.legend()
+                eje.grid(True, alpha=0.3)
+            figura.tight_layout()
+
+        for eje, etiqueta, senal in zip(ejes, ('Señal Original', 'Señal Filtrada'),
+                                        (senal_original, senal_filtrada)):
+            self._actualizar_linea(eje, lineas[etiqueta], *self._decimar(figura, senal))
+
+        figura.savefig(f"{self.directorio_graficas}/senal_temporal_{timestamp}.png", dpi=DPI_GRAFICAS, bbox_inches='tight')
 
         print(f"✅ Gráfico temporal guardado: senal_temporal_{timestamp}.png")
 
         # 2. Comparación de FFT
         frecuencias = np.linspace(0, self.config.fs/2, len(fft_original))
 
-        plt.figure(figsize=(15, 6))
-
-        plt.subplot(2, 1, 1)
-        plt.plot(frecuencias, 20 * np.log10(np.abs(fft_original)), 'b-', label='FFT Original')
-        plt.title('Espectro de Frecuencia - Original')
-        plt.xlabel('Frecuencia (Hz)')
-        plt.ylabel('Magnitud (dB)')
-        plt.xlim(0, 8000)
-        plt.legend()
-        plt.grid(True, alpha=0.3)
-
-        plt.subplot(2, 1, 2)
-        plt.plot(frecuencias, 20 * np.log10(np.abs(fft_filtrada)), 'r-', label='FFT Filtrada')
-        plt.title('Espectro de Frecuencia - Filtrada')
-        plt.xlabel('Frecuencia (Hz)')
-        plt.ylabel('Magnitud (dB)')
-        plt.xlim(0, 8000)
-        plt.legend()
-        plt.grid(True, alpha=0.3)
-
-        plt.tight_layout()
-        plt.savefig(f"{self.directorio_graficas}/fft_comparacion_{timestamp}.png", dpi=150, bbox_inches='tight')
-        plt.close()
+        figura, ejes, lineas, nueva = self._figura('fft_comparacion', (15, 6), filas=2)
+        if nueva:
+            for eje, color, etiqueta, titulo in zip(
+                    ejes, ('b-', 'r-'), ('FFT Original', 'FFT Filtrada'),
+                    ('Espectro de Frecuencia - Original', 'Espectro de Frecuencia - Filtrada')):
+                lineas[etiqueta], = eje.plot([], [], color, label=etiqueta)
+                eje.set_title(titulo)
+                eje.set_xlabel('Frecuencia (Hz)')
+                eje.set_ylabel('Magnitud (dB)')
+                eje.legend()
+                eje.grid(True, alpha=0.3)
+            figura.tight_layout()
+
+        for eje, etiqueta, fft in zip(ejes, ('FFT Original', 'FFT Filtrada'), (fft_original, fft_filtrada)):
+            # El logaritmo es monótono: se decima |X| y se convierte solo la envolvente
+            f_env, magnitud = self._decimar(figura, np.abs(fft), frecuencias)
+            self._actualizar_linea(eje, lineas[etiqueta], f_env, 20 * np.log10(magnitud))
+            eje.set_xlim(0, 8000)
+
+        figura.savefig(f"{self.directorio_graficas}/fft_comparacion_{timestamp}.png", dpi=DPI_GRAFICAS, bbox_inches='tight')
 
         print(f"✅ Gráfico FFT guardado: fft_comparacion_{timestamp}.png")
 
-        # 3. Espectrograma
-        plt.figure(figsize=(12, 8))
-        plt.pcolormesh(t, f, 10 * np.log10(espectrograma), shading='gouraud', cmap='viridis')
-        plt.title('Espectrograma de la Señal Filtrada')
-        plt.ylabel('Frecuencia (Hz)')
-        plt.xlabel('Tiempo (s)')
-        plt.colorbar(label='Potencia (dB)')
-        plt.ylim(0, 4000)
+        # 3. Espectrograma (ya en dB): mapa de bits con tabla de colores
+        figura, (eje,), artistas, nueva = self._figura('espectrograma', (12, 8))
+        filas = self.raster.filas_visibles(f)
+        limites = self.raster.limites(espectrograma[:filas])
+        rgb = self.raster.imagen(espectrograma, f, limites)
+        df = f[1] - f[0] if len(f) > 1 else 1.0
+        dt = t[1] - t[0] if len(t) > 1 else 1.0
+        extension = (t[0] - dt/2, t[-1] + dt/2, f[0] - df/2, f[filas - 1] + df/2)
+        normalizacion = plt.Normalize(*limites)
 
-        plt.tight_layout()
-        plt.savefig(f"{self.directorio_graficas}/espectrograma_{timestamp}.png", dpi=150, bbox_inches='tight')
-        plt.close()
+        if nueva:
+            artistas['imagen'] = eje.imshow(rgb, extent=extension, aspect='auto', interpolation='nearest')
+            eje.set_title('Espectrograma de la Señal Filtrada')
+            eje.set_ylabel('Frecuencia (Hz)')
+            eje.set_xlabel('Tiempo (s)')
+            artistas['escala'] = plt.cm.ScalarMappable(norm=normalizacion, cmap=self.raster.mapa)
+            figura.colorbar(artistas['escala'], ax=eje, label='Potencia (dB)')
+            figura.tight_layout()
+        else:
+            artistas['imagen'].set_data(rgb)
+            artistas['imagen'].set_extent(extension)
+            artistas['escala'].set_norm(normalizacion)
+
+        figura.savefig(f"{self.directorio_graficas}/espectrograma_{timestamp}.png", dpi=DPI_GRAFICAS, bbox_inches='tight')
 
         print(f"✅ Espectrograma guardado: espectrograma_{timestamp}.png")
 
-    def graficar_senal_individual(self, senal, titulo="Señal", archivo_salida=None):
-        """Graficar una señal individual"""
-        plt.figure(figsize=(12, 6))
-        plt.plot(senal, 'b-', alpha=0.8)
-        plt.title(titulo)
-        plt.xlabel('Muestras')
-        plt.ylabel('Amplitud')
-        plt.grid(True, alpha=0.3)
+    def graficar_senal_individual(self, senal, titulo="Señal", archivo_salida=None, inicio=0, fin=None):
+        """
+        Graficar una señal individual (o el tramo [inicio, fin) de ella)
+
+        senal puede ser una PiramideMinMax para acercarse a tramos de una
+        grabación larga sin recorrer de nuevo todas las muestras
+        """
+        if self.renderizador is not None:
+            return self.renderizador.enviar('graficar_senal_individual', senal, titulo, archivo_salida,
+                                            inicio, fin, clave=archivo_salida)
+
+        figura, (eje,), lineas, nueva = self._figura('senal_individual', (12, 6))
+        if nueva:
+            lineas['senal'], = eje.plot([], [], 'b-', alpha=0.8)
+            eje.set_xlabel('Muestras')
+            eje.set_ylabel('Amplitud')
+            eje.grid(True, alpha=0.3)
+        eje.set_title(titulo)
+        self._actualizar_linea(eje, lineas['senal'], *self._decimar(figura, senal, inicio=inicio, fin=fin))
 
         if archivo_salida:
-            plt.savefig(archivo_salida, dpi=150, bbox_inches='tight')
-        plt.close()
+            figura.savefig(archivo_salida, dpi=DPI_GRAFICAS, bbox_inches='tight')
 
     def graficar_fft(self, fft, frecuencias, titulo="FFT", archivo_salida=None):
         """Graficar FFT"""
-        plt.figure(figsize=(12, 6))
-        plt.plot(frecuencias, 20 * np.log10(np.abs(fft)), 'b-')
-        plt.title(titulo)
-        plt.xlabel('Frecuencia (Hz)')
-        plt.ylabel('Magnitud (dB)')
-        plt.grid(True, alpha=0.3)
+        if self.renderizador is not None:
+            return self.renderizador.enviar('graficar_fft', fft, frecuencias, titulo, archivo_salida,
+                                            clave=archivo_salida)
+
+        figura, (eje,), lineas, nueva = self._figura('fft', (12, 6))
+        if nueva:
+            lineas['fft'], = eje.plot([], [], 'b-')
+            eje.set_xlabel('Frecuencia (Hz)')
+            eje.set_ylabel('Magnitud (dB)')
+            eje.grid(True, alpha=0.3)
+        eje.set_title(titulo)
+        f_env, magnitud = self._decimar(figura, np.abs(fft), frecuencias)
+        self._actualizar_linea(eje, lineas['fft'], f_env, 20 * np.log10(magnitud))
 
         if archivo_salida:
-            plt.savefig(archivo_salida, dpi=150, bbox_inches='tight')
-        plt.close()
\ No newline at end of file
+            figura.savefig(archivo_salida, dpi=DPI_GRAFICAS, bbox_inches='tight')
+
+
+def _bucle_renderizado(config, cola, renderizadas, obsoletas):
+    """
+    Proceso de renderizado: atiende los trabajos de la cola
+
+    Antes de dibujar vacía la cola y se queda solo con el trabajo más
+    reciente de cada tipo (método y archivo de salida); los anteriores
+    están obsoletos y se descartan sin dibujar.
+    """
+    visualizador = Visualizador(config, segundo_plano=False)
+    terminar = False
+    while not terminar:
+        trabajo = cola.get()
+        if trabajo is None:
+            break
+        pendientes = {}
+        while trabajo is not None:
+            metodo, args, clave = trabajo
+            if clave in pendientes:
+                obsoletas.value += 1
+            pendientes[clave] = trabajo
+            try:
+                trabajo = cola.get_nowait()
+            except queue.Empty:
+                break
+            terminar = trabajo is None
+
+        for metodo, args, _ in pendientes.values():
+            try:
+                getattr(visualizador, metodo)(*args)
+            except Exception as e:
+                print(f"❌ Error renderizando {metodo}: {e}")
+            renderizadas.value += 1
+
+    visualizador.cerrar()
+
+
+class RenderizadorSegundoPlano:
+    """
+    Proceso aparte que dibuja y guarda las gráficas
+
+    enviar() nunca bloquea: si la cola (capacidad trabajos) está llena el
+    trabajo se omite y se cuenta. El proceso reutiliza sus figuras y, si se
+    atrasa, dibuja solo el trabajo más reciente de cada tipo.
+    """
+
+    def __init__(self, config, capacidad=None):
+        if capacidad is None:
+            capacidad = config.visualizacion_cola_max
+        # 'spawn': el proceso no hereda hilos ni estado de matplotlib del padre
+        contexto = multiprocessing.get_context('spawn')
+        self._cola = contexto.Queue(maxsize=capacidad)
+        self._renderizadas = contexto.Value('i', 0)
+        self._obsoletas = contexto.Value('i', 0)
+        self.enviadas = 0
+        self.omitidas = 0
+        self._proceso = contexto.Process(target=_bucle_renderizado, name="renderizador",
+                                         args=(config, self._cola, self._renderizadas, self._obsoletas),
+                                         daemon=True)
+        self._proceso.start()
+
+    def enviar(self, metodo, *args, clave=None):
+        """
+        Encola un trabajo de dibujo sin esperar; retorna False si se omitió
+
+        Los trabajos con el mismo método y clave (p.ej. el archivo de
+        salida) se consideran del mismo tipo: el más nuevo deja obsoleto al
+        anterior.
+
+        Los arreglos se copian: la serialización ocurre en otro hilo y el
+        llamador puede reutilizar sus buffers.
+        """
+        args = tuple(np.array(a) if isinstance(a, np.ndarray) else a for a in args)
+        try:
+            self._cola.put_nowait((metodo, args, (metodo, clave)))
+        except queue.Full:
+            self.omitidas += 1
+            return False
+        self.enviadas += 1
+        return True
+
+    def detener(self, timeout=30.0):
+        """Termina de dibujar lo encolado y cierra el proceso"""
+        if self._proceso is None:
+            return
+        try:
+            self._cola.put(None, timeout=timeout)
+            self._proceso.join(timeout)
+        except queue.Full:
+            pass
+        if self._proceso.is_alive():
+            self._proceso.terminate()
+        self._proceso = None
+
+    def estadisticas(self):
+        """Trabajos enviados, omitidos (cola llena), obsoletos y renderizados"""
+        return {
+            'enviadas': self.enviadas,
+            'omitidas': self.omitidas,
+            'obsoletas': self._obsoletas.value,
+            'renderizadas': self._renderizadas.value
+        }
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Benchmark por etapa del pipeline DSP con comparación contra una línea base
+Orange Pi 5 Plus - Procesamiento Digital de Señales
+
+Mide cada etapa (preénfasis, notch, FIR, FFT, espectrograma,
+características, guardado y gráficas) sobre señales sintéticas de
+generar_senal_prueba de 1 s a 1 h y reporta el factor de tiempo real
+(RTF = tiempo de proceso / duración del audio; < 1 es más rápido que el
+tiempo real).
+
+Uso:
+    python tests/benchmark_etapas.py                  # compara con la base
+    python tests/benchmark_etapas.py --guardar-base   # actualiza la base
+    python tests/benchmark_etapas.py -d 1 10 60       # solo esas duraciones
+
+Sale con código 1 si alguna etapa empeora más que la tolerancia.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from config import Config
+from captura_audio import CapturadorAudio
+from preprocesamiento import Preprocesador
+from filtros_digitales import FiltrosDigitales
+from analisis_espectral import AnalizadorEspectral
+from extraccion_caracteristicas import ExtractorCaracteristicas
+from visualizacion import Visualizador
+
+DURACIONES = [1, 10, 60, 600, 3600]
+ARCHIVO_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'base_benchmark.json')
+
+
+def medir(funcion, tiempo_min=0.5, repeticiones_min=3, repeticiones_max=50):
+    """
+    Mejor tiempo de varias ejecuciones (al menos repeticiones_min y hasta
+    acumular tiempo_min segundos)
+    """
+    tiempos = []
+    while (len(tiempos) < repeticiones_min or sum(tiempos) < tiempo_min) and len(tiempos) < repeticiones_max:
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+
+def etapas(config, senal, directorio):
+    """Funciones a medir por etapa, cada una sobre la misma señal"""
+    preprocesador = Preprocesador(config)
+    filtros = FiltrosDigitales(config)
+    analizador = AnalizadorEspectral(config)
+    extractor = ExtractorCaracteristicas(config)
+    visualizador = Visualizador(config, segundo_plano=False)
+
+    _, fft = analizador.calcular_fft(senal)
+    resultados = {
+        'snr': 10.0,
+        'centroide_espectral': 1000.0,
+        'energias_subbandas': np.ones(len(config.bandas_energia) - 1),
+        'espectro': fft,
+        'timestamp': '2025-01-01 00:00:00'
+    }
+    contador = iter(range(10**9))
+
+    return {
+        'preenfasis': lambda: preprocesador.aplicar_preenfasis(senal),
+        'notch': lambda: filtros.aplicar_filtro_notch(senal, config.f_notch),
+        'fir': lambda: filtros.aplicar_filtro_pasabajos(senal, config.f_corte),
+        'fft': lambda: analizador.calcular_fft(senal),
+        'espectrograma': lambda: analizador.calcular_espectrograma(senal),
+        'caracteristicas': lambda: extractor.extraer_senal(senal),
+        'guardar_json': lambda: analizador.guardar_resultados(
+            resultados, os.path.join(directorio, 'resultados.json')),
+        'guardar_almacen': lambda: analizador.guardar_resultados_almacen(
+            resultados, os.path.join(directorio, 'almacen'), fuente=f"senal_{next(contador)}.wav"),
+        'graficas': lambda: visualizador.graficar_senal_individual(
+            senal, archivo_salida=os.path.join(directorio, 'senal.png')),
+    }
+
+
+def ejecutar(duraciones, tiempo_min):
+    """Mide todas las etapas para cada duración: {etapa: {duración: RTF}}"""
+    config = Config()
+    capturador = CapturadorAudio(config)
+    reporte = {}
+
+    with tempfile.TemporaryDirectory() as directorio:
+        directorio_inicial = os.getcwd()
+        os.chdir(directorio)  # Visualizador crea graficas/ en el directorio actual
+        try:
+            for duracion in duraciones:
+                np.random.seed(0)
+                senal = capturador.generar_senal_prueba(duracion)
+                print(f"\n--- {duracion} s ({len(senal)} muestras) ---")
+
+                for nombre, funcion in etapas(config, senal, directorio).items():
+                    # Silenciar los mensajes de las etapas que imprimen
+                    salida = sys.stdout
+                    sys.stdout = open(os.devnull, 'w')
+                    try:
+                        tiempo = medir(funcion, tiempo_min)
+                    finally:
+                        sys.stdout.close()
+                        sys.stdout = salida
+
+                    rtf = tiempo / duracion
+                    reporte.setdefault(nombre, {})[str(duracion)] = rtf
+                    print(f"{nombre:16s} {tiempo * 1000:10.2f} ms   RTF {rtf:.2e}   "
+                          f"{1 / rtf if rtf > 0 else float('inf'):10.0f}x tiempo real")
+                del senal
+        finally:
+            os.chdir(directorio_inicial)
+
+    return reporte
+
+
+def comparar(reporte, base, tolerancia):
+    """Lista de regresiones (etapa, duración, RTF base, RTF actual)"""
+    regresiones = []
+    for nombre, por_duracion in reporte.items():
+        for duracion, rtf in por_duracion.items():
+            rtf_base = base.get('etapas', {}).get(nombre, {}).get(duracion)
+            if rtf_base is not None and rtf > rtf_base * (1 + tolerancia):
+                regresiones.append((nombre, duracion, rtf_base, rtf))
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark por etapa del pipeline DSP")
+    parser.add_argument('-d', '--duraciones', type=float, nargs='+', default=DURACIONES,
+                        help="Duraciones de señal en segundos")
+    parser.add_argument('-b', '--base', default=ARCHIVO_BASE, help="Archivo JSON de línea base")
+    parser.add_argument('-t', '--tolerancia', type=float, default=0.25,
+                        help="Empeoramiento relativo admitido antes de marcar regresión")
+    parser.add_argument('--tiempo-min', type=float, default=0.5,
+                        help="Segundos mínimos de medición por etapa y duración")
+    parser.add_argument('--guardar-base', action='store_true', help="Guardar el resultado como nueva base")
+    parser.add_argument('-s', '--salida', default=None, help="Guardar el reporte completo en JSON")
+    args = parser.parse_args()
+
+    duraciones = [int(d) if float(d).is_integer() else d for d in args.duraciones]
+    reporte = ejecutar(duraciones, args.tiempo_min)
+
+    documento = {
+        'maquina': platform.machine(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'fecha': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'etapas': reporte
+    }
+    if args.salida:
+        with open(args.salida, 'w') as f:
+            json.dump(documento, f, indent=2)
+
+    if args.guardar_base:
+        with open(args.base, 'w') as f:
+            json.dump(documento, f, indent=2)
+        print(f"\n✅ Línea base guardada en {args.base}")
+        return 0
+
+    if not os.path.exists(args.base):
+        print(f"\n⚠️  Sin línea base ({args.base}); ejecutar con --guardar-base")
+        return 0
+
+    with open(args.base) as f:
+        base = json.load(f)
+    if base.get('maquina') != documento['maquina']:
+        print(f"\n⚠️  La base se midió en {base.get('maquina')}, no en {documento['maquina']}")
+
+    regresiones = comparar(reporte, base, args.tolerancia)
+    if not regresiones:
+        print(f"\n✅ Sin regresiones (tolerancia {args.tolerancia:.0%})")
+        return 0
+
+    print(f"\n❌ {len(regresiones)} regresiones (tolerancia {args.tolerancia:.0%}):")
+    for nombre, duracion, rtf_base, rtf in regresiones:
+        print(f"  {nombre} @ {duracion} s: RTF {rtf_base:.2e} → {rtf:.2e} ({rtf / rtf_base - 1:+.0%})")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
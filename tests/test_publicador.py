@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Pruebas del publicador MQTT asíncrono con el cliente local (sin broker)
+
+Uso:
+    python -m pytest tests/test_publicador.py
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from comunicacion import ComunicadorMQTT, PublicadorAsincrono, ClienteMQTTLocal
+from config import Config
+from formato_binario import CodificadorBinario, DecodificadorBinario
+
+
+def crear_publicador(latencia=0.0, **opciones):
+    """Publicador sobre un ClienteMQTTLocal con on_publish conectado a confirmar"""
+    cliente = ClienteMQTTLocal(latencia)
+    publicador = PublicadorAsincrono(cliente, 'dsp/test', **opciones)
+    cliente.on_publish = lambda cliente, userdata, mid, *args: publicador.confirmar(mid)
+    return cliente, publicador
+
+
+class TestPublicadorAsincrono(unittest.TestCase):
+
+    def test_confirmacion_inmediata_no_queda_en_vuelo(self):
+        # Sin latencia on_publish llega dentro de publish(), antes de registrar el mid
+        cliente, publicador = crear_publicador(tam_lote=1, espera_lote=0.01, max_en_vuelo=20)
+        publicador.iniciar()
+        for i in range(100):
+            publicador.publicar({'i': i})
+        publicador.detener(timeout=5.0)
+
+        estadisticas = publicador.estadisticas()
+        self.assertEqual(estadisticas['tramas_enviadas'], 100)
+        self.assertEqual(estadisticas['en_cola'], 0)
+        self.assertEqual(estadisticas['mensajes_confirmados'], estadisticas['mensajes_enviados'])
+        self.assertEqual(estadisticas['en_vuelo'], 0)
+        self.assertEqual(len(cliente.mensajes), estadisticas['mensajes_enviados'])
+
+    def test_confirmaciones_ajenas_acotadas(self):
+        # mids de otros publish del mismo cliente no se acumulan sin límite
+        _, publicador = crear_publicador(max_en_vuelo=5)
+        for mid in range(1000):
+            publicador.confirmar(mid)
+        self.assertLessEqual(len(publicador._confirmadas_antes), 10)
+        self.assertEqual(publicador.estadisticas()['mensajes_confirmados'], 0)
+
+    def test_desconectar_envia_lo_pendiente(self):
+        # Las tramas encoladas se publican antes de cerrar el cliente
+        cliente = ClienteMQTTLocal()
+        enviados_al_cerrar = []
+        cliente.disconnect = lambda: enviados_al_cerrar.append(len(cliente.mensajes))
+        comunicador = ComunicadorMQTT(Config(), cliente=cliente, verboso=False)
+        publicador = comunicador.crear_publicador(tam_lote=50, espera_lote=5.0)
+        for i in range(30):
+            publicador.publicar({'i': i})
+        comunicador.desconectar()
+
+        self.assertEqual(publicador.estadisticas()['tramas_enviadas'], 30)
+        self.assertEqual(enviados_al_cerrar, [len(cliente.mensajes)])
+        self.assertGreater(len(cliente.mensajes), 0)
+
+    def test_coalescer_por_tipo_sin_tocar_eventos(self):
+        # Con la cola llena cada trama reemplaza a la última de su clase; los eventos no se pisan
+        cliente, publicador = crear_publicador(capacidad=4, tam_lote=10, politica='coalescer')
+        publicador.publicar(np.zeros(4, dtype=np.float32), 'espectro')
+        publicador.publicar({'evento': 'inicio_voz', 'tiempo': 0.5})
+        publicador.publicar(np.zeros(2, dtype=np.float32), 'caracteristicas')
+        publicador.publicar({'bloque': 0})
+        publicador.publicar(np.ones(4, dtype=np.float32), 'espectro')
+        publicador.publicar(np.ones(2, dtype=np.float32), 'caracteristicas')
+        publicador.publicar({'bloque': 1})
+        publicador.publicar({'evento': 'fin_voz', 'tiempo': 0.9})
+
+        estadisticas = publicador.estadisticas()
+        self.assertEqual(estadisticas['coalescidas'], 3)
+        self.assertEqual(estadisticas['descartadas'], 1)
+        cola = [(datos if isinstance(datos, dict) else (tipo, datos[0])) for _, datos, _, tipo in publicador._cola]
+        self.assertEqual(cola, [{'evento': 'inicio_voz', 'tiempo': 0.5}, ('caracteristicas', 1.0),
+                                {'bloque': 1}, {'evento': 'fin_voz', 'tiempo': 0.9}])
+
+    def test_binario_arreglos_y_eventos(self):
+        # Arreglos → tramas DSPB en <topic>/bin (un flujo por tipo); dicts → JSON en <topic>
+        cliente, publicador = crear_publicador(tam_lote=4, espera_lote=0.01,
+                                               codificador=CodificadorBinario('f16', delta=True))
+        publicador.iniciar()
+        for i in range(20):
+            publicador.publicar(np.full(64, i, dtype=np.float32), 'espectro')
+            publicador.publicar(np.arange(8, dtype=np.float32) + i, 'caracteristicas')
+        publicador.publicar({'evento': 'inicio_voz', 'tiempo': 0.5})
+        publicador.detener(timeout=5.0)
+
+        estadisticas = publicador.estadisticas()
+        self.assertEqual(estadisticas['errores'], 0)
+        self.assertEqual(estadisticas['tramas_enviadas'], 41)
+        self.assertGreater(estadisticas['binario']['espectro']['bytes_json'], 0)
+
+        decodificador = DecodificadorBinario()
+        tramas = [trama for topic, payload, _ in cliente.mensajes if topic == 'dsp/test/bin'
+                  for trama in decodificador.decodificar_mensaje(payload)]
+        self.assertEqual(len(tramas), 40)
+        self.assertEqual(decodificador.perdidas, 0)
+        espectros = [t['valores'] for t in tramas if t['tipo'] == 'espectro']
+        np.testing.assert_allclose(espectros[-1], 19)
+        self.assertTrue(any(topic == 'dsp/test' for topic, _, _ in cliente.mensajes))
+
+
+class TestFormatoBinario(unittest.TestCase):
+
+    def test_ida_y_vuelta_mayor_que_uint16(self):
+        # FFT completa de 10 s a 16 kHz: 80001 bins (no caben en uint16)
+        valores = np.random.rand(80001).astype(np.float32)
+        trama = CodificadorBinario('f32').codificar(valores, 'espectro')
+        (decodificada,) = DecodificadorBinario().decodificar_mensaje(trama)
+        self.assertEqual(decodificada['valores'].shape, (80001,))
+        np.testing.assert_array_equal(decodificada['valores'], valores)
+
+
+if __name__ == "__main__":
+    unittest.main()